@@ -0,0 +1,224 @@
+# Termómetro de Ambiente Turístico
+# Conteo de hoteles por ciudad (osm_cities_with_hotels.csv) guardado por país en bloques
+# contiguos + tabla de offsets, con los agregados de cada país (total de hoteles,
+# concentración, participación de las ciudades principales, hoteles por cada mil
+# llegadas) calculados una sola vez al construir el almacén. Cada tarjeta de la app
+# lee su termómetro con un lookup y un corte, sin agrupar el CSV en cada render.
+
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from datos_turismo import SCRIPT_DIR, huella_csv
+
+HOTELES_PATH = os.path.join(SCRIPT_DIR, "osm_cities_with_hotels.csv")
+
+# Ciudades principales que se muestran (y cuya participación se precalcula) por país
+TOP_CIUDADES = 3
+
+# Niveles del termómetro según el percentil del país en total de hoteles: (hasta, ícono, nombre)
+NIVELES_AMBIENTE = [
+    (0.25, '🟢', 'Tranquilo'),
+    (0.50, '🟡', 'Moderado'),
+    (0.75, '🟠', 'Animado'),
+    (1.00, '🔴', 'Muy turístico'),
+]
+
+# Cambiar este número invalida los almacenes ya escritos
+VERSION_AMBIENTE = 1
+
+_ARRAYS_AMBIENTE = ['paises', 'offsets', 'ciudades', 'conteos', 'total_hoteles', 'concentracion',
+                    'participacion_top', 'hoteles_por_mil', 'percentil']
+
+
+class AmbienteTuristico:
+    """
+    Hoteles por ciudad con acceso O(1) por país y agregados precalculados.
+
+    - paises: array con los países (ordenados)
+    - offsets: array len(paises)+1; las ciudades del país i están en [offsets[i], offsets[i+1]),
+      ordenadas de más a menos hoteles (las primeras N son el top-N)
+    - ciudades / conteos: nombre y hoteles de cada ciudad
+    - total_hoteles, concentracion (índice Herfindahl de las participaciones de sus ciudades,
+      1 = todo en una ciudad), participacion_top (fracción en las TOP_CIUDADES principales),
+      hoteles_por_mil (por cada mil llegadas; NaN sin llegadas) y percentil (del total de
+      hoteles entre los países del almacén, el valor del termómetro): uno por país
+    """
+
+    def __init__(self, paises: np.ndarray, offsets: np.ndarray, ciudades: np.ndarray, conteos: np.ndarray,
+                 total_hoteles: np.ndarray, concentracion: np.ndarray, participacion_top: np.ndarray,
+                 hoteles_por_mil: np.ndarray, percentil: np.ndarray):
+        self.paises = paises
+        self.offsets = offsets
+        self.ciudades = ciudades
+        self.conteos = conteos
+        self.total_hoteles = total_hoteles
+        self.concentracion = concentracion
+        self.participacion_top = participacion_top
+        self.hoteles_por_mil = hoteles_por_mil
+        self.percentil = percentil
+        self.posicion_pais = {str(pais): i for i, pais in enumerate(paises)}
+
+    def __len__(self) -> int:
+        return len(self.paises)
+
+    def __contains__(self, pais: str) -> bool:
+        return pais in self.posicion_pais
+
+    @classmethod
+    def desde_tablas(cls, df_hoteles: pd.DataFrame, df_destinos: pd.DataFrame) -> 'AmbienteTuristico':
+        """
+        Construye el almacén a partir del CSV de hoteles (columnas 'country', 'city',
+        'hotel_count') y la tabla de destinos (para las llegadas).
+        """
+        df = df_hoteles.dropna(subset=['country', 'city']).astype({'country': str, 'city': str})
+        df = df.assign(hotel_count=pd.to_numeric(df['hotel_count'], errors='coerce').fillna(0).astype(np.int64))
+        df = df.sort_values(['country', 'hotel_count', 'city'], ascending=[True, False, True], kind='stable')
+
+        paises, inicios = np.unique(df['country'].to_numpy(dtype=str), return_index=True)
+        offsets = np.append(inicios, len(df)).astype(np.int64)
+        conteos = df['hotel_count'].to_numpy(dtype=np.int64)
+
+        # Agregados por país en una pasada: grupo de cada fila y su posición dentro del bloque
+        tamanos = np.diff(offsets)
+        grupo = np.repeat(np.arange(len(paises)), tamanos)
+        posicion = np.arange(len(df)) - np.repeat(offsets[:-1], tamanos)
+        total = np.bincount(grupo, weights=conteos, minlength=len(paises))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            participacion = conteos / total[grupo]
+            concentracion = np.bincount(grupo, weights=participacion ** 2, minlength=len(paises))
+            participacion_top = np.bincount(grupo, weights=np.where(posicion < TOP_CIUDADES, conteos, 0),
+                                            minlength=len(paises)) / total
+        concentracion = np.where(total > 0, concentracion, np.nan)
+
+        llegadas = (df_destinos.drop_duplicates('country').set_index('country')['tourism_arrivals']
+                    .reindex(paises).to_numpy(dtype=float))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            hoteles_por_mil = np.where(llegadas > 0, total / (llegadas / 1000), np.nan)
+
+        percentil = pd.Series(total).rank(pct=True).to_numpy(dtype=float) if len(paises) else np.zeros(0)
+        return cls(paises.astype(str), offsets, df['city'].to_numpy(dtype=str), conteos, total.astype(np.int64),
+                   concentracion, participacion_top, hoteles_por_mil, percentil)
+
+    @classmethod
+    def vacio(cls) -> 'AmbienteTuristico':
+        return cls.desde_tablas(pd.DataFrame(columns=['country', 'city', 'hotel_count']),
+                                pd.DataFrame(columns=['country', 'tourism_arrivals']))
+
+    def guardar(self, path: str) -> None:
+        """
+        Escribe el .npz de forma atómica (archivo temporal + os.replace).
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **{nombre: getattr(self, nombre) for nombre in _ARRAYS_AMBIENTE})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def abrir(cls, path: str) -> Optional['AmbienteTuristico']:
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as datos:
+            return cls(**{nombre: datos[nombre] for nombre in _ARRAYS_AMBIENTE})
+
+    def rango(self, pais: str) -> Tuple[int, int]:
+        """
+        Ciudades [inicio, fin) del país; (0, 0) si no está en el almacén.
+        """
+        i = self.posicion_pais.get(pais)
+        if i is None:
+            return 0, 0
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def top_ciudades(self, pais: str, n: int = TOP_CIUDADES) -> List[Tuple[str, int]]:
+        """
+        Las n ciudades del país con más hoteles (corte del bloque ya ordenado).
+        """
+        inicio, fin = self.rango(pais)
+        fin = min(fin, inicio + n)
+        return [(str(ciudad), int(conteo)) for ciudad, conteo in zip(self.ciudades[inicio:fin], self.conteos[inicio:fin])]
+
+    def termometro(self, pais: str, n: int = TOP_CIUDADES) -> Optional[Dict]:
+        """
+        Lectura del termómetro para una tarjeta (costo constante por país).
+
+        Returns:
+            Diccionario con 'valor' (0-1), 'nivel', 'icono', 'total_hoteles', 'ciudades',
+            'top_ciudades', 'participacion_top', 'concentracion' y 'hoteles_por_mil_llegadas',
+            o None si el país no tiene datos de hoteles
+        """
+        i = self.posicion_pais.get(pais)
+        if i is None:
+            return None
+        valor = float(self.percentil[i])
+        _, icono, nivel = next((nivel for nivel in NIVELES_AMBIENTE if valor <= nivel[0]), NIVELES_AMBIENTE[-1])
+        return {
+            'valor': valor,
+            'nivel': nivel,
+            'icono': icono,
+            'total_hoteles': int(self.total_hoteles[i]),
+            'ciudades': int(self.offsets[i + 1] - self.offsets[i]),
+            'top_ciudades': self.top_ciudades(pais, n),
+            'participacion_top': float(self.participacion_top[i]),
+            'concentracion': float(self.concentracion[i]),
+            'hoteles_por_mil_llegadas': float(self.hoteles_por_mil[i]),
+        }
+
+    def resumen(self) -> pd.DataFrame:
+        """
+        Agregados de todos los países en un DataFrame (para exportar o comparar).
+        """
+        return pd.DataFrame({
+            'country': self.paises,
+            'ciudades': np.diff(self.offsets),
+            'total_hoteles': self.total_hoteles,
+            'participacion_top': self.participacion_top,
+            'concentracion': self.concentracion,
+            'hoteles_por_mil_llegadas': self.hoteles_por_mil,
+            'percentil': self.percentil,
+        })
+
+
+def leer_hoteles(path: str = HOTELES_PATH) -> pd.DataFrame:
+    """
+    Lee el CSV de hoteles por ciudad; vacío si el archivo no existe o no tiene filas.
+    """
+    try:
+        return pd.read_csv(path, usecols=['country', 'city', 'hotel_count'])
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return pd.DataFrame(columns=['country', 'city', 'hotel_count'])
+
+
+def ruta_ambiente(cache_dir: str, version_datos: str, version_hoteles: str) -> str:
+    return os.path.join(cache_dir, f"ambiente_v{VERSION_AMBIENTE}_{version_datos}_{version_hoteles}.npz")
+
+
+def cargar_ambiente(df_destinos: pd.DataFrame, hoteles_path: str = HOTELES_PATH, cache_dir: Optional[str] = None,
+                    version_datos: str = '') -> AmbienteTuristico:
+    """
+    Devuelve el almacén del termómetro, leyéndolo del disco si existe.
+
+    El archivo lleva en el nombre la versión del dataset (las llegadas) y el hash del CSV
+    de hoteles, así que regenerar cualquiera de los dos provoca su reconstrucción. Sin
+    cache_dir (o si falla la lectura o la escritura) se construye en memoria.
+    """
+    if not os.path.exists(hoteles_path):
+        return AmbienteTuristico.vacio()
+    path = ruta_ambiente(cache_dir, version_datos, huella_csv(hoteles_path)['sha1'][:16]) if cache_dir else None
+    if path:
+        try:
+            ambiente = AmbienteTuristico.abrir(path)
+            if ambiente is not None:
+                return ambiente
+        except Exception:
+            pass
+
+    ambiente = AmbienteTuristico.desde_tablas(leer_hoteles(hoteles_path), df_destinos)
+    if path:
+        try:
+            ambiente.guardar(path)
+        except Exception:
+            pass
+    return ambiente
@@ -0,0 +1,176 @@
+# Benchmark: JSON completo vs. streaming para respuestas de Overpass
+# Compara tiempo y memoria pico de dos formas de procesar la misma respuesta:
+#   - completo: json.loads de todo el cuerpo + recorrido de data['elements']
+#   - streaming: iterar_elementos_json por fragmentos + reducción directa a arrays
+# y verifica que ambos den los mismos conteos por ciudad.
+#
+# Uso:
+#   python benchmark_overpass_json.py respuesta_MEX.json respuesta_FRA.json
+#   python benchmark_overpass_json.py --sintetico 50000 --ciudades 2000
+#   python benchmark_overpass_json.py --grabar MEX -o respuesta_MEX.json   (guarda una respuesta real)
+
+import argparse
+import gc
+import json
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, Tuple
+
+from osm_local import IndiceCiudades
+from precompute_osm_data import (OVERPASS_URL, TAMANO_FRAGMENTO_JSON, TIMEOUT_CONEXION, TIMEOUT_LECTURA,
+                                 construir_consulta, crear_sesion,
+                                 hoteles_y_ciudades_desde_elementos, hoteles_y_ciudades_desde_overpass,
+                                 iterar_elementos_json)
+
+
+# ============================================================================
+# SECCIÓN 1: RESPUESTAS DE PRUEBA
+# ============================================================================
+
+def escribir_respuesta_sintetica(path: str, hoteles: int, ciudades: int, vertices: int = 200,
+                                 semilla: int = 0) -> None:
+    """
+    Escribe una respuesta con la forma de la de Overpass: hoteles con coordenadas (o
+    'center') y ciudades como relaciones con la geometría de sus vías.
+    """
+    aleatorio = random.Random(semilla)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"version": 0.6, "generator": "benchmark", "osm3s": {}, "elements": [\n')
+        primero = True
+
+        def escribir(elemento: Dict) -> None:
+            nonlocal primero
+            f.write(('' if primero else ',\n') + json.dumps(elemento))
+            primero = False
+
+        for i in range(hoteles):
+            lon, lat = aleatorio.uniform(0, 10), aleatorio.uniform(0, 10)
+            tags = {'tourism': 'hotel', 'name': f'Hotel {i}', 'stars': str(aleatorio.randint(1, 5))}
+            if i % 3:
+                escribir({'type': 'node', 'id': i, 'lat': lat, 'lon': lon, 'tags': tags})
+            else:
+                escribir({'type': 'way', 'id': i, 'center': {'lat': lat, 'lon': lon}, 'tags': tags})
+        for c in range(ciudades):
+            cx, cy, r = aleatorio.uniform(0, 10), aleatorio.uniform(0, 10), aleatorio.uniform(0.05, 0.3)
+            anillo = []
+            for k in range(vertices):
+                angulo, radio = 2 * math.pi * k / vertices, r * (1 + 0.3 * aleatorio.random())
+                anillo.append((cx + radio * math.cos(angulo), cy + radio * math.sin(angulo)))
+            anillo.append(anillo[0])
+            mitad = len(anillo) // 2
+            miembros = [
+                {'type': 'way', 'ref': 2 * c, 'role': 'outer',
+                 'geometry': [{'lat': y, 'lon': x} for x, y in anillo[:mitad + 1]]},
+                {'type': 'way', 'ref': 2 * c + 1, 'role': 'outer',
+                 'geometry': [{'lat': y, 'lon': x} for x, y in anillo[mitad:]]},
+            ]
+            escribir({'type': 'relation', 'id': c, 'members': miembros,
+                      'tags': {'admin_level': '8', 'boundary': 'administrative', 'name': f'Ciudad {c}'}})
+        f.write('\n]}\n')
+
+
+def grabar_respuesta(country_code: str, path: str, url: str = OVERPASS_URL) -> None:
+    """
+    Guarda en disco la respuesta real de Overpass para un país (sin decodificarla).
+    """
+    with crear_sesion(1) as sesion:
+        response = sesion.post(url, data={'data': construir_consulta(country_code)}, stream=True, timeout=(TIMEOUT_CONEXION, TIMEOUT_LECTURA))
+        response.raise_for_status()
+        with response, open(path, 'wb') as f:
+            for fragmento in response.iter_content(TAMANO_FRAGMENTO_JSON):
+                f.write(fragmento)
+
+
+# ============================================================================
+# SECCIÓN 2: MEDICIÓN
+# ============================================================================
+
+def _fragmentos(path: str, tamano: int) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        while True:
+            fragmento = f.read(tamano)
+            if not fragmento:
+                return
+            yield fragmento
+
+
+def procesar_completo(path: str, tamano: int) -> Dict[str, int]:
+    # Lo mismo que response.json(): todo el cuerpo en memoria y luego el árbol de objetos
+    with open(path, 'rb') as f:
+        data = json.loads(f.read())
+    puntos, ciudades = hoteles_y_ciudades_desde_overpass(data)
+    return IndiceCiudades(ciudades).contar(puntos)
+
+
+def procesar_streaming(path: str, tamano: int) -> Dict[str, int]:
+    puntos, ciudades = hoteles_y_ciudades_desde_elementos(iterar_elementos_json(_fragmentos(path, tamano)))
+    return IndiceCiudades(ciudades).contar(puntos)
+
+
+def medir(funcion: Callable, path: str, tamano: int) -> Tuple[Dict[str, int], float, float]:
+    """
+    Returns:
+        Tupla (conteos, segundos, memoria pico en MB). El tiempo se mide sin tracemalloc.
+    """
+    gc.collect()
+    inicio = time.perf_counter()
+    conteos = funcion(path, tamano)
+    segundos = time.perf_counter() - inicio
+
+    gc.collect()
+    tracemalloc.start()
+    funcion(path, tamano)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return conteos, segundos, pico / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de JSON completo vs. streaming para respuestas de Overpass")
+    parser.add_argument('respuestas', nargs='*', help="Respuestas grabadas (.json)")
+    parser.add_argument('--sintetico', type=int, metavar='HOTELES', help="Generar una respuesta sintética con N hoteles")
+    parser.add_argument('--ciudades', type=int, default=1000, help="Ciudades de la respuesta sintética")
+    parser.add_argument('--fragmento', type=int, default=TAMANO_FRAGMENTO_JSON, help="Bytes por fragmento en streaming")
+    parser.add_argument('--grabar', metavar='COUNTRY_CODE', help="Grabar la respuesta real de un país y salir")
+    parser.add_argument('-o', '--salida', help="Archivo para --grabar")
+    parser.add_argument('--url', default=OVERPASS_URL)
+    args = parser.parse_args()
+
+    if args.grabar:
+        salida = args.salida or f"overpass_{args.grabar}.json"
+        grabar_respuesta(args.grabar, salida, args.url)
+        print(f"💾 Respuesta guardada en {salida} ({os.path.getsize(salida) / 1e6:.1f} MB)")
+        return
+
+    respuestas = list(args.respuestas)
+    temporal = None
+    if args.sintetico:
+        temporal = tempfile.NamedTemporaryFile(suffix='.json', delete=False).name
+        escribir_respuesta_sintetica(temporal, args.sintetico, args.ciudades)
+        respuestas.append(temporal)
+    if not respuestas:
+        parser.error("Indica respuestas grabadas o --sintetico")
+
+    try:
+        print(f"{'respuesta':<28} {'MB':>7} {'modo':>10} {'segundos':>9} {'pico MB':>9}")
+        for path in respuestas:
+            nombre = 'sintética' if path == temporal else os.path.basename(path)
+            tamano_mb = os.path.getsize(path) / 1e6
+            resultados = {}
+            for modo, funcion in (('completo', procesar_completo), ('streaming', procesar_streaming)):
+                conteos, segundos, pico = medir(funcion, path, args.fragmento)
+                resultados[modo] = conteos
+                print(f"{nombre:<28} {tamano_mb:>7.1f} {modo:>10} {segundos:>9.2f} {pico:>9.1f}")
+            iguales = resultados['completo'] == resultados['streaming']
+            print(f"{'':<28} {'':>7} {'conteos':>10} {'iguales' if iguales else 'DISTINTOS':>9}")
+    finally:
+        if temporal:
+            os.remove(temporal)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# Caché de Resultados (LRU + TTL)
+# Caché acotada y compartida por todo el proceso para perfiles extraídos y vectores de
+# similitud. La clave es una huella canónica de los países elegidos (ordenados), los
+# pesos y la versión del dataset, así que un rerun con el mismo perfil no recalcula nada.
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+# Tamaño y vida por defecto de la caché compartida
+MAX_ENTRADAS = 256
+TTL_SEGUNDOS = 3600
+
+
+class CacheLRU:
+    """
+    Caché LRU con expiración por tiempo (TTL) y contadores de uso.
+
+    - Al superar max_entradas se descarta la entrada usada hace más tiempo (evicción).
+    - Una entrada con más de ttl_segundos se considera ausente y se elimina al consultarla.
+    - Es segura entre hilos (Streamlit atiende cada sesión en su propio hilo).
+    """
+
+    def __init__(self, max_entradas: int = MAX_ENTRADAS, ttl_segundos: float = TTL_SEGUNDOS,
+                 reloj: Callable[[], float] = time.monotonic):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self.reloj = reloj
+        self._datos: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.evicciones = 0
+        self.expiraciones = 0
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+    def obtener(self, clave: Hashable) -> Tuple[bool, Any]:
+        """
+        Returns:
+            Tupla (encontrado, valor)
+        """
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                guardado, valor = entrada
+                if self.reloj() - guardado <= self.ttl_segundos:
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return True, valor
+                del self._datos[clave]
+                self.expiraciones += 1
+            self.fallos += 1
+            return False, None
+
+    def guardar(self, clave: Hashable, valor: Any) -> None:
+        with self._lock:
+            self._datos[clave] = (self.reloj(), valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.evicciones += 1
+
+    def obtener_o_calcular(self, clave: Hashable, calcular: Callable[[], Any]) -> Any:
+        """
+        Devuelve el valor en caché o lo calcula (fuera del lock) y lo guarda.
+        """
+        encontrado, valor = self.obtener(clave)
+        if encontrado:
+            return valor
+        valor = calcular()
+        self.guardar(clave, valor)
+        return valor
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+    def descartar(self, predicado: Callable[[Hashable], bool]) -> int:
+        """
+        Elimina las entradas cuya clave cumple el predicado (p.ej. las de una versión
+        anterior del dataset). Devuelve cuántas se eliminaron.
+        """
+        with self._lock:
+            claves = [clave for clave in self._datos if predicado(clave)]
+            for clave in claves:
+                del self._datos[clave]
+            return len(claves)
+
+    def estadisticas(self) -> Dict:
+        """
+        Contadores para dimensionar la caché (tasa de aciertos, evicciones, ocupación).
+        """
+        total = self.aciertos + self.fallos
+        return {
+            'entradas': len(self._datos),
+            'max_entradas': self.max_entradas,
+            'ttl_segundos': self.ttl_segundos,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'evicciones': self.evicciones,
+            'expiraciones': self.expiraciones,
+            'tasa_aciertos': round(self.aciertos / total, 4) if total else 0.0,
+        }
+
+
+# Instancia compartida por todo el proceso
+CACHE_RESULTADOS = CacheLRU()
+
+
+# ============================================================================
+# HUELLAS CANÓNICAS
+# ============================================================================
+
+def _sha1_json(datos: Dict) -> str:
+    return hashlib.sha1(json.dumps(datos, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def huella_perfil(paises_ideales: List[str], paises_no_ideales: List[str], version_datos: str = '',
+                  anio: Optional[int] = None) -> str:
+    """
+    Huella de un perfil: el orden y los duplicados en la selección no cambian el resultado.
+    Con 'anio' (perfil extraído de la tabla vista desde ese año) la huella es distinta de
+    la del perfil sobre la tabla actual.
+    """
+    datos = {
+        'ideales': sorted(set(paises_ideales)),
+        'no_ideales': sorted(set(paises_no_ideales)),
+        'version': version_datos,
+    }
+    if anio is not None:
+        datos['anio'] = int(anio)
+    return _sha1_json(datos)
+
+
+def huella_contenido_perfil(perfil: Dict, version_datos: str = '') -> str:
+    """
+    Huella de un perfil sin 'huella' (p.ej. construido fuera del motor): usa solo
+    los campos de los que depende la similitud.
+    """
+    return _sha1_json({
+        'vector': perfil['vector_caracteristicas'],
+        'regiones_ideales': sorted(map(str, perfil['regiones_ideales'])),
+        'regiones_evitar': sorted(map(str, perfil['regiones_evitar'])),
+        'version': version_datos,
+    })
+
+
+def huella_pesos(pesos: Optional[Dict]) -> str:
+    return json.dumps(pesos or {}, sort_keys=True)
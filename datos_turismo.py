@@ -0,0 +1,693 @@
+# Capa de Datos del Recomendador Turístico
+# Limpieza del panel del Banco Mundial, cálculo de la tabla de destinos (último año por país),
+# snapshot binario columnar (.npz) para evitar re-parsear el CSV en cada arranque en frío,
+# ingesta por bloques con memoria acotada para paneles que no caben en RAM, modo compacto
+# (tipos reducidos) para bajar la memoria por worker y lectura de solo las filas agregadas
+# al final del CSV para refrescos incrementales.
+
+import io
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(SCRIPT_DIR, "world_tourism_economy_data.csv")
+CACHE_DIR = os.path.join(SCRIPT_DIR, "cache_datos")
+
+# Filas por bloque en la ingesta por bloques
+TAMANO_BLOQUE = 100_000
+
+# Años que conserva el panel reciente de la ingesta por bloques (igual que el almacén histórico)
+ANIOS_PANEL_RECIENTE = 10
+
+# Columnas numéricas del panel con cuantiles aproximados en la ingesta por bloques
+COLUMNAS_METRICAS = [
+    'tourism_receipts', 'tourism_arrivals', 'tourism_exports', 'tourism_departures',
+    'tourism_expenditures', 'gdp', 'inflation', 'unemployment',
+]
+
+# Identificadores que pasan a 'category' en el modo compacto
+COLUMNAS_IDENTIFICADORES = ['country', 'country_code']
+
+# Cambiar este número invalida todos los snapshots existentes (p.ej. si cambia la lógica de limpieza)
+VERSION_SNAPSHOT = 2
+
+# Lista exacta de agregaciones del Banco Mundial (entidades no-país)
+AGREGACIONES = [
+    'World',
+    'Euro area',
+    'European Union',
+    'High income',
+    'Low income',
+    'Middle income',
+    'Lower middle income',
+    'Upper middle income',
+    'Low & middle income',
+    'OECD members',
+    'East Asia & Pacific',
+    'East Asia & Pacific (excluding high income)',
+    'East Asia & Pacific (IDA & IBRD countries)',
+    'Europe & Central Asia',
+    'Europe & Central Asia (excluding high income)',
+    'Europe & Central Asia (IDA & IBRD countries)',
+    'Latin America & Caribbean',
+    'Latin America & Caribbean (excluding high income)',
+    'Latin America & the Caribbean (IDA & IBRD countries)',
+    'Middle East & North Africa',
+    'Middle East & North Africa (excluding high income)',
+    'Middle East & North Africa (IDA & IBRD countries)',
+    'South Asia',
+    'South Asia (IDA & IBRD)',
+    'Sub-Saharan Africa',
+    'Sub-Saharan Africa (excluding high income)',
+    'Sub-Saharan Africa (IDA & IBRD countries)',
+    'Small states',
+    'Caribbean small states',
+    'Pacific island small states',
+    'Other small states',
+    'Fragile and conflict affected situations',
+    'Heavily indebted poor countries (HIPC)',
+    'IDA & IBRD total',
+    'IDA blend',
+    'IDA only',
+    'IBRD only',
+    'IDA total',
+    'Least developed countries: UN classification',
+    'Arab World',
+    'Central Europe and the Baltics',
+    'Africa Eastern and Southern',
+    'Africa Western and Central',
+    'Early-demographic dividend',
+    'Late-demographic dividend',
+    'Pre-demographic dividend',
+    'Post-demographic dividend',
+    'North America',
+]
+
+
+# ============================================================================
+# SECCIÓN 1: LIMPIEZA Y MÉTRICAS DERIVADAS
+# ============================================================================
+
+def filtrar_agregaciones(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Excluye filas donde 'country' coincide exactamente con una agregación del Banco Mundial.
+    """
+    mask = ~df['country'].isin(AGREGACIONES)
+    return df[mask].copy()
+
+
+def calcular_destinos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcula la tabla de destinos: último registro con datos de turismo por país,
+    más las métricas derivadas 'costo_por_turista' y 'crecimiento_anual'.
+    La tabla se devuelve ordenada por 'costo_por_turista' (ascendente).
+
+    Args:
+        df: Panel histórico ya filtrado (sin agregaciones)
+
+    Returns:
+        DataFrame con una fila por país
+    """
+    # Para cada país, encontrar el último registro que tenga tourism_receipts O tourism_arrivals
+    df_latest = df[
+        (df['tourism_receipts'].notna()) | (df['tourism_arrivals'].notna())
+    ].sort_values(['country', 'year']).groupby('country').tail(1).copy()
+
+    if df_latest.empty:
+        # Si no hay datos de turismo, usar el más reciente de todas formas
+        df_latest = df.sort_values('year').groupby('country').tail(1).copy()
+
+    # Calcular tendencia: último valor de llegadas contra el último anterior al año máximo,
+    # leídos de la matriz densa país × año (sin groupby ni merge)
+    paises, _, valores = matriz_pais_anio(df, ['tourism_arrivals'])
+    relleno = rellenar_hacia_adelante(valores[0])
+    actual = relleno[:, -1]
+    anterior = relleno[:, -2] if relleno.shape[1] > 1 else np.full(len(paises), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crecimiento = (actual - anterior) / anterior * 100
+    df_crecimiento = pd.DataFrame({'country': paises,
+                                   'crecimiento_anual': np.where(np.isnan(crecimiento), 0.0, crecimiento)})
+
+    return _completar_destinos(df_latest, df_crecimiento)
+
+
+def matriz_pais_anio(df: pd.DataFrame, columnas: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reordena el panel largo como arrays densos país × año en una sola pasada (scatter).
+    Los años sin fila (o sin dato) quedan como NaN.
+
+    Args:
+        df: Panel con 'country', 'year' y las columnas pedidas
+        columnas: métricas a incluir
+
+    Returns:
+        Tupla (paises ordenados, anios consecutivos de min a max, valores de forma
+        (columnas × paises × anios) en float64)
+    """
+    if df.empty:
+        return np.array([], dtype=object), np.array([], dtype=np.int64), np.empty((len(columnas), 0, 0))
+    paises, fila = np.unique(df['country'].to_numpy(dtype=object), return_inverse=True)
+    anios_panel = df['year'].to_numpy(dtype=np.int64)
+    anio_min = anios_panel.min()
+    anios = np.arange(anio_min, anios_panel.max() + 1, dtype=np.int64)
+    columna_anio = anios_panel - anio_min
+
+    valores = np.full((len(columnas), len(paises), len(anios)), np.nan)
+    for c, col in enumerate(columnas):
+        valores[c, fila, columna_anio] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+    return paises, anios, valores
+
+
+def rellenar_hacia_adelante(valores: np.ndarray) -> np.ndarray:
+    """
+    Propaga el último valor no nulo a lo largo del último eje (años), vectorizado.
+    Las posiciones anteriores al primer dato quedan como NaN.
+    """
+    validos = ~np.isnan(valores)
+    indices = np.where(validos, np.arange(valores.shape[-1]), 0)
+    np.maximum.accumulate(indices, axis=-1, out=indices)
+    # Antes del primer dato el índice apunta a la posición 0, que en ese caso es NaN
+    return np.take_along_axis(valores, indices, axis=-1)
+
+
+def _completar_destinos(df_latest: pd.DataFrame, df_crecimiento: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parte final de calcular_destinos (compartida con la ingesta por bloques): costo por
+    turista, crecimiento, relleno de faltantes y orden por costo.
+
+    Args:
+        df_latest: último registro con datos de turismo por país, ordenado por país
+        df_crecimiento: columnas 'country' y 'crecimiento_anual'
+    """
+    # Calcular costo promedio por turista (solo si ambos están disponibles)
+    df_latest['costo_por_turista'] = np.where(
+        (df_latest['tourism_receipts'].notna()) & (df_latest['tourism_arrivals'].notna()),
+        df_latest['tourism_receipts'] / df_latest['tourism_arrivals'],
+        np.nan
+    )
+
+    df_latest = df_latest.merge(df_crecimiento, on='country', how='left')
+
+    # Mantener registros que tengan al menos tourism_arrivals o tourism_receipts
+    df_latest = df_latest[(df_latest['tourism_receipts'].notna()) | (df_latest['tourism_arrivals'].notna())].copy()
+
+    # Llenar valores faltantes con promedios razonables
+    df_latest['costo_por_turista'] = df_latest['costo_por_turista'].fillna(df_latest['costo_por_turista'].median())
+    df_latest['tourism_arrivals'] = df_latest['tourism_arrivals'].fillna(0)
+    df_latest['tourism_receipts'] = df_latest['tourism_receipts'].fillna(0)
+
+    # Mantener la tabla ordenada por costo: el filtro de presupuesto pasa a ser un prefijo
+    # (búsqueda binaria) y los índices/tablas derivados quedan alineados con ese orden
+    return df_latest.sort_values('costo_por_turista', kind='stable')
+
+
+def preparar_datos(df_crudo: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Aplica la limpieza completa al panel crudo leído del CSV.
+
+    Returns:
+        Tupla (df_panel, df_destinos): panel histórico limpio y tabla de destinos
+    """
+    df_panel = filtrar_agregaciones(df_crudo)
+    return df_panel, calcular_destinos(df_panel)
+
+
+# ============================================================================
+# SECCIÓN 2: SNAPSHOT BINARIO COLUMNAR
+# ============================================================================
+
+def huella_csv(csv_path: str, con_hash: bool = True) -> Dict:
+    """
+    Identifica la versión del CSV por tamaño, mtime y (opcionalmente) SHA-1 del contenido.
+    """
+    stat = os.stat(csv_path)
+    huella = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': ''}
+    if con_hash:
+        sha1 = hashlib.sha1()
+        with open(csv_path, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                sha1.update(bloque)
+        huella['sha1'] = sha1.hexdigest()
+    return huella
+
+
+def ruta_snapshot(csv_path: str, cache_dir: str = CACHE_DIR) -> str:
+    """
+    Ruta del snapshot asociado a un CSV (uno por archivo de origen).
+    """
+    nombre = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f"{nombre}.snapshot.npz")
+
+
+def _columnas_a_arrays(nombre: str, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Convierte un DataFrame en arrays tipados (sin pickle) para np.savez.
+    Las columnas de texto se guardan como unicode de ancho fijo + máscara de nulos.
+    """
+    arrays = {
+        f"{nombre}__columnas": np.array(df.columns.tolist(), dtype=str),
+        f"{nombre}__indice": df.index.to_numpy(dtype=np.int64),
+    }
+    for i, col in enumerate(df.columns):
+        serie = df[col]
+        if pd.api.types.is_numeric_dtype(serie):
+            arrays[f"{nombre}__c{i}"] = serie.to_numpy()
+        else:
+            nulos = serie.isna().to_numpy()
+            arrays[f"{nombre}__c{i}"] = serie.fillna('').astype(str).to_numpy(dtype=str)
+            arrays[f"{nombre}__n{i}"] = nulos
+    return arrays
+
+
+def _arrays_a_columnas(nombre: str, datos) -> pd.DataFrame:
+    """
+    Reconstruye un DataFrame guardado con _columnas_a_arrays.
+    """
+    columnas = datos[f"{nombre}__columnas"].tolist()
+    contenido = {}
+    for i, col in enumerate(columnas):
+        valores = datos[f"{nombre}__c{i}"]
+        if f"{nombre}__n{i}" in datos:
+            valores = valores.astype(object)
+            valores[datos[f"{nombre}__n{i}"]] = np.nan
+        contenido[col] = valores
+    return pd.DataFrame(contenido, index=pd.Index(datos[f"{nombre}__indice"]), columns=columnas)
+
+
+def guardar_snapshot(path: str, tablas: Dict[str, pd.DataFrame], huella: Dict) -> None:
+    """
+    Escribe las tablas en un .npz de forma atómica (archivo temporal + os.replace).
+    """
+    arrays = {
+        '__meta__version': np.array(VERSION_SNAPSHOT),
+        '__meta__size': np.array(huella['size'], dtype=np.int64),
+        '__meta__mtime_ns': np.array(huella['mtime_ns'], dtype=np.int64),
+        '__meta__sha1': np.array(huella['sha1']),
+        '__meta__tablas': np.array(list(tablas.keys()), dtype=str),
+    }
+    for nombre, df in tablas.items():
+        arrays.update(_columnas_a_arrays(nombre, df))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def leer_snapshot(path: str, csv_path: str) -> Optional[Dict[str, pd.DataFrame]]:
+    """
+    Lee el snapshot si sigue siendo válido para el CSV actual.
+
+    Primero compara tamaño+mtime (barato); si difieren, compara el SHA-1 del contenido,
+    de modo que un simple 'touch' o un checkout no invalida el snapshot.
+
+    Returns:
+        Dict {nombre_tabla: DataFrame} o None si no existe o está obsoleto
+    """
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path, allow_pickle=False) as datos:
+        if int(datos['__meta__version']) != VERSION_SNAPSHOT:
+            return None
+
+        huella = huella_csv(csv_path, con_hash=False)
+        misma_version = (
+            int(datos['__meta__size']) == huella['size'] and
+            int(datos['__meta__mtime_ns']) == huella['mtime_ns']
+        )
+        if not misma_version:
+            if str(datos['__meta__sha1']) != huella_csv(csv_path)['sha1']:
+                return None
+
+        return {nombre: _arrays_a_columnas(nombre, datos) for nombre in datos['__meta__tablas'].tolist()}
+
+
+def cargar_datos(csv_path: str = CSV_PATH, cache_dir: str = CACHE_DIR,
+                 usar_snapshot: bool = True, tamano_bloque: Optional[int] = None,
+                 compacto: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Carga el panel limpio y la tabla de destinos, reutilizando el snapshot si es válido.
+
+    Cualquier error al leer o escribir el snapshot se ignora en silencio y se recurre
+    al CSV (p.ej. snapshot corrupto, versión antigua o directorio de solo lectura).
+
+    Con tamano_bloque el CSV se ingiere por bloques (ver ingerir_csv) y no se usa el
+    snapshot: df_panel contiene solo los últimos ANIOS_PANEL_RECIENTE años.
+    Con compacto ambas tablas se devuelven con tipos reducidos (ver compactar_tabla);
+    el snapshot siempre guarda la precisión completa.
+
+    Returns:
+        Tupla (df_panel, df_destinos)
+    """
+    if compacto:
+        df_panel, df_destinos = cargar_datos(csv_path, cache_dir, usar_snapshot, tamano_bloque)
+        return compactar_tabla(df_panel), compactar_tabla(df_destinos)
+
+    if tamano_bloque:
+        ingesta = ingerir_csv(csv_path, tamano_bloque)
+        return ingesta.panel_reciente(), ingesta.destinos()
+
+    path = ruta_snapshot(csv_path, cache_dir)
+
+    if usar_snapshot:
+        try:
+            tablas = leer_snapshot(path, csv_path)
+            if tablas is not None:
+                return tablas['panel'], tablas['destinos']
+        except Exception:
+            pass
+
+    df_panel, df_destinos = preparar_datos(pd.read_csv(csv_path))
+
+    if usar_snapshot:
+        try:
+            guardar_snapshot(path, {'panel': df_panel, 'destinos': df_destinos}, huella_csv(csv_path))
+        except Exception:
+            pass
+
+    return df_panel, df_destinos
+
+
+# ============================================================================
+# SECCIÓN 3: INGESTA POR BLOQUES (MEMORIA ACOTADA)
+# ============================================================================
+
+def leer_panel_por_bloques(csv_path: str = CSV_PATH, tamano_bloque: int = TAMANO_BLOQUE,
+                           columnas: Optional[List[str]] = None,
+                           filtrar: bool = True) -> Iterator[pd.DataFrame]:
+    """
+    Lee el CSV en bloques de tamano_bloque filas, descartando las agregaciones en cada bloque.
+    """
+    for bloque in pd.read_csv(csv_path, chunksize=tamano_bloque, usecols=columnas):
+        yield filtrar_agregaciones(bloque) if filtrar else bloque
+
+
+class SketchCuantiles:
+    """
+    Cuantiles aproximados en streaming con error relativo acotado (buckets logarítmicos).
+
+    Cada valor v != 0 cae en el bucket ceil(log_gamma(|v|)); el cuantil devuelto está a
+    menos de precision_relativa (en términos relativos) del valor exacto. La memoria
+    depende del rango de magnitudes de los datos, no del número de filas, y dos sketches
+    con la misma precisión se pueden fusionar (p.ej. uno por worker).
+    """
+
+    def __init__(self, precision_relativa: float = 0.01):
+        self.precision_relativa = precision_relativa
+        self.gamma = (1 + precision_relativa) / (1 - precision_relativa)
+        self._log_gamma = np.log(self.gamma)
+        self.positivos: Dict[int, int] = {}
+        self.negativos: Dict[int, int] = {}
+        self.ceros = 0
+        self.n = 0
+        self.minimo = np.inf
+        self.maximo = -np.inf
+
+    def agregar(self, valores) -> None:
+        valores = np.asarray(valores, dtype=float)
+        valores = valores[~np.isnan(valores)]
+        if len(valores) == 0:
+            return
+        for buckets, magnitudes in ((self.positivos, valores[valores > 0]), (self.negativos, -valores[valores < 0])):
+            if len(magnitudes):
+                claves, conteos = np.unique(np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64),
+                                            return_counts=True)
+                for clave, conteo in zip(claves.tolist(), conteos.tolist()):
+                    buckets[clave] = buckets.get(clave, 0) + conteo
+        self.ceros += int((valores == 0).sum())
+        self.n += len(valores)
+        self.minimo = min(self.minimo, float(valores.min()))
+        self.maximo = max(self.maximo, float(valores.max()))
+
+    def fusionar(self, otro: 'SketchCuantiles') -> None:
+        for propios, ajenos in ((self.positivos, otro.positivos), (self.negativos, otro.negativos)):
+            for clave, conteo in ajenos.items():
+                propios[clave] = propios.get(clave, 0) + conteo
+        self.ceros += otro.ceros
+        self.n += otro.n
+        self.minimo = min(self.minimo, otro.minimo)
+        self.maximo = max(self.maximo, otro.maximo)
+
+    def _valor_bucket(self, clave: int) -> float:
+        return 2 * self.gamma ** clave / (self.gamma + 1)
+
+    def cuantil(self, q: float) -> float:
+        """
+        Cuantil q en [0, 1] (NaN si no hay datos).
+        """
+        if self.n == 0:
+            return np.nan
+        if q <= 0:
+            return self.minimo
+        if q >= 1:
+            return self.maximo
+        rango = q * (self.n - 1)
+        acumulado = 0
+        for clave in sorted(self.negativos, reverse=True):
+            acumulado += self.negativos[clave]
+            if acumulado > rango:
+                return max(-self._valor_bucket(clave), self.minimo)
+        acumulado += self.ceros
+        if acumulado > rango:
+            return 0.0
+        for clave in sorted(self.positivos):
+            acumulado += self.positivos[clave]
+            if acumulado > rango:
+                return min(self._valor_bucket(clave), self.maximo)
+        return self.maximo
+
+
+class IngestaPanel:
+    """
+    Estado incremental de la ingesta por bloques, equivalente a preparar_datos sobre el CSV completo.
+
+    Por cada bloque (ya sin agregaciones) mantiene:
+    - el último registro con datos de turismo por país (para la tabla de destinos)
+    - los dos últimos años con llegadas por país (llegadas actuales y del año previo
+      al máximo global, para 'crecimiento_anual')
+    - las filas de los últimos anios_recientes años (panel reciente para tendencias)
+    - cuantiles aproximados de cada métrica (SketchCuantiles)
+
+    La memoria depende del número de países y de la ventana de años, no del tamaño del archivo.
+    """
+
+    def __init__(self, anios_recientes: int = ANIOS_PANEL_RECIENTE, precision_cuantiles: float = 0.01):
+        self.anios_recientes = anios_recientes
+        self.filas = 0
+        self.anio_max = None
+        self.columnas: Optional[List[str]] = None
+        self._ultimos: Optional[pd.DataFrame] = None
+        self._llegadas: Optional[pd.DataFrame] = None
+        self._recientes: Optional[pd.DataFrame] = None
+        self.cuantiles = {col: SketchCuantiles(precision_cuantiles) for col in COLUMNAS_METRICAS}
+
+    @staticmethod
+    def _ultimas_filas(df: pd.DataFrame, n: int) -> pd.DataFrame:
+        # En empate de (país, año) gana la fila leída más tarde
+        return df.sort_values(['country', 'year'], kind='stable').groupby('country').tail(n)
+
+    def agregar_bloque(self, bloque: pd.DataFrame) -> None:
+        """
+        Incorpora un bloque del panel (sin agregaciones, ver leer_panel_por_bloques).
+        """
+        if self.columnas is None:
+            self.columnas = bloque.columns.tolist()
+        if bloque.empty:
+            return
+        self.filas += len(bloque)
+        anio_bloque = bloque['year'].max()
+        self.anio_max = anio_bloque if self.anio_max is None else max(self.anio_max, anio_bloque)
+
+        con_turismo = bloque[bloque['tourism_receipts'].notna() | bloque['tourism_arrivals'].notna()]
+        self._ultimos = self._ultimas_filas(pd.concat([self._ultimos, con_turismo]), 1)
+
+        llegadas = bloque.loc[bloque['tourism_arrivals'].notna(), ['country', 'year', 'tourism_arrivals']]
+        llegadas = pd.concat([self._llegadas, llegadas]).drop_duplicates(['country', 'year'], keep='last')
+        self._llegadas = self._ultimas_filas(llegadas, 2)
+
+        recientes = pd.concat([self._recientes, bloque[bloque['year'] >= self.anio_max - self.anios_recientes]])
+        self._recientes = recientes[recientes['year'] >= self.anio_max - self.anios_recientes]
+
+        for col, sketch in self.cuantiles.items():
+            if col in bloque:
+                sketch.agregar(bloque[col].to_numpy(dtype=float))
+
+    def _crecimiento(self) -> pd.DataFrame:
+        # 'last' de llegadas con y sin el año máximo: el previo es el último año < anio_max
+        llegadas = self._llegadas
+        ultima = llegadas.groupby('country').tail(1).set_index('country')['tourism_arrivals']
+        previas = llegadas[llegadas['year'] < self.anio_max].groupby('country').tail(1)
+        previa = previas.set_index('country')['tourism_arrivals']
+        paises = self._ultimos['country']
+        actual, anterior = ultima.reindex(paises).to_numpy(), previa.reindex(paises).to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crecimiento = (actual - anterior) / anterior * 100
+        return pd.DataFrame({'country': paises.to_numpy(),
+                             'crecimiento_anual': pd.Series(crecimiento).fillna(0).to_numpy()})
+
+    def destinos(self) -> pd.DataFrame:
+        """
+        Tabla de destinos con lo ingerido hasta ahora (igual que calcular_destinos).
+        """
+        if self._ultimos is None or self._ultimos.empty:
+            columnas = (self.columnas or []) + ['costo_por_turista', 'crecimiento_anual']
+            return pd.DataFrame(columns=columnas)
+        df_latest = self._ultimos.reset_index(drop=True)
+        return _completar_destinos(df_latest, self._crecimiento())
+
+    def panel_reciente(self) -> pd.DataFrame:
+        """
+        Filas de los últimos anios_recientes años (year >= anio_max - anios_recientes).
+        """
+        if self._recientes is None:
+            return pd.DataFrame(columns=self.columnas or [])
+        return self._recientes
+
+    def resumen_cuantiles(self, cuantiles: Tuple[float, ...] = (0.05, 0.25, 0.5, 0.75, 0.95)) -> pd.DataFrame:
+        """
+        Tabla métrica × cuantil (más n, mínimo y máximo) con los cuantiles aproximados.
+        """
+        filas = {}
+        for col, sketch in self.cuantiles.items():
+            fila = {'n': sketch.n, 'min': sketch.minimo if sketch.n else np.nan}
+            fila.update({f"p{int(q * 100)}": sketch.cuantil(q) for q in cuantiles})
+            fila['max'] = sketch.maximo if sketch.n else np.nan
+            filas[col] = fila
+        return pd.DataFrame.from_dict(filas, orient='index')
+
+
+def ingerir_csv(csv_path: str = CSV_PATH, tamano_bloque: int = TAMANO_BLOQUE,
+                anios_recientes: int = ANIOS_PANEL_RECIENTE) -> IngestaPanel:
+    """
+    Recorre el CSV por bloques y devuelve el estado final de la ingesta.
+    El pico de memoria queda acotado por tamano_bloque + estado por país.
+    """
+    ingesta = IngestaPanel(anios_recientes)
+    for bloque in leer_panel_por_bloques(csv_path, tamano_bloque):
+        ingesta.agregar_bloque(bloque)
+    return ingesta
+
+
+# ============================================================================
+# SECCIÓN 4: MODO COMPACTO Y REPORTE DE MEMORIA
+# ============================================================================
+
+def compactar_tabla(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copia de la tabla con tipos reducidos: identificadores como 'category', 'year' como
+    int16 y métricas float64 como float32 (~7 dígitos significativos, suficiente para
+    ordenar y puntuar). El orden de filas y el índice no cambian.
+    """
+    tipos = {}
+    for col in df.columns:
+        serie = df[col]
+        if col in COLUMNAS_IDENTIFICADORES:
+            tipos[col] = 'category'
+        elif col == 'year' and pd.api.types.is_integer_dtype(serie) and (
+                serie.empty or np.iinfo(np.int16).min <= serie.min() <= serie.max() <= np.iinfo(np.int16).max):
+            tipos[col] = np.int16
+        elif serie.dtype == np.float64:
+            tipos[col] = np.float32
+    return df.astype(tipos)
+
+
+def bytes_objeto(objeto) -> int:
+    """
+    Bytes ocupados por un DataFrame/Series (incluye strings e índice), un array o un
+    dict/lista de ellos.
+    """
+    if isinstance(objeto, pd.DataFrame):
+        return int(objeto.memory_usage(deep=True, index=True).sum())
+    if isinstance(objeto, pd.Series):
+        return int(objeto.memory_usage(deep=True, index=True))
+    if isinstance(objeto, np.ndarray):
+        return int(objeto.nbytes)
+    if isinstance(objeto, dict):
+        return sum(bytes_objeto(valor) for valor in objeto.values())
+    if isinstance(objeto, (list, tuple)):
+        return sum(bytes_objeto(valor) for valor in objeto)
+    return 0
+
+
+def reporte_memoria(tablas: Dict[str, object], tablas_compactas: Dict[str, object]) -> pd.DataFrame:
+    """
+    Bytes por tabla antes y después del modo compacto.
+
+    Returns:
+        DataFrame indexado por tabla con 'bytes', 'bytes_compacto' y 'ahorro_pct' (más fila 'total')
+    """
+    reporte = pd.DataFrame({
+        'bytes': {nombre: bytes_objeto(tabla) for nombre, tabla in tablas.items()},
+        'bytes_compacto': {nombre: bytes_objeto(tablas_compactas.get(nombre)) for nombre in tablas},
+    })
+    reporte.loc['total'] = reporte.sum()
+    reporte['ahorro_pct'] = (1 - reporte['bytes_compacto'] / reporte['bytes']).mul(100).round(1)
+    return reporte
+
+
+def reporte_memoria_csv(csv_path: str = CSV_PATH, cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """
+    reporte_memoria de las tablas de cargar_datos (panel y destinos) para un CSV.
+    """
+    df_panel, df_destinos = cargar_datos(csv_path, cache_dir)
+    return reporte_memoria({'panel': df_panel, 'destinos': df_destinos},
+                           {'panel': compactar_tabla(df_panel), 'destinos': compactar_tabla(df_destinos)})
+
+
+# ============================================================================
+# SECCIÓN 5: FILAS AGREGADAS AL FINAL DEL CSV (REFRESCO INCREMENTAL)
+# ============================================================================
+
+def leer_filas_agregadas(csv_path: str, huella_anterior: Dict) -> Optional[Tuple[pd.DataFrame, Dict]]:
+    """
+    Lee solo las filas agregadas al final del CSV desde la versión descrita por huella_anterior.
+
+    Comprueba que los primeros huella_anterior['size'] bytes siguen teniendo el mismo
+    SHA-1 (el archivo solo creció) y parsea únicamente los bytes nuevos. El hash se
+    continúa sobre los bytes nuevos, así que la huella nueva sale de una sola lectura.
+    Las filas nuevas conservan la numeración de filas del CSV completo y se devuelven
+    sin agregaciones.
+
+    Returns:
+        Tupla (df_nuevas, huella_nueva); df_nuevas vacío si el CSV no cambió.
+        None si el CSV se modificó de otra forma (hay que recargarlo completo).
+    """
+    huella = huella_csv(csv_path, con_hash=False)
+    if huella['size'] == huella_anterior['size'] and huella['mtime_ns'] == huella_anterior['mtime_ns']:
+        return pd.DataFrame(columns=pd.read_csv(csv_path, nrows=0).columns), dict(huella_anterior)
+    if not huella_anterior.get('sha1') or huella['size'] < huella_anterior['size']:
+        return None
+
+    sha1 = hashlib.sha1()
+    lineas = 0
+    ultimo_byte = b''
+    with open(csv_path, 'rb') as f:
+        restante = huella_anterior['size']
+        while restante > 0:
+            bloque = f.read(min(1 << 20, restante))
+            if not bloque:
+                return None
+            sha1.update(bloque)
+            lineas += bloque.count(b'\n')
+            ultimo_byte = bloque[-1:]
+            restante -= len(bloque)
+        if sha1.hexdigest() != huella_anterior['sha1']:
+            return None
+        nuevos = f.read()
+
+    sha1.update(nuevos)
+    huella['sha1'] = sha1.hexdigest()
+    columnas = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    if not nuevos.strip():
+        return pd.DataFrame(columns=columnas), huella
+    if ultimo_byte != b'\n':
+        return None  # la última fila anterior no estaba terminada: se habría modificado
+
+    df_nuevas = pd.read_csv(io.BytesIO(nuevos), header=None, names=columnas)
+    df_nuevas.index = pd.RangeIndex(lineas - 1, lineas - 1 + len(df_nuevas))
+    return filtrar_agregaciones(df_nuevas), huella
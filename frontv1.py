@@ -1,7 +1,5 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import os
 from datetime import datetime
 
 # --- Configuración de la Página ---
@@ -12,9 +10,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Inicializar session state para almacenar datos históricos
-if 'df_trend_historico' not in st.session_state:
-    st.session_state.df_trend_historico = None
+# Inicializar session state para el almacén de datos históricos (solo una referencia compartida)
+if 'historico' not in st.session_state:
+    st.session_state.historico = None
 
 # Inicializar session state para perfil de usuario
 if 'paises_ideales' not in st.session_state:
@@ -27,127 +25,36 @@ if 'perfil_datos' not in st.session_state:
     st.session_state.perfil_datos = None
 
 # --- Capa de Datos (Datos Reales) ---
-@st.cache_data
-def load_data():
-    """Carga datos históricos reales del CSV world_tourism_economy_data.csv"""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    csv_path = os.path.join(script_dir, "world_tourism_economy_data.csv")
-    
-    try:
-        df = pd.read_csv(csv_path)
-    except Exception as e:
-        st.error(f"Error al leer el CSV: {e}")
-        return pd.DataFrame()
-    
-    # Filtrar solo datos de países individuales (excluir agregaciones)
-    # Lista exacta de agregaciones del Banco Mundial (entidades no-país)
-    aggregations_exact = [
-        'World',
-        'Euro area',
-        'European Union',
-        'High income',
-        'Low income',
-        'Middle income',
-        'Lower middle income',
-        'Upper middle income',
-        'Low & middle income',
-        'OECD members',
-        'East Asia & Pacific',
-        'East Asia & Pacific (excluding high income)',
-        'East Asia & Pacific (IDA & IBRD countries)',
-        'Europe & Central Asia',
-        'Europe & Central Asia (excluding high income)',
-        'Europe & Central Asia (IDA & IBRD countries)',
-        'Latin America & Caribbean',
-        'Latin America & Caribbean (excluding high income)',
-        'Latin America & the Caribbean (IDA & IBRD countries)',
-        'Middle East & North Africa',
-        'Middle East & North Africa (excluding high income)',
-        'Middle East & North Africa (IDA & IBRD countries)',
-        'South Asia',
-        'South Asia (IDA & IBRD)',
-        'Sub-Saharan Africa',
-        'Sub-Saharan Africa (excluding high income)',
-        'Sub-Saharan Africa (IDA & IBRD countries)',
-        'Small states',
-        'Caribbean small states',
-        'Pacific island small states',
-        'Other small states',
-        'Fragile and conflict affected situations',
-        'Heavily indebted poor countries (HIPC)',
-        'IDA & IBRD total',
-        'IDA blend',
-        'IDA only',
-        'IBRD only',
-        'IDA total',
-        'Least developed countries: UN classification',
-        'Arab World',
-        'Central Europe and the Baltics',
-        'Africa Eastern and Southern',
-        'Africa Western and Central',
-        'Early-demographic dividend',
-        'Late-demographic dividend',
-        'Pre-demographic dividend',
-        'Post-demographic dividend',
-        'North America',
-    ]
-    
-    # Crear máscara: excluir filas donde country coincida exactamente con agregaciones
-    mask = ~df['country'].isin(aggregations_exact)
-    df = df[mask].copy()
-    
-    # Usar datos más recientes por país (buscar último año con datos de turismo)
-    df_latest = df.copy()
-    
-    # Para cada país, encontrar el último registro que tenga tourism_receipts O tourism_arrivals
-    df_latest = df_latest[
-        (df_latest['tourism_receipts'].notna()) | (df_latest['tourism_arrivals'].notna())
-    ].sort_values(['country', 'year']).groupby('country').tail(1).copy()
-    
-    if df_latest.empty:
-        # Si no hay datos de turismo, usar el más reciente de todas formas
-        df_latest = df.sort_values('year').groupby('country').tail(1).copy()
-    
-    # Calcular costo promedio por turista (solo si ambos están disponibles)
-    df_latest['costo_por_turista'] = np.where(
-        (df_latest['tourism_receipts'].notna()) & (df_latest['tourism_arrivals'].notna()),
-        df_latest['tourism_receipts'] / df_latest['tourism_arrivals'],
-        np.nan
-    )
-    
-    # Calcular tendencia
-    df_trend = df.sort_values('year').groupby('country').agg({
-        'tourism_arrivals': 'last',
-        'year': 'last'
-    }).reset_index()
-    
-    df_trend_prev = df[df['year'] < df['year'].max()].sort_values('year').groupby('country').agg({
-        'tourism_arrivals': 'last'
-    }).reset_index()
-    df_trend_prev.columns = ['country', 'tourism_arrivals_prev']
-    
-    df_trend = df_trend.merge(df_trend_prev, on='country', how='left')
-    df_trend['crecimiento_anual'] = ((df_trend['tourism_arrivals'] - df_trend['tourism_arrivals_prev']) 
-                                      / df_trend['tourism_arrivals_prev'] * 100).fillna(0)
-    
-    df_latest = df_latest.merge(df_trend[['country', 'crecimiento_anual']], on='country', how='left')
-    
-    # Mantener registros que tengan al menos tourism_arrivals o tourism_receipts
-    df_latest = df_latest[(df_latest['tourism_receipts'].notna()) | (df_latest['tourism_arrivals'].notna())].copy()
-    
-    # Llenar valores faltantes con promedios razonables
-    df_latest['costo_por_turista'] = df_latest['costo_por_turista'].fillna(df_latest['costo_por_turista'].median())
-    df_latest['tourism_arrivals'] = df_latest['tourism_arrivals'].fillna(0)
-    df_latest['tourism_receipts'] = df_latest['tourism_receipts'].fillna(0)
-    
-    # Guardar datos históricos completos para visualización de tendencias (últimos 10 años)
-    df_trend_completo = df[df['year'] >= df['year'].max() - 10].sort_values(['country', 'year'])
-    st.session_state.df_trend_historico = df_trend_completo
-    
-    return df_latest
+@st.cache_resource
+def load_motor():
+    """Motor de recomendación (datos + estructuras precalculadas), uno por proceso.
+    Carga world_tourism_economy_data.csv reutilizando el snapshot binario si el CSV no cambió."""
+    from motor_recomendacion import MotorRecomendacion
+    return MotorRecomendacion.desde_csv()
+
+
+@st.cache_resource
+def load_historico(version_datos: str):
+    """Almacén histórico memory-mapped (últimos 10 años), compartido por todas las sesiones.
+    Se vuelve a abrir cuando cambia la versión del dataset."""
+    from historico_turismo import cargar_historico
+    return cargar_historico()
+
+
+try:
+    motor = load_motor()
+except Exception as e:
+    st.error(f"Error al leer el CSV: {e}")
+    st.stop()
 
+# Refresco incremental si se agregaron filas al CSV (p.ej. un año nuevo del Banco Mundial)
+refresco = motor.actualizar_datos()
+if refresco['cambios']:
+    st.toast(f"🔄 Datos actualizados: {refresco['filas_nuevas']} filas nuevas "
+             f"({len(refresco['paises_afectados'])} países)")
 
-df_destinos = load_data()
+df_destinos = motor.df_destinos
+st.session_state.historico = load_historico(motor.version_datos)
 
 # Manejar el caso donde no hay datos válidos
 if df_destinos.empty:
@@ -173,6 +80,8 @@ presupuesto = st.sidebar.slider(
     help="Basado en el costo promedio por turista en cada destino"
 )
 
+st.sidebar.caption(f"💼 {motor.indice_presupuesto.n_hasta(presupuesto)} de {len(df_destinos)} destinos dentro de tu presupuesto")
+
 # 2. Input de Interés Turístico (basado en llegadas de turistas)
 interes_turistico = st.sidebar.select_slider(
     '¿Qué tan popular prefieres que sea el destino?',
@@ -181,6 +90,16 @@ interes_turistico = st.sidebar.select_slider(
     help="Basado en datos históricos de llegadas de turistas"
 )
 
+# Ventana del crecimiento (solo aplica a los modos basados en crecimiento)
+ventana_crecimiento = 1
+if interes_turistico == 'Emergentes (crecimiento)':
+    ventana_crecimiento = st.sidebar.select_slider(
+        'Crecimiento medido en los últimos (años):',
+        options=[1, 3, 5, 10],
+        value=1,
+        help="1 = variación del último año; más años = crecimiento anual compuesto (CAGR)"
+    )
+
 # 3. Input de Situación Económica
 salud_economica = st.sidebar.selectbox(
     '¿Qué estabilidad económica buscas?',
@@ -195,6 +114,14 @@ region = st.sidebar.selectbox(
     options=regiones_disponibles
 )
 
+# 5. Año de referencia (backtesting: qué se habría recomendado con los datos de ese año)
+anio_referencia = st.sidebar.selectbox(
+    'Datos de referencia:',
+    options=['Último disponible'] + sorted(motor.anios_disponibles(), reverse=True),
+    help="Recomienda con los datos conocidos hasta el año elegido"
+)
+as_of_year = None if anio_referencia == 'Último disponible' else int(anio_referencia)
+
 # ============================================
 # SECCIÓN: PERFIL DE USUARIO PERSONALIZADO
 # ============================================
@@ -229,17 +156,19 @@ st.session_state.paises_no_ideales = paises_no_ideales_input
 # Botón para generar perfil
 if st.sidebar.button('🎯 Generar Perfil Personalizado', use_container_width=True):
     try:
-        from perfil_usuario import extraer_perfil_usuario
-        
-        st.session_state.perfil_datos = extraer_perfil_usuario(
-            df_destinos,
+        # El acumulador es de una versión de los datos y un año de referencia
+        if st.session_state.get('acumulador_version') != (motor.version_datos, as_of_year):
+            st.session_state.acumulador_perfil = motor.nuevo_acumulador(as_of_year)
+            st.session_state.acumulador_version = (motor.version_datos, as_of_year)
+        st.session_state.perfil_datos = motor.generar_perfil(
             st.session_state.paises_ideales,
-            st.session_state.paises_no_ideales
+            st.session_state.paises_no_ideales,
+            acumulador=st.session_state.acumulador_perfil,
+            as_of_year=as_of_year
         )
+        st.session_state.perfil_as_of = as_of_year
         st.session_state.perfil_generado = True
         st.sidebar.success("✅ Perfil generado exitosamente")
-    except ImportError as e:
-        st.sidebar.error(f"⚠️ Error al cargar módulo de perfil: {e}")
     except Exception as e:
         st.sidebar.error(f"❌ Error al generar perfil: {e}")
 
@@ -249,87 +178,7 @@ if st.session_state.perfil_generado:
 else:
     st.sidebar.caption("💡 Tip: Selecciona destinos para activar el sistema de similitud")
 
-# --- Capa Lógica (Motor de Recomendación Mejorado) ---
-
-def generar_recomendaciones(df, presupuesto, interes_turistico, salud_economica, region, perfil_generado, perfil_datos):
-    """
-    Motor de recomendación unificado.
-    Combina filtros de viajero, métricas económicas y perfil de similitud personal.
-    """
-    df_filtrado = df.copy()
-
-    # --- PASO 1: Filtros directos ---
-    df_filtrado = df_filtrado[df_filtrado['costo_por_turista'] <= presupuesto]
-    if region != 'Todas':
-        df_filtrado = df_filtrado[df_filtrado['country'] == region]
-
-    if df_filtrado.empty:
-        return df_filtrado
-
-    # --- PASO 2: Score General (basado en sliders del "perfil de viajero") ---
-    # Score de Interés Turístico
-    if interes_turistico == 'Joyas ocultas (pocas llegadas)':
-        # Normaliza las llegadas y combina con el crecimiento
-        norm_arrivals = 1 - (df_filtrado['tourism_arrivals'] / df_filtrado['tourism_arrivals'].max())
-        norm_growth = df_filtrado['crecimiento_anual'] / 100
-        df_filtrado['score_turismo'] = (norm_arrivals + norm_growth) / 2
-    elif interes_turistico == 'Emergentes (crecimiento)':
-        # Prioriza crecimiento positivo
-        df_filtrado['score_turismo'] = np.maximum(df_filtrado['crecimiento_anual'], 0) / 100
-    else:  # Populares
-        # Prioriza destinos con más llegadas
-        df_filtrado['score_turismo'] = df_filtrado['tourism_arrivals'] / df_filtrado['tourism_arrivals'].max()
-
-    # Score de Estabilidad Económica
-    if salud_economica == 'Estable (baja inflación/desempleo)':
-        # Normaliza inflación y desempleo (menor es mejor)
-        inflation_norm = 1 - (df_filtrado['inflation'].fillna(df_filtrado['inflation'].median()) / df_filtrado['inflation'].max())
-        unemployment_norm = 1 - (df_filtrado['unemployment'].fillna(df_filtrado['unemployment'].median()) / df_filtrado['unemployment'].max())
-        df_filtrado['score_economia'] = (inflation_norm + unemployment_norm) / 2
-    elif salud_economica == 'En crecimiento (alta demanda)':
-        # Asocia crecimiento económico con crecimiento turístico
-        df_filtrado['score_economia'] = df_filtrado['crecimiento_anual'] / 100
-    else:  # Flexible
-        df_filtrado['score_economia'] = 0.5  # Puntaje neutral
-    
-    # Combinar scores de sliders en un "Score General"
-    df_filtrado['score_general'] = (df_filtrado['score_turismo'] * 0.6 + df_filtrado['score_economia'] * 0.4)
-
-    # --- PASO 3: Score de Similitud Personal (si el perfil personalizado está activo) ---
-    df_filtrado['similitud_score'] = 0.0
-    if perfil_generado and perfil_datos is not None:
-        try:
-            from perfil_usuario import calcular_similitud_para_todos
-            
-            df_filtrado['similitud_score'] = calcular_similitud_para_todos(
-                df_filtrado,
-                perfil_datos
-            )
-            
-            # Unificar los scores: 70% perfil personal, 30% perfil de viajero (sliders)
-            ponderacion_similitud = 0.7
-            ponderacion_general = 0.3
-            df_filtrado['score_final'] = (df_filtrado['similitud_score'] * ponderacion_similitud) + (df_filtrado['score_general'] * ponderacion_general)
-            
-            # Usar st.info para notificar al usuario que su perfil está siendo usado
-            st.info("🎯 Perfil Personalizado Activo. Las recomendaciones combinan tus gustos con los filtros generales.")
-
-        except Exception as e:
-            st.warning(f"⚠️ No se pudo calcular la similitud personalizada: {e}. Usando ranking general.")
-            df_filtrado['score_final'] = df_filtrado['score_general']
-    else:
-        # Si no hay perfil, el score final es simplemente el score general de los sliders
-        df_filtrado['score_final'] = df_filtrado['score_general']
-        
-    # --- PASO 4: Ordenar y devolver el TOP 10 ---
-    # Si hay perfil, se ordena por similitud y luego por score general. Si no, solo por score final.
-    if perfil_generado and perfil_datos is not None:
-        df_recomendado = df_filtrado.sort_values(by=['similitud_score', 'score_final'], ascending=False)
-    else:
-        df_recomendado = df_filtrado.sort_values('score_final', ascending=False)
-        
-    return df_recomendado.head(10)
-
+# --- Capa Lógica: ver motor_recomendacion.py (MotorRecomendacion) ---
 
 # --- Capa de Presentación (UI Principal) ---
 
@@ -364,17 +213,30 @@ if generar_btn or ('mostrar_recomendaciones' in st.session_state and st.session_
     st.session_state.mostrar_recomendaciones = True
     
     with st.spinner('Analizando datos y aplicando tu perfil... 📊'):
-        # Llamar a la función lógica unificada, pasando todos los parámetros necesarios
-        recomendaciones = generar_recomendaciones(
-            df=df_destinos,
-            presupuesto=presupuesto,
-            interes_turistico=interes_turistico,
-            salud_economica=salud_economica,
-            region=region,
-            perfil_generado=st.session_state.perfil_generado,
-            perfil_datos=st.session_state.perfil_datos
-        )
-
+        # Llamar al motor de recomendación, pasando todos los parámetros necesarios
+        perfil_activo = st.session_state.perfil_generado and st.session_state.perfil_datos is not None
+        if perfil_activo and st.session_state.get('perfil_as_of') != as_of_year:
+            # Se cambió el año de referencia: el perfil se rehace con los datos de ese año
+            st.session_state.perfil_datos = motor.generar_perfil(
+                st.session_state.paises_ideales, st.session_state.paises_no_ideales, as_of_year=as_of_year)
+            st.session_state.perfil_as_of = as_of_year
+        resultado = motor.recomendar({
+            'presupuesto': presupuesto,
+            'interes_turistico': interes_turistico,
+            'salud_economica': salud_economica,
+            'region': region,
+            'perfil': st.session_state.perfil_datos if perfil_activo else None,
+            'ventana_crecimiento': ventana_crecimiento,
+            'as_of_year': as_of_year
+        })
+        recomendaciones = resultado['recomendaciones']
+        
+        if resultado['as_of_year'] is not None:
+            st.caption(f"🕰️ Recomendaciones con los datos conocidos hasta {resultado['as_of_year']}")
+        if resultado['perfil_activo']:
+            st.info("🎯 Perfil Personalizado Activo. Las recomendaciones combinan tus gustos con los filtros generales.")
+        elif resultado['aviso']:
+            st.warning(f"⚠️ {resultado['aviso']}")
 
         if recomendaciones.empty:
             st.warning('⚠️ No se encontraron destinos que coincidan con todos tus criterios. Intenta ampliar tu búsqueda.')
@@ -433,7 +295,22 @@ if generar_btn or ('mostrar_recomendaciones' in st.session_state and st.session_
                                 row['similitud_score'],
                                 text=f"🎯 Similitud con tu Perfil: {similitud_pct:.1f}%"
                             )
-                        
+
+                        # Termómetro de Ambiente Turístico (agregados de hoteles precalculados por país)
+                        ambiente = motor.ambiente.termometro(row['country'])
+                        if ambiente is not None:
+                            st.progress(
+                                ambiente['valor'],
+                                text=f"{ambiente['icono']} Ambiente Turístico: {ambiente['nivel']} · "
+                                     f"{ambiente['total_hoteles']:,} hoteles en {ambiente['ciudades']:,} ciudades"
+                            )
+                            principales = ", ".join(f"{ciudad} ({conteo:,})" for ciudad, conteo in ambiente['top_ciudades'])
+                            por_mil = ambiente['hoteles_por_mil_llegadas']
+                            st.caption(
+                                f"🏨 Principales: {principales} · {ambiente['participacion_top'] * 100:.0f}% de los hoteles"
+                                + (f" · {por_mil:.2f} hoteles por cada mil llegadas" if pd.notna(por_mil) else "")
+                            )
+
                         # Información económica adicional
                         econ_col1, econ_col2, econ_col3 = st.columns(3)
                         with econ_col1:
@@ -461,6 +338,15 @@ if generar_btn or ('mostrar_recomendaciones' in st.session_state and st.session_
                         **Año Datos:** {int(row['year'])} | 
                         **Código País:** {row['country_code']}
                         """)
+
+                        # Más destinos como este (matriz de similitud precalculada)
+                        with st.expander(f"🔁 Más destinos como {row['country']}"):
+                            df_similares = motor.destinos_similares(row['country'], k=5)
+                            for _, similar in df_similares.iterrows():
+                                st.markdown(
+                                    f"- **{similar['country']}** · ${similar['costo_por_turista']:,.0f}/turista · "
+                                    f"similitud {similar['similitud_pais'] * 100:.1f}%"
+                                )
             
             with tab2:
                 # Tabla comparativa
@@ -548,6 +434,28 @@ if generar_btn or ('mostrar_recomendaciones' in st.session_state and st.session_
                             help="Clasificación preferida de destino"
                         )
                     
+                    # Destinos más cercanos al perfil (índice KD-tree con filtros de presupuesto/país)
+                    st.markdown("### 🧭 Destinos Más Cercanos a Tu Perfil")
+                    try:
+                        df_vecinos = motor.vecinos_perfil(perfil, k=5, presupuesto=presupuesto, region=region)
+                        if df_vecinos.empty:
+                            st.caption("No hay destinos cercanos dentro de tu presupuesto")
+                        else:
+                            df_vecinos = df_vecinos[['country', 'costo_por_turista', 'tourism_arrivals', 'distancia_perfil']]
+                            df_vecinos.columns = ['País', 'Costo/Turista ($)', 'Llegadas (M)', 'Distancia']
+                            df_vecinos['Llegadas (M)'] = df_vecinos['Llegadas (M)'] / 1e6
+                            st.dataframe(
+                                df_vecinos.style.format({
+                                    'Costo/Turista ($)': '{:,.0f}',
+                                    'Llegadas (M)': '{:.2f}',
+                                    'Distancia': '{:.2f}'
+                                }),
+                                use_container_width=True,
+                                hide_index=True
+                            )
+                    except Exception as e:
+                        st.warning(f"⚠️ No se pudieron calcular los destinos cercanos: {e}")
+                    
                     st.divider()
                     
                     # SECCIÓN 3: Gráfico Comparativo
@@ -635,10 +543,9 @@ if generar_btn or ('mostrar_recomendaciones' in st.session_state and st.session_
             #     st.subheader("📈 Tendencias de Densidad Turística")
             #     st.write("Analiza la tendencia de llegadas y salidas de turistas en los últimos 10 años")
 
-            #     if st.session_state.df_trend_historico is not None:
-            #         df_pais_trend = st.session_state.df_trend_historico[
-            #             st.session_state.df_trend_historico['country'] == pais_seleccionado
-            #         ].sort_values('year').copy()
+            #     if st.session_state.historico is not None:
+            #         # Slice O(1) del almacén compartido (ya ordenado por año)
+            #         df_pais_trend = st.session_state.historico.serie(pais_seleccionado)
             #         
             #         if not df_pais_trend.empty:
             #             # Gráfico de líneas: Llegadas y Salidas
@@ -657,11 +564,14 @@ if generar_btn or ('mostrar_recomendaciones' in st.session_state and st.session_
             #             
             #             llegadas_inicio = df_pais_trend['tourism_arrivals'].iloc[0]
             #             llegadas_final = df_pais_trend['tourism_arrivals'].iloc[-1]
-            #             porcentaje_llegadas = ((llegadas_final - llegadas_inicio) / llegadas_inicio * 100) if llegadas_inicio > 0 else 0
-            #             
             #             salidas_inicio = df_pais_trend['tourism_departures'].iloc[0]
             #             salidas_final = df_pais_trend['tourism_departures'].iloc[-1]
-            #             porcentaje_salidas = ((salidas_final - salidas_inicio) / salidas_inicio * 100) if salidas_inicio > 0 else 0
+            #
+            #             # Variación de la ventana leída de las matrices país × año precalculadas
+            #             i_pais = motor.tendencias.posicion_pais[pais_seleccionado]
+            #             ventana = len(df_pais_trend) - 1
+            #             porcentaje_llegadas = np.nan_to_num(motor.tendencias.variacion(ventana, 'tourism_arrivals')[i_pais])
+            #             porcentaje_salidas = np.nan_to_num(motor.tendencias.variacion(ventana, 'tourism_departures')[i_pais])
             #             
             #             # Mostrar métricas en columnas
             #             met_col1, met_col2, met_col3 = st.columns(3)
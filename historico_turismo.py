@@ -0,0 +1,447 @@
+# Almacén de Datos Históricos (Tendencias)
+# Panel de los últimos años guardado por país en bloques contiguos + índice de offsets,
+# respaldado por archivos .npy abiertos con memory-map: todos los workers del servidor
+# comparten las mismas páginas y cada sesión solo guarda una referencia al almacén.
+# Además, matrices densas país × año con crecimiento interanual, CAGR y medias móviles
+# calculadas en una sola pasada vectorizada, para leer el crecimiento de cualquier ventana,
+# y un índice "as-of" con la tabla de destinos tal como se veía en cada año (backtesting).
+
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from datos_turismo import (CACHE_DIR, CSV_PATH, _completar_destinos, cargar_datos, huella_csv, matriz_pais_anio,
+                           rellenar_hacia_adelante)
+
+# Métricas guardadas para cada (país, año)
+COLUMNAS_HISTORICO = [
+    'tourism_arrivals',
+    'tourism_departures',
+    'tourism_receipts',
+    'tourism_exports',
+    'tourism_expenditures',
+    'gdp',
+    'inflation',
+    'unemployment',
+]
+
+# Ventana de años para la vista de tendencias (igual que df_trend_historico)
+ANIOS_HISTORICO = 10
+
+# Cambiar este número invalida los archivos del almacén ya escritos
+VERSION_HISTORICO = 1
+
+# Series con matriz densa de tendencias (crecimiento, CAGR, medias móviles)
+COLUMNAS_TENDENCIAS = ['tourism_arrivals', 'tourism_receipts', 'tourism_departures']
+
+# Cambiar este número invalida las matrices de tendencias ya escritas
+VERSION_TENDENCIAS = 1
+
+# Arrays que componen el almacén; 'offsets' se escribe al final y marca el almacén como completo
+_ARRAYS = ['paises', 'columnas', 'anios', 'valores', 'offsets']
+
+
+class HistoricoTurismo:
+    """
+    Panel histórico de solo lectura con acceso O(1) por país.
+
+    - paises: array con los países (ordenados)
+    - offsets: array len(paises)+1; las filas del país i están en [offsets[i], offsets[i+1])
+    - anios: array con el año de cada fila
+    - valores: matriz (columnas × filas); cada métrica de un país es un bloque contiguo
+    """
+
+    def __init__(self, paises: np.ndarray, columnas: np.ndarray, anios: np.ndarray,
+                 valores: np.ndarray, offsets: np.ndarray):
+        self.paises = paises
+        self.columnas = [str(c) for c in columnas]
+        self.anios = anios
+        self.valores = valores
+        self.offsets = offsets
+        self.posicion_pais = {str(pais): i for i, pais in enumerate(paises)}
+        self.posicion_columna = {col: j for j, col in enumerate(self.columnas)}
+
+    def __len__(self) -> int:
+        return len(self.anios)
+
+    def __contains__(self, pais: str) -> bool:
+        return pais in self.posicion_pais
+
+    @classmethod
+    def desde_panel(cls, df: pd.DataFrame, anios: int = ANIOS_HISTORICO) -> 'HistoricoTurismo':
+        """
+        Construye el almacén (en memoria) a partir del panel limpio.
+        """
+        df_ventana = df[df['year'] >= df['year'].max() - anios].sort_values(['country', 'year'], kind='stable')
+        paises, inicios = np.unique(df_ventana['country'].to_numpy(dtype=str), return_index=True)
+        offsets = np.append(inicios, len(df_ventana)).astype(np.int64)
+        columnas = [col for col in COLUMNAS_HISTORICO if col in df_ventana]
+        valores = np.ascontiguousarray(df_ventana[columnas].to_numpy(dtype=np.float64).T)
+        return cls(paises, np.array(columnas, dtype=str), df_ventana['year'].to_numpy(dtype=np.int64), valores, offsets)
+
+    def guardar(self, directorio: str, etiqueta: str) -> None:
+        """
+        Escribe cada array como .npy (archivo temporal + os.replace), dejando 'offsets' para el final.
+        """
+        os.makedirs(directorio, exist_ok=True)
+        for nombre in _ARRAYS:
+            path = _ruta_array(directorio, etiqueta, nombre)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, getattr(self, nombre) if nombre != 'columnas' else np.array(self.columnas, dtype=str))
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def abrir(cls, directorio: str, etiqueta: str) -> Optional['HistoricoTurismo']:
+        """
+        Abre un almacén ya escrito. Años y valores quedan como memory-map de solo lectura.
+
+        Returns:
+            HistoricoTurismo o None si el almacén no existe (o quedó incompleto)
+        """
+        if not os.path.exists(_ruta_array(directorio, etiqueta, 'offsets')):
+            return None
+        arrays = {}
+        for nombre in _ARRAYS:
+            modo = 'r' if nombre in ('anios', 'valores') else None
+            arrays[nombre] = np.load(_ruta_array(directorio, etiqueta, nombre), mmap_mode=modo, allow_pickle=False)
+        return cls(**arrays)
+
+    def rango(self, pais: str) -> Tuple[int, int]:
+        """
+        Filas [inicio, fin) del país; (0, 0) si no está en el almacén.
+        """
+        i = self.posicion_pais.get(pais)
+        if i is None:
+            return 0, 0
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def anios_pais(self, pais: str) -> np.ndarray:
+        """
+        Años disponibles del país (vista sobre el memory-map, sin copia).
+        """
+        inicio, fin = self.rango(pais)
+        return self.anios[inicio:fin]
+
+    def valores_pais(self, pais: str, columna: str) -> np.ndarray:
+        """
+        Serie de una métrica del país, alineada con anios_pais (vista sin copia).
+        """
+        inicio, fin = self.rango(pais)
+        return self.valores[self.posicion_columna[columna], inicio:fin]
+
+    def serie(self, pais: str, columnas: List[str] = None) -> pd.DataFrame:
+        """
+        DataFrame año a año del país (columnas 'year' + métricas), ordenado por año.
+        """
+        if columnas is None:
+            columnas = self.columnas
+        datos = {'year': self.anios_pais(pais)}
+        for col in columnas:
+            datos[col] = self.valores_pais(pais, col)
+        return pd.DataFrame(datos)
+
+
+def _ruta_array(directorio: str, etiqueta: str, nombre: str) -> str:
+    return os.path.join(directorio, f"historico_{etiqueta}_{nombre}.npy")
+
+
+def cargar_historico(csv_path: str = CSV_PATH, cache_dir: str = CACHE_DIR,
+                     anios: int = ANIOS_HISTORICO) -> HistoricoTurismo:
+    """
+    Devuelve el almacén histórico memory-mapped para el CSV actual, construyéndolo si hace falta.
+
+    Los archivos llevan en el nombre el hash del CSV, así que un CSV nuevo genera un
+    almacén nuevo sin tocar los archivos que otros procesos puedan tener abiertos.
+    Si no se puede escribir en cache_dir se devuelve el almacén en memoria.
+    """
+    etiqueta = f"v{VERSION_HISTORICO}_{anios}_{huella_csv(csv_path)['sha1'][:16]}"
+    try:
+        historico = HistoricoTurismo.abrir(cache_dir, etiqueta)
+        if historico is not None:
+            return historico
+    except Exception:
+        pass
+
+    df_panel, _ = cargar_datos(csv_path, cache_dir)
+    historico = HistoricoTurismo.desde_panel(df_panel, anios)
+    try:
+        historico.guardar(cache_dir, etiqueta)
+        return HistoricoTurismo.abrir(cache_dir, etiqueta)
+    except Exception:
+        return historico
+
+
+# ============================================================================
+# MATRICES DE TENDENCIAS (PAÍS × AÑO)
+# ============================================================================
+
+_ARRAYS_TENDENCIAS = ['paises', 'columnas', 'anios', 'valores', 'relleno', 'crecimiento', 'acumulado', 'conteo']
+
+
+class TendenciasTurismo:
+    """
+    Series de turismo como arrays densos (columnas × países × años) más sus derivadas,
+    precalculadas una vez para todo el panel:
+
+    - valores: dato original (NaN si el país no reporta ese año)
+    - relleno: último valor disponible hasta cada año (forward fill)
+    - crecimiento: variación interanual en % del valor rellenado (misma fórmula que
+      'crecimiento_anual' de la tabla de destinos)
+    - acumulado / conteo: sumas prefijas de los datos y de los años con dato (con un 0
+      inicial), así que la media móvil de cualquier ventana es una resta de dos cortes
+
+    CAGR, variación total y medias móviles de cualquier ventana se leen sin groupby.
+    """
+
+    def __init__(self, paises: np.ndarray, columnas: np.ndarray, anios: np.ndarray, valores: np.ndarray,
+                 relleno: np.ndarray, crecimiento: np.ndarray, acumulado: np.ndarray, conteo: np.ndarray):
+        self.paises = paises
+        self.columnas = [str(c) for c in columnas]
+        self.anios = anios
+        self.valores = valores
+        self.relleno = relleno
+        self.crecimiento = crecimiento
+        self.acumulado = acumulado
+        self.conteo = conteo
+        self.posicion_pais = {str(pais): i for i, pais in enumerate(paises)}
+        self.posicion_columna = {col: j for j, col in enumerate(self.columnas)}
+
+    def __len__(self) -> int:
+        return len(self.paises)
+
+    def __contains__(self, pais: str) -> bool:
+        return pais in self.posicion_pais
+
+    @classmethod
+    def desde_panel(cls, df: pd.DataFrame, columnas: List[str] = None) -> 'TendenciasTurismo':
+        """
+        Construye las matrices a partir del panel limpio (una pasada vectorizada).
+        """
+        if columnas is None:
+            columnas = [col for col in COLUMNAS_TENDENCIAS if col in df]
+        paises, anios, valores = matriz_pais_anio(df, columnas)
+        relleno = rellenar_hacia_adelante(valores)
+
+        crecimiento = np.full_like(relleno, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crecimiento[..., 1:] = (relleno[..., 1:] - relleno[..., :-1]) / relleno[..., :-1] * 100
+
+        validos = ~np.isnan(valores)
+        forma_prefijo = valores.shape[:-1] + (valores.shape[-1] + 1,)
+        acumulado = np.zeros(forma_prefijo)
+        conteo = np.zeros(forma_prefijo, dtype=np.int32)
+        np.cumsum(np.where(validos, valores, 0.0), axis=-1, out=acumulado[..., 1:])
+        np.cumsum(validos, axis=-1, out=conteo[..., 1:])
+        return cls(paises.astype(str), np.array(columnas, dtype=str), anios, valores,
+                   relleno, crecimiento, acumulado, conteo)
+
+    def guardar(self, path: str) -> None:
+        """
+        Escribe el .npz de forma atómica (archivo temporal + os.replace).
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        arrays = {nombre: getattr(self, nombre) for nombre in _ARRAYS_TENDENCIAS}
+        arrays['columnas'] = np.array(self.columnas, dtype=str)
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def abrir(cls, path: str) -> Optional['TendenciasTurismo']:
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as datos:
+            return cls(**{nombre: datos[nombre] for nombre in _ARRAYS_TENDENCIAS})
+
+    def _posicion_anio(self, anio: Optional[int]) -> int:
+        # Sin año se usa el último del panel; un año fuera de rango queda acotado
+        if anio is None or len(self.anios) == 0:
+            return len(self.anios) - 1
+        return int(np.clip(anio - self.anios[0], 0, len(self.anios) - 1))
+
+    def crecimiento_anual(self, columna: str = 'tourism_arrivals', anio: Optional[int] = None) -> np.ndarray:
+        """
+        Variación interanual (%) de cada país en 'anio' (por defecto el último).
+        """
+        return self.crecimiento[self.posicion_columna[columna], :, self._posicion_anio(anio)]
+
+    def cagr(self, ventana: int, columna: str = 'tourism_arrivals', anio: Optional[int] = None) -> np.ndarray:
+        """
+        Tasa de crecimiento anual compuesta (%) de cada país en los 'ventana' años que
+        terminan en 'anio'. NaN si falta el valor inicial o no es positivo.
+        """
+        fin = self._posicion_anio(anio)
+        if ventana < 1 or fin - ventana < 0:
+            return np.full(len(self.paises), np.nan)
+        serie = self.relleno[self.posicion_columna[columna]]
+        final, inicial = serie[:, fin], serie[:, fin - ventana]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cagr = (np.power(final / inicial, 1.0 / ventana) - 1) * 100
+        return np.where(inicial > 0, cagr, np.nan)
+
+    def variacion(self, ventana: int, columna: str = 'tourism_arrivals', anio: Optional[int] = None) -> np.ndarray:
+        """
+        Variación total (%) de cada país en los 'ventana' años que terminan en 'anio'.
+        """
+        fin = self._posicion_anio(anio)
+        if ventana < 1 or fin - ventana < 0:
+            return np.full(len(self.paises), np.nan)
+        serie = self.relleno[self.posicion_columna[columna]]
+        final, inicial = serie[:, fin], serie[:, fin - ventana]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variacion = (final - inicial) / inicial * 100
+        return np.where(inicial > 0, variacion, np.nan)
+
+    def media_movil(self, ventana: int, columna: str = 'tourism_arrivals') -> np.ndarray:
+        """
+        Media de los datos disponibles en los últimos 'ventana' años, para cada país y
+        año (matriz países × años). NaN si la ventana no tiene ningún dato.
+        """
+        j = self.posicion_columna[columna]
+        fin = np.arange(1, len(self.anios) + 1)
+        inicio = np.maximum(fin - ventana, 0)
+        suma = self.acumulado[j][:, fin] - self.acumulado[j][:, inicio]
+        conteo = self.conteo[j][:, fin] - self.conteo[j][:, inicio]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(conteo > 0, suma / conteo, np.nan)
+
+    def serie(self, pais: str, columna: str = 'tourism_arrivals', ventana_media: int = 3) -> pd.DataFrame:
+        """
+        DataFrame año a año del país: valor, crecimiento interanual y media móvil.
+        Vacío si el país no está en las matrices.
+        """
+        i = self.posicion_pais.get(pais)
+        if i is None:
+            return pd.DataFrame(columns=['year', columna, 'crecimiento', 'media_movil'])
+        j = self.posicion_columna[columna]
+        valores = self.valores[j, i]
+        return pd.DataFrame({
+            'year': self.anios,
+            columna: valores,
+            # En los años sin dato el relleno no cambia: se muestra NaN en lugar de 0%
+            'crecimiento': np.where(np.isnan(valores), np.nan, self.crecimiento[j, i]),
+            'media_movil': self.media_movil(ventana_media, columna)[i],
+        })
+
+
+def ruta_tendencias(cache_dir: str, version_datos: str) -> str:
+    return os.path.join(cache_dir, f"tendencias_v{VERSION_TENDENCIAS}_{version_datos}.npz")
+
+
+def cargar_tendencias(df_panel: pd.DataFrame, cache_dir: Optional[str] = None,
+                      version_datos: str = '') -> TendenciasTurismo:
+    """
+    Devuelve las matrices de tendencias del panel, leyéndolas del disco si existen.
+
+    Como la similitud país-a-país, el archivo lleva la versión del dataset en el nombre;
+    además se comprueba que cubra los mismos años que el panel (la ingesta por bloques
+    solo conserva los años recientes). Sin cache_dir se construyen en memoria.
+    """
+    path = ruta_tendencias(cache_dir, version_datos) if cache_dir else None
+    if path:
+        try:
+            tendencias = TendenciasTurismo.abrir(path)
+            if (tendencias is not None and len(tendencias.anios) and not df_panel.empty
+                    and tendencias.anios[0] == df_panel['year'].min()
+                    and tendencias.anios[-1] == df_panel['year'].max()):
+                return tendencias
+        except Exception:
+            pass
+
+    tendencias = TendenciasTurismo.desde_panel(df_panel)
+    if path:
+        try:
+            tendencias.guardar(path)
+        except Exception:
+            pass
+    return tendencias
+
+
+# ============================================================================
+# ÍNDICE AS-OF (TABLA DE DESTINOS VISTA DESDE CADA AÑO)
+# ============================================================================
+
+class IndiceAsOf:
+    """
+    Para cada año Y del panel y cada país: posición en el panel de su último registro con
+    datos de turismo hasta Y, y el 'crecimiento_anual' que se habría calculado en Y.
+
+    Se construye una sola vez con dos uniones as-of ordenadas (merge_asof) sobre la grilla
+    país × año, en lugar de repetir calcular_destinos con el panel recortado a cada año.
+    destinos(Y) equivale a calcular_destinos(df_panel[df_panel['year'] <= Y]) y se guarda
+    por año, así que solo la primera consulta de cada año arma la tabla.
+    """
+
+    def __init__(self, df_panel: pd.DataFrame, anios: np.ndarray, paises: np.ndarray,
+                 posiciones: np.ndarray, crecimiento: np.ndarray):
+        self.df_panel = df_panel
+        self.anios = anios
+        self.paises = paises
+        self.posiciones = posiciones    # (años × países), -1 si el país aún no tiene datos
+        self.crecimiento = crecimiento  # (años × países)
+        self._destinos: Dict[int, pd.DataFrame] = {}
+
+    def __len__(self) -> int:
+        return len(self.anios)
+
+    @classmethod
+    def construir(cls, df_panel: pd.DataFrame) -> 'IndiceAsOf':
+        anios = np.unique(df_panel['year'].to_numpy(dtype=np.int64))
+        paises = np.unique(df_panel['country'].to_numpy(dtype=object))
+        grilla = pd.DataFrame({
+            'year': np.repeat(anios, len(paises)),
+            'country': np.tile(paises, len(anios)),
+        })
+        panel = pd.DataFrame({
+            'year': df_panel['year'].to_numpy(dtype=np.int64),
+            'country': df_panel['country'].to_numpy(dtype=object),
+            'posicion': np.arange(len(df_panel), dtype=np.int64),
+            'llegadas': df_panel['tourism_arrivals'].to_numpy(dtype=np.float64, na_value=np.nan),
+        })
+        con_turismo = (df_panel['tourism_receipts'].notna() | df_panel['tourism_arrivals'].notna()).to_numpy()
+
+        # Último registro con turismo hasta Y
+        registros = panel.loc[con_turismo, ['year', 'country', 'posicion']].sort_values('year', kind='stable')
+        ultimo = pd.merge_asof(grilla, registros, on='year', by='country', direction='backward')
+        posiciones = ultimo['posicion'].fillna(-1).to_numpy(dtype=np.int64).reshape(len(anios), len(paises))
+
+        # Crecimiento visto desde Y: últimas llegadas hasta Y contra las últimas antes de Y
+        llegadas = panel.loc[panel['llegadas'].notna(), ['year', 'country', 'llegadas']].sort_values('year', kind='stable')
+        actual = pd.merge_asof(grilla, llegadas, on='year', by='country', direction='backward')['llegadas']
+        grilla_previa = grilla.assign(year=grilla['year'] - 1)
+        anterior = pd.merge_asof(grilla_previa, llegadas, on='year', by='country', direction='backward')['llegadas']
+        actual = actual.to_numpy(dtype=np.float64).reshape(len(anios), len(paises))
+        anterior = anterior.to_numpy(dtype=np.float64).reshape(len(anios), len(paises))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crecimiento = (actual - anterior) / anterior * 100
+        crecimiento = np.where(np.isnan(crecimiento), 0.0, crecimiento)
+        return cls(df_panel, anios, paises, posiciones, crecimiento)
+
+    def anio_efectivo(self, anio: int) -> int:
+        """
+        Último año del panel que no supera 'anio' (los datos "conocidos" en ese momento).
+        """
+        i = np.searchsorted(self.anios, anio, side='right') - 1
+        if i < 0:
+            raise ValueError(f"No hay datos anteriores a {anio} (el panel empieza en {self.anios[0]})")
+        return int(self.anios[i])
+
+    def destinos(self, anio: int) -> pd.DataFrame:
+        """
+        Tabla de destinos tal como la habría calculado calcular_destinos en 'anio'
+        (ordenada por 'costo_por_turista', igual que la tabla actual).
+        """
+        anio = self.anio_efectivo(anio)
+        df_destinos = self._destinos.get(anio)
+        if df_destinos is None:
+            i = int(np.searchsorted(self.anios, anio))
+            con_datos = self.posiciones[i] >= 0
+            # Las filas se toman en orden de país, como el groupby de calcular_destinos
+            df_latest = self.df_panel.iloc[self.posiciones[i, con_datos]].copy()
+            df_crecimiento = pd.DataFrame({'country': self.paises, 'crecimiento_anual': self.crecimiento[i]})
+            df_destinos = _completar_destinos(df_latest, df_crecimiento)
+            self._destinos[anio] = df_destinos
+        return df_destinos
@@ -0,0 +1,335 @@
+# Índices sobre la Tabla de Destinos
+# Búsqueda de los k destinos más cercanos a un perfil (KD-tree sobre características
+# normalizadas), selección parcial del top-k sin ordenar todo el DataFrame y matriz
+# precalculada de similitud país-a-país para "destinos parecidos a X".
+
+import os
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from typing import Dict, List, Optional, Tuple
+
+from perfil_usuario import AcumuladorPerfil, ajustar_normalizador, calcular_similitud_lote
+
+# Mismas características que usa el vector del perfil (densidad, presupuesto, ingresos)
+CARACTERISTICAS_INDICE = ['tourism_arrivals', 'costo_por_turista', 'tourism_receipts']
+
+# Columna del filtro "región" de las consultas (en la tabla actual, un destino por país;
+# con destinos a nivel ciudad, cada región agrupa varias filas)
+COLUMNA_REGION = 'country'
+
+# Vecinos guardados por país en la matriz de similitud país-a-país
+K_SIMILARES = 20
+
+# Cambiar este número invalida las matrices de similitud ya escritas
+VERSION_SIMILITUD = 1
+
+
+# ============================================================================
+# SECCIÓN 1: SELECCIÓN TOP-K
+# ============================================================================
+
+def seleccionar_top_k(df: pd.DataFrame, columnas: List[str], k: int = 10) -> pd.DataFrame:
+    """
+    Equivalente a df.sort_values(columnas, ascending=False).head(k) sin ordenar todo el frame.
+
+    Usa np.partition sobre la primera columna para quedarse con los candidatos
+    (incluyendo empates) y solo ordena esos. Los NaN se tratan como -inf, así que
+    quedan al final igual que con sort_values.
+    """
+    if len(df) <= k:
+        return df.sort_values(by=columnas, ascending=False)
+
+    clave = df[columnas[0]].to_numpy(dtype=float)
+    clave = np.where(np.isnan(clave), -np.inf, clave)
+    umbral = np.partition(clave, len(clave) - k)[len(clave) - k]
+    candidatos = df[clave >= umbral]
+    return candidatos.sort_values(by=columnas, ascending=False).head(k)
+
+
+# ============================================================================
+# SECCIÓN 2: ÍNDICE ORDENADO POR PRESUPUESTO
+# ============================================================================
+
+class IndicePresupuesto:
+    """
+    Costos por turista ordenados para filtrar por presupuesto con búsqueda binaria.
+
+    Si el DataFrame ya viene ordenado por 'costo_por_turista' (como lo devuelve
+    datos_turismo.cargar_datos), el filtro es un slice de prefijo (sin copias);
+    si no, se guarda la permutación y el filtro devuelve posiciones.
+
+    El filtro de región también va dentro del índice: las posiciones de cada región
+    se guardan contiguas (ordenadas por costo) con una tabla de offsets, así que
+    región + presupuesto es un lookup y una búsqueda binaria en el bloque de la región.
+    """
+
+    def __init__(self, df: pd.DataFrame, columna_region: str = COLUMNA_REGION):
+        costos = df['costo_por_turista'].to_numpy(dtype=float)
+        self.ordenado = bool(np.all(costos[:-1] <= costos[1:])) if len(costos) > 1 else True
+        self.orden = np.arange(len(costos)) if self.ordenado else np.argsort(costos, kind='stable')
+        self.costos = costos if self.ordenado else costos[self.orden]
+
+        # Bloques por región sobre el orden por costo (argsort estable: conserva ese orden)
+        regiones, grupo = np.unique(df[columna_region].to_numpy(dtype=str)[self.orden], return_inverse=True)
+        por_region = np.argsort(grupo, kind='stable')
+        self.posiciones_region = self.orden[por_region]
+        self.costos_region = self.costos[por_region]
+        self.offsets_region = np.r_[0, np.cumsum(np.bincount(grupo, minlength=len(regiones)))].astype(np.int64)
+        self.posicion_region = {str(region): i for i, region in enumerate(regiones)}
+
+    def __len__(self) -> int:
+        return len(self.costos)
+
+    def n_hasta(self, presupuesto: float) -> int:
+        """
+        Número de destinos con costo_por_turista <= presupuesto (O(log n)).
+        """
+        return int(np.searchsorted(self.costos, float(presupuesto), side='right'))
+
+    def posiciones_hasta(self, presupuesto: float):
+        """
+        Selector posicional (para df.iloc o arrays alineados con df) de los destinos asequibles.
+        Devuelve un slice si el DataFrame original estaba ordenado.
+        """
+        n = self.n_hasta(presupuesto)
+        return slice(0, n) if self.ordenado else self.orden[:n]
+
+    def seleccionar(self, presupuesto: float, region: Optional[str] = None):
+        """
+        Selector posicional de los destinos asequibles de la región ('Todas' o None = sin
+        filtro de región), en orden de costo. O(log n) más el tamaño del resultado.
+        """
+        if region is None or region == 'Todas':
+            return self.posiciones_hasta(presupuesto)
+        i = self.posicion_region.get(region)
+        if i is None:
+            return np.array([], dtype=np.int64)
+        inicio, fin = int(self.offsets_region[i]), int(self.offsets_region[i + 1])
+        n = int(np.searchsorted(self.costos_region[inicio:fin], float(presupuesto), side='right'))
+        return self.posiciones_region[inicio:inicio + n]
+
+    def histograma(self, bordes: List[float]) -> np.ndarray:
+        """
+        Conteo de destinos en cada intervalo [bordes[i], bordes[i+1]) con una búsqueda
+        binaria por borde (O(len(bordes) · log n)), útil para un histograma en vivo.
+        """
+        cortes = np.searchsorted(self.costos, bordes, side='left')
+        return np.diff(cortes)
+
+
+# ============================================================================
+# SECCIÓN 3: ÍNDICE DE VECINOS MÁS CERCANOS
+# ============================================================================
+
+class IndiceDestinos:
+    """
+    Índice KD-tree sobre las características Z-score de los destinos.
+
+    Responde "los k destinos más parecidos a este vector de perfil" aplicando
+    los filtros de presupuesto y región (los mismos de generar_recomendaciones)
+    dentro de la búsqueda:
+    - región: sus posiciones salen del IndicePresupuesto (bloque de la región, ya
+      cortado por presupuesto) y se recorren por fuerza bruta
+    - presupuesto: los destinos asequibles son un prefijo del orden por costo; si el
+      prefijo es pequeño se recorre por fuerza bruta, si no se consulta el árbol
+      pidiendo más vecinos de los necesarios (según la selectividad) y se filtra.
+    """
+
+    def __init__(self, df: pd.DataFrame, tamano_hoja: int = 16):
+        self.df = df
+        self.scaler = ajustar_normalizador(df, CARACTERISTICAS_INDICE)
+        self.puntos = self._escalar(df[CARACTERISTICAS_INDICE].to_numpy(dtype=float))
+        self.arbol = cKDTree(self.puntos, leafsize=tamano_hoja)
+
+        self.costos = df['costo_por_turista'].to_numpy(dtype=float)
+        self.orden_costo = np.argsort(self.costos, kind='stable')
+        self.costos_ordenados = self.costos[self.orden_costo]
+        self.filtro = IndicePresupuesto(df)
+
+    def __len__(self) -> int:
+        return len(self.puntos)
+
+    def _escalar(self, valores: np.ndarray) -> np.ndarray:
+        return (valores - self.scaler.mean_) / self.scaler.scale_
+
+    def vector_desde_perfil(self, perfil: Dict) -> np.ndarray:
+        """
+        Convierte el vector_caracteristicas del perfil al espacio normalizado del índice.
+        """
+        vector = perfil['vector_caracteristicas']
+        return self._escalar(np.array([vector['densidad'], vector['presupuesto'], vector['ingresos']], dtype=float))
+
+    def _fuerza_bruta(self, vector: np.ndarray, posiciones: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        distancias = np.linalg.norm(self.puntos[posiciones] - vector, axis=1)
+        if len(posiciones) > k:
+            mejores = np.argpartition(distancias, k - 1)[:k]
+            posiciones, distancias = posiciones[mejores], distancias[mejores]
+        orden = np.argsort(distancias, kind='stable')
+        return posiciones[orden], distancias[orden]
+
+    def consultar(self, vector: np.ndarray, k: int = 10, presupuesto: Optional[float] = None,
+                  region: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Busca los k destinos más cercanos (distancia euclidiana en el espacio Z-score).
+
+        Args:
+            vector: vector normalizado (ver vector_desde_perfil)
+            k: número de vecinos
+            presupuesto: costo_por_turista máximo (None = sin filtro)
+            region: restringe a una región ('Todas' o None = sin filtro)
+
+        Returns:
+            Tupla (posiciones, distancias) ordenadas de más a menos cercano.
+            Las posiciones son posicionales (iloc) sobre el DataFrame del índice.
+        """
+        vacio = (np.array([], dtype=np.int64), np.array([], dtype=float))
+        if k <= 0 or len(self) == 0 or np.isnan(vector).any():
+            return vacio
+
+        if region is not None and region != 'Todas':
+            posiciones = self.filtro.seleccionar(np.inf if presupuesto is None else presupuesto, region)
+            if len(posiciones) == 0:
+                return vacio
+            return self._fuerza_bruta(vector, np.asarray(posiciones, dtype=np.int64), k)
+
+        n = len(self)
+        n_validos = n if presupuesto is None else int(np.searchsorted(self.costos_ordenados, presupuesto, side='right'))
+        if n_validos == 0:
+            return vacio
+
+        # Pedir al árbol k / selectividad vecinos (con margen); si el prefijo asequible
+        # es más pequeño que eso, recorrerlo por fuerza bruta es más barato
+        k_consulta = min(n, int(np.ceil(k * n / n_validos * 1.5)))
+        if n_validos <= max(4 * k, k_consulta):
+            return self._fuerza_bruta(vector, self.orden_costo[:n_validos], k)
+
+        while True:
+            distancias, posiciones = self.arbol.query(vector, k=k_consulta)
+            distancias, posiciones = np.atleast_1d(distancias), np.atleast_1d(posiciones)
+            if presupuesto is not None:
+                validos = self.costos[posiciones] <= presupuesto
+                distancias, posiciones = distancias[validos], posiciones[validos]
+            if len(posiciones) >= k or k_consulta == n:
+                return posiciones[:k].astype(np.int64), distancias[:k]
+            k_consulta = min(n, k_consulta * 2)
+
+    def vecinos_perfil(self, perfil: Dict, k: int = 10, presupuesto: Optional[float] = None,
+                       region: Optional[str] = None) -> pd.DataFrame:
+        """
+        Filas de los k destinos más cercanos al perfil, con la columna 'distancia_perfil'.
+        """
+        posiciones, distancias = self.consultar(self.vector_desde_perfil(perfil), k, presupuesto, region)
+        df_vecinos = self.df.iloc[posiciones].copy()
+        df_vecinos['distancia_perfil'] = distancias
+        return df_vecinos
+
+
+# ============================================================================
+# SECCIÓN 4: SIMILITUD PAÍS-A-PAÍS ("MÁS DESTINOS COMO ESTE")
+# ============================================================================
+
+class SimilitudPaises:
+    """
+    Matriz N×N (float32) de similitud híbrida entre destinos + top-k vecinos por país.
+
+    matriz[i, j] es la similitud del perfil "solo me gustó df.iloc[i]" con df.iloc[j]
+    (misma similitud_hibrida que el perfil personal). vecinos[i] guarda las posiciones
+    de los K_SIMILARES destinos más parecidos a i (sin incluirlo), de mayor a menor,
+    así que una consulta es una búsqueda en diccionario más un slice.
+    """
+
+    def __init__(self, paises: np.ndarray, matriz: np.ndarray, vecinos: np.ndarray):
+        self.paises = paises
+        self.matriz = matriz
+        self.vecinos = vecinos
+        self.posicion_pais = {str(pais): i for i, pais in enumerate(paises)}
+
+    def __len__(self) -> int:
+        return len(self.paises)
+
+    @classmethod
+    def construir(cls, df: pd.DataFrame, k: int = K_SIMILARES, pesos: Dict = None) -> 'SimilitudPaises':
+        """
+        Calcula la matriz con un perfil de un solo país por fila (acumulador incremental
+        + similitud en lote) y extrae los top-k vecinos de cada fila.
+        """
+        acumulador = AcumuladorPerfil(df)
+        perfiles = []
+        for pais in df['country'].tolist():
+            acumulador.agregar(pais)
+            perfiles.append(acumulador.perfil())
+            acumulador.quitar(pais)
+        matriz = calcular_similitud_lote(df, perfiles, pesos, dtype=np.float32)
+
+        # Excluir el propio país de sus vecinos; en empate gana la posición menor
+        k = min(k, max(len(df) - 1, 0))
+        candidatos = matriz.copy()
+        np.fill_diagonal(candidatos, -np.inf)
+        vecinos = np.argsort(-candidatos, axis=1, kind='stable')[:, :k].astype(np.int32)
+        return cls(df['country'].to_numpy(dtype=str), matriz, vecinos)
+
+    def guardar(self, path: str) -> None:
+        """
+        Escribe el .npz de forma atómica (archivo temporal + os.replace).
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, paises=self.paises, matriz=self.matriz, vecinos=self.vecinos)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def abrir(cls, path: str) -> Optional['SimilitudPaises']:
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as datos:
+            return cls(datos['paises'], datos['matriz'], datos['vecinos'])
+
+    def similares(self, pais: str, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            Tupla (posiciones, similitudes) de los k destinos más parecidos a 'pais',
+            de mayor a menor similitud (vacía si el país no está en la matriz)
+        """
+        i = self.posicion_pais.get(pais)
+        if i is None:
+            return np.array([], dtype=np.int32), np.array([], dtype=np.float32)
+        posiciones = self.vecinos[i, :k]
+        return posiciones, self.matriz[i, posiciones]
+
+    def similitud(self, pais_a: str, pais_b: str) -> float:
+        i, j = self.posicion_pais.get(pais_a), self.posicion_pais.get(pais_b)
+        return np.nan if i is None or j is None else float(self.matriz[i, j])
+
+
+def ruta_similitud_paises(cache_dir: str, version_datos: str) -> str:
+    return os.path.join(cache_dir, f"similitud_paises_v{VERSION_SIMILITUD}_{K_SIMILARES}_{version_datos}.npz")
+
+
+def cargar_similitud_paises(df: pd.DataFrame, cache_dir: Optional[str] = None,
+                            version_datos: str = '') -> SimilitudPaises:
+    """
+    Devuelve la matriz de similitud para los datos actuales, leyéndola del disco si existe.
+
+    El archivo se guarda junto al snapshot con la versión del dataset en el nombre, así
+    que un CSV nuevo provoca su reconstrucción. Sin cache_dir (o si falla la lectura o
+    la escritura) la matriz se construye en memoria.
+    """
+    path = ruta_similitud_paises(cache_dir, version_datos) if cache_dir else None
+    paises = df['country'].to_numpy(dtype=str)
+    if path:
+        try:
+            similitud = SimilitudPaises.abrir(path)
+            if similitud is not None and np.array_equal(similitud.paises, paises):
+                return similitud
+        except Exception:
+            pass
+
+    similitud = SimilitudPaises.construir(df)
+    if path:
+        try:
+            similitud.guardar(path)
+        except Exception:
+            pass
+    return similitud
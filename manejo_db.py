@@ -1,37 +1,64 @@
 import pandas as pd
-import io
+import numpy as np
 import os
 
+from datos_turismo import TAMANO_BLOQUE, IngestaPanel, leer_panel_por_bloques, reporte_memoria_csv
+
 # --- Ruta de tu archivo CSV ---
 script_dir = os.path.dirname(os.path.abspath(__file__))
 csv_data = os.path.join(script_dir, "world_tourism_economy_data.csv")
 # --------------------------------------
 
 try:
-    # Usamos io.StringIO para leer el string de texto como si fuera un archivo
-    # (Esto es solo para la simulación. Para un archivo real, usa: pd.read_csv("tu_archivo.csv"))
-    df = pd.read_csv(csv_data)
+    # El CSV se recorre por bloques (sin agregaciones del Banco Mundial): la memoria no
+    # depende del tamaño del archivo. Cada bloque actualiza contadores, sumas por país,
+    # el top de GDP y los cuantiles.
+    primeras_filas = None
+    tipos = None
+    no_nulos = None
+    total_filas = 0
+    suma_recibos_pais = pd.Series(dtype=float)
+    conteo_recibos_pais = pd.Series(dtype=float)
+    top_gdp = None
+    suma_desempleo = 0.0
+    conteo_desempleo = 0
+    ingesta = IngestaPanel()
+
+    for bloque in leer_panel_por_bloques(csv_data, TAMANO_BLOQUE):
+        if primeras_filas is None:
+            primeras_filas = bloque.head()
+            tipos = bloque.dtypes
+            no_nulos = bloque.notna().sum()
+        else:
+            no_nulos += bloque.notna().sum()
+        total_filas += len(bloque)
+
+        recibos = bloque.groupby('country')['tourism_receipts']
+        suma_recibos_pais = suma_recibos_pais.add(recibos.sum(), fill_value=0)
+        conteo_recibos_pais = conteo_recibos_pais.add(recibos.count(), fill_value=0)
+
+        top_gdp = pd.concat([top_gdp, bloque.nlargest(10, 'gdp')[['country', 'year', 'gdp']]]).nlargest(10, 'gdp')
+        suma_desempleo += bloque['unemployment'].sum()
+        conteo_desempleo += int(bloque['unemployment'].count())
+        ingesta.agregar_bloque(bloque)
 
     print("--- Análisis Básico del Archivo CSV ---")
     print("\n")
 
     # 1. Mostrar las primeras filas del DataFrame
     print("1. Primeras 5 filas de datos (.head()):")
-    print(df.head())
+    print(primeras_filas)
     print("-" * 40)
 
     # 2. Obtener información general (tipos de datos, nulos)
-    print("\n2. Información general y tipos de datos (.info()):")
-    # Redirigimos la salida de .info() para poder imprimirla
-    buffer = io.StringIO()
-    df.info(buf=buffer)
-    print(buffer.getvalue())
+    print("\n2. Información general y tipos de datos:")
+    print(f"  - Filas: {total_filas:,}")
+    print(pd.DataFrame({'no_nulos': no_nulos, 'tipo': tipos.astype(str)}))
     print("-" * 40)
 
-    # 3. Obtener estadísticas descriptivas para columnas numéricas
-    print("\n3. Estadísticas descriptivas (.describe()):")
-    # .describe() funciona automáticamente en todas las columnas numéricas
-    print(df.describe())
+    # 3. Estadísticas descriptivas (cuantiles aproximados, error relativo < 1%)
+    print("\n3. Estadísticas descriptivas (cuantiles aproximados):")
+    print(ingesta.resumen_cuantiles())
     print("-" * 40)
 
     # 4. Análisis Específico (Ejemplos basados en tus columnas)
@@ -39,23 +66,27 @@ try:
     
     # Calcular recibos de turismo promedio
     # Usamos :.2f para formatear a 2 decimales y , para separador de miles
-    recibos_promedio = df['tourism_receipts'].mean()
+    recibos_promedio = suma_recibos_pais.sum() / conteo_recibos_pais.sum()
     print(f"  - Recibos de turismo promedio (todos los países/años): {recibos_promedio:,.2f}")
 
     # Calcular recibos promedio por país (agrupando por si hay varios años)
-    recibos_por_pais = df.groupby('country')['tourism_receipts'].mean().sort_values(ascending=False)
+    recibos_por_pais = (suma_recibos_pais / conteo_recibos_pais.replace(0, np.nan)).sort_values(ascending=False)
     print("\n  - Recibos de turismo promedio por país:")
     print(recibos_por_pais)
 
     # Encontrar el país con el GDP más alto en el dataset
     # (Nota: 'gdp' en el ejemplo parece estar en distintas escalas, ej 1.4 vs 25.0, ¡ten cuidado!)
-    print("\n  - Países ordenados por GDP (solo como ejemplo):")
-    print(df.sort_values('gdp', ascending=False)[['country', 'year', 'gdp']])
+    print("\n  - Países con mayor GDP (solo como ejemplo):")
+    print(top_gdp)
     
     # Calcular tasa de desempleo promedio
-    desempleo_promedio = df['unemployment'].mean()
+    desempleo_promedio = suma_desempleo / conteo_desempleo
     print(f"\n  - Tasa de desempleo promedio: {desempleo_promedio:.2f}%")
 
+    # 5. Memoria de las tablas cargadas por la app (normal vs modo compacto)
+    print("\n5. Memoria por tabla (bytes, normal vs compacto):")
+    print(reporte_memoria_csv(csv_data))
+
 except FileNotFoundError:
     print("Error: No se encontró el archivo CSV. Asegúrate de que esté en la misma carpeta.")
 except KeyError as e:
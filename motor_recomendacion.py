@@ -0,0 +1,724 @@
+# Motor de Recomendación
+# Lógica de recomendación sin dependencia de Streamlit: scores de los sliders del
+# "perfil de viajero", similitud con el perfil personal y selección del top-k.
+# Como ambos sliders son discretos (3 × 3 opciones), los nueve vectores de score se
+# calculan una sola vez al cargar los datos y cada consulta se reduce a filtro + gather.
+
+import hashlib
+import threading
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from ambiente_turistico import HOTELES_PATH, AmbienteTuristico, cargar_ambiente
+from cache_resultados import CACHE_RESULTADOS, CacheLRU, huella_contenido_perfil, huella_perfil, huella_pesos
+from datos_turismo import (CACHE_DIR, CSV_PATH, IngestaPanel, bytes_objeto, cargar_datos, compactar_tabla,
+                           guardar_snapshot, huella_csv, ingerir_csv, leer_filas_agregadas, ruta_snapshot)
+from historico_turismo import IndiceAsOf, TendenciasTurismo, cargar_tendencias
+from indice_destinos import IndiceDestinos, IndicePresupuesto, SimilitudPaises, cargar_similitud_paises, seleccionar_top_k
+from perfil_usuario import (AcumuladorPerfil, CodificadorCategorias, calcular_similitud_para_todos,
+                            extraer_perfil_usuario)
+
+OPCIONES_INTERES = [
+    'Joyas ocultas (pocas llegadas)',
+    'Emergentes (crecimiento)',
+    'Populares (muchas llegadas)',
+]
+
+OPCIONES_SALUD = [
+    'Flexible (cualquiera)',
+    'Estable (baja inflación/desempleo)',
+    'En crecimiento (alta demanda)',
+]
+
+# Peso de cada slider en el "Score General"
+PESO_TURISMO = 0.6
+PESO_ECONOMIA = 0.4
+
+# Con perfil activo: 70% perfil personal, 30% perfil de viajero (sliders)
+PONDERACION_SIMILITUD = 0.7
+PONDERACION_GENERAL = 0.3
+
+# Valores por defecto de una consulta (mismos que la UI)
+CONSULTA_POR_DEFECTO = {
+    'presupuesto': 2000,
+    'interes_turistico': 'Populares (muchas llegadas)',
+    'salud_economica': 'Flexible (cualquiera)',
+    'region': 'Todas',
+    'perfil': None,
+    'k': 10,
+    # Años del crecimiento usado por los modos de crecimiento (1 = interanual; >1 = CAGR)
+    'ventana_crecimiento': 1,
+    # Año desde el que se recomienda (None = último disponible; un año = backtesting)
+    'as_of_year': None,
+}
+
+
+# ============================================================================
+# SECCIÓN 1: SCORES POR SLIDER
+# ============================================================================
+
+def calcular_score_turismo(df: pd.DataFrame, interes_turistico: str) -> pd.Series:
+    """
+    Score de Interés Turístico (normalizado contra el catálogo recibido).
+    """
+    if interes_turistico == 'Joyas ocultas (pocas llegadas)':
+        # Normaliza las llegadas y combina con el crecimiento
+        norm_arrivals = 1 - (df['tourism_arrivals'] / df['tourism_arrivals'].max())
+        norm_growth = df['crecimiento_anual'] / 100
+        return (norm_arrivals + norm_growth) / 2
+    elif interes_turistico == 'Emergentes (crecimiento)':
+        # Prioriza crecimiento positivo
+        return np.maximum(df['crecimiento_anual'], 0) / 100
+    else:  # Populares
+        # Prioriza destinos con más llegadas
+        return df['tourism_arrivals'] / df['tourism_arrivals'].max()
+
+
+def calcular_score_economia(df: pd.DataFrame, salud_economica: str) -> pd.Series:
+    """
+    Score de Estabilidad Económica (normalizado contra el catálogo recibido).
+    """
+    if salud_economica == 'Estable (baja inflación/desempleo)':
+        # Normaliza inflación y desempleo (menor es mejor)
+        inflation_norm = 1 - (df['inflation'].fillna(df['inflation'].median()) / df['inflation'].max())
+        unemployment_norm = 1 - (df['unemployment'].fillna(df['unemployment'].median()) / df['unemployment'].max())
+        return (inflation_norm + unemployment_norm) / 2
+    elif salud_economica == 'En crecimiento (alta demanda)':
+        # Asocia crecimiento económico con crecimiento turístico
+        return df['crecimiento_anual'] / 100
+    else:  # Flexible
+        return pd.Series(0.5, index=df.index)  # Puntaje neutral
+
+
+def calcular_score_general(df: pd.DataFrame, interes_turistico: str, salud_economica: str) -> np.ndarray:
+    """
+    Combina los scores de sliders en un "Score General" (array alineado con df).
+    """
+    score = (calcular_score_turismo(df, interes_turistico) * PESO_TURISMO +
+             calcular_score_economia(df, salud_economica) * PESO_ECONOMIA)
+    return score.to_numpy(dtype=float)
+
+
+# ============================================================================
+# SECCIÓN 2: TABLA PRECALCULADA
+# ============================================================================
+
+def precalcular_scores(df: pd.DataFrame) -> Dict[Tuple[str, str], np.ndarray]:
+    """
+    Materializa el Score General para las 9 combinaciones de sliders.
+
+    Returns:
+        Dict {(interes_turistico, salud_economica): array alineado posicionalmente con df}
+    """
+    # Cada componente se calcula una sola vez (3 + 3) y luego se combinan las 9 parejas
+    turismo = {interes: calcular_score_turismo(df, interes).to_numpy(dtype=float) for interes in OPCIONES_INTERES}
+    economia = {salud: calcular_score_economia(df, salud).to_numpy(dtype=float) for salud in OPCIONES_SALUD}
+    return {
+        (interes, salud): turismo[interes] * PESO_TURISMO + economia[salud] * PESO_ECONOMIA
+        for interes in OPCIONES_INTERES
+        for salud in OPCIONES_SALUD
+    }
+
+
+# ============================================================================
+# SECCIÓN 3: GENERACIÓN DE RECOMENDACIONES
+# ============================================================================
+
+def generar_recomendaciones(df: pd.DataFrame, presupuesto: float, interes_turistico: str,
+                            salud_economica: str, region: str, perfil_datos: Optional[Dict] = None,
+                            tabla_scores: Dict = None, indice_presupuesto: IndicePresupuesto = None,
+                            k: int = 10, similitud: np.ndarray = None, as_of_year: Optional[int] = None,
+                            indice_as_of: IndiceAsOf = None) -> Tuple[pd.DataFrame, Optional[str]]:
+    """
+    Motor de recomendación unificado.
+    Combina filtros de viajero, métricas económicas y perfil de similitud personal.
+    
+    Args:
+        df: tabla de destinos
+        presupuesto: costo_por_turista máximo
+        interes_turistico, salud_economica: opciones de los sliders (ver OPCIONES_*)
+        region: país a filtrar o 'Todas'
+        perfil_datos: perfil de extraer_perfil_usuario (None = sin perfil personal)
+        tabla_scores: resultado de precalcular_scores(df). Si se pasa, el Score General
+                      se toma de la tabla (gather) en lugar de recalcularse.
+        indice_presupuesto: IndicePresupuesto construido sobre df. Si se pasa, los filtros
+                            de presupuesto y región se resuelven dentro del índice (búsqueda
+                            binaria en el bloque de la región) en lugar de con máscaras.
+        k: número de recomendaciones
+        similitud: similitud del perfil con cada destino de df (p.ej. desde caché). Si se
+                   pasa, se usa en lugar de llamar a calcular_similitud_para_todos.
+        as_of_year: recomendar con los datos conocidos en ese año (requiere indice_as_of).
+                    df pasa a ser indice_as_of.destinos(as_of_year); tabla_scores,
+                    indice_presupuesto y similitud, si se pasan, deben estar calculados
+                    sobre esa tabla (ver MotorRecomendacion.recomendar).
+        indice_as_of: IndiceAsOf construido sobre el panel histórico
+    
+    Returns:
+        Tupla (df_recomendado, aviso). 'aviso' describe un error al calcular la
+        similitud personal (en ese caso se usa el ranking general) o es None.
+    """
+    if as_of_year is not None:
+        if indice_as_of is None:
+            raise ValueError("as_of_year requiere indice_as_of")
+        df = indice_as_of.destinos(as_of_year)
+
+    # --- PASO 1: Filtros directos ---
+    # Con el índice, presupuesto y región se resuelven dentro de él (bloque de la región +
+    # búsqueda binaria); solo los candidatos que pasan ambos filtros llegan al scoring
+    if indice_presupuesto is not None:
+        seleccion = indice_presupuesto.seleccionar(presupuesto, region)
+    else:
+        seleccion = np.flatnonzero(df['costo_por_turista'].to_numpy() <= presupuesto)
+        if region != 'Todas':
+            seleccion = seleccion[(df['country'].iloc[seleccion] == region).to_numpy()]
+
+    posiciones = np.arange(len(df))[seleccion]
+    if len(posiciones) == 0:
+        return df.iloc[posiciones], None
+
+    # Solo se materializan las columnas de score de los candidatos (sin copiar sus filas);
+    # las filas completas se toman al final, únicamente para el top-k
+    scores = pd.DataFrame(index=posiciones)
+
+    # --- PASO 2: Score General (basado en sliders del "perfil de viajero") ---
+    # Los scores se normalizan contra el catálogo completo, así que no dependen del presupuesto
+    if tabla_scores is not None:
+        score_general = tabla_scores[(interes_turistico, salud_economica)]
+    else:
+        score_general = calcular_score_general(df, interes_turistico, salud_economica)
+    scores['score_general'] = score_general[seleccion]
+
+    # --- PASO 3: Score de Similitud Personal (si el perfil personalizado está activo) ---
+    aviso = None
+    scores['similitud_score'] = 0.0
+    if perfil_datos is not None:
+        try:
+            if similitud is not None:
+                scores['similitud_score'] = similitud[seleccion]
+            else:
+                scores['similitud_score'] = calcular_similitud_para_todos(df.iloc[seleccion], perfil_datos).to_numpy()
+            scores['score_final'] = (scores['similitud_score'] * PONDERACION_SIMILITUD +
+                                     scores['score_general'] * PONDERACION_GENERAL)
+        except Exception as e:
+            aviso = f"No se pudo calcular la similitud personalizada: {e}. Usando ranking general."
+            scores['score_final'] = scores['score_general']
+    else:
+        # Si no hay perfil, el score final es simplemente el score general de los sliders
+        scores['score_final'] = scores['score_general']
+
+    # --- PASO 4: Ordenar y devolver el TOP k ---
+    # Si hay perfil, se ordena por similitud y luego por score general. Si no, solo por score final.
+    # Selección parcial (top-k): no hace falta ordenar todo el DataFrame
+    columnas_orden = ['similitud_score', 'score_final'] if perfil_datos is not None else ['score_final']
+    top = seleccionar_top_k(scores, columnas_orden, k=k)
+    df_top = df.iloc[top.index.to_numpy()].assign(**{col: top[col].to_numpy() for col in scores.columns})
+    return df_top, aviso
+
+
+# ============================================================================
+# SECCIÓN 4: MOTOR SIN INTERFAZ
+# ============================================================================
+
+class _EstadoAnual:
+    """
+    Tabla de destinos y estructuras precalculadas para un año de datos (anio=None: la actual).
+    """
+
+    def __init__(self, anio: Optional[int], df_destinos: pd.DataFrame, tabla_scores: Dict,
+                 indice_presupuesto: IndicePresupuesto, codificador: CodificadorCategorias):
+        self.anio = anio
+        self.df_destinos = df_destinos
+        self.tabla_scores = tabla_scores
+        self.indice_presupuesto = indice_presupuesto
+        self.codificador = codificador
+
+
+class _DatosMotor:
+    """
+    Versión publicada de los datos del motor: version_datos, tablas, estado de la tabla
+    actual y los índices derivados de ellos (los perezosos se completan en su primer uso,
+    siempre desde estas mismas tablas). actualizar_datos arma una nueva y la publica con
+    una sola asignación; cada operación lee la referencia una vez y usa solo esa versión.
+    """
+
+    def __init__(self, version_datos: str, df_destinos: pd.DataFrame, df_panel: Optional[pd.DataFrame],
+                 actual: _EstadoAnual):
+        self.version_datos = version_datos
+        self.df_destinos = df_destinos
+        self.df_panel = df_panel
+        self.actual = actual
+        self.indice_vecinos: Optional[IndiceDestinos] = None
+        self.similitud_paises: Optional[SimilitudPaises] = None
+        self.tendencias: Optional[TendenciasTurismo] = None
+        self.ambiente: Optional[AmbienteTuristico] = None
+        self.indice_as_of: Optional[IndiceAsOf] = None
+        self.estados_anuales: Dict[int, _EstadoAnual] = {}
+
+
+class MotorRecomendacion:
+    """
+    Motor de recomendación independiente de Streamlit.
+
+    Carga los datos una vez y mantiene las estructuras precalculadas (tabla de scores,
+    índice de presupuesto, índice KD-tree). Se puede usar desde la app, un worker,
+    un servicio o un benchmark:
+
+        motor = MotorRecomendacion()
+        resultado = motor.recomendar({'presupuesto': 1500, 'interes_turistico': ...})
+    """
+
+    def __init__(self, df_destinos: pd.DataFrame, df_panel: pd.DataFrame = None,
+                 version_datos: str = None, cache: CacheLRU = None, cache_dir: Optional[str] = None,
+                 compacto: bool = False, csv_path: Optional[str] = None, huella_datos: Optional[Dict] = None,
+                 hoteles_path: str = HOTELES_PATH):
+        if version_datos is None:
+            version_datos = hashlib.sha1(pd.util.hash_pandas_object(df_destinos).to_numpy().tobytes()).hexdigest()[:16]
+        self.cache = cache if cache is not None else CACHE_RESULTADOS
+        # En modo compacto las estructuras derivadas también se guardan en float32
+        self.compacto = compacto
+        self.dtype_scores = np.float32 if compacto else np.float64
+        self.cache_dir = cache_dir
+        # Origen de los datos, para actualizar_datos()
+        self.csv_path = csv_path
+        self.huella_datos = huella_datos
+        # Hoteles por ciudad para el termómetro de ambiente turístico
+        self.hoteles_path = hoteles_path
+        self._ingesta: Optional[IngestaPanel] = None
+        self._lock_actualizacion = threading.Lock()
+        self._instalar_datos(df_destinos, df_panel, version_datos)
+
+    def _instalar_datos(self, df_destinos: pd.DataFrame, df_panel: Optional[pd.DataFrame], version_datos: str) -> None:
+        """
+        Calcula las estructuras derivadas de df_destinos y las publica con una sola
+        asignación (ver _DatosMotor): una consulta en curso sigue con la versión que leyó.
+        Los índices perezosos (KD-tree, similitud país-a-país) se reconstruyen en su próximo uso.
+        """
+        tabla_scores = {clave: scores.astype(self.dtype_scores, copy=False)
+                        for clave, scores in precalcular_scores(df_destinos).items()}
+        actual = _EstadoAnual(None, df_destinos, tabla_scores, IndicePresupuesto(df_destinos),
+                              CodificadorCategorias(df_destinos))
+        self._datos = _DatosMotor(version_datos, df_destinos, df_panel, actual)
+
+    @property
+    def datos(self) -> _DatosMotor:
+        """
+        Versión publicada de los datos. Para combinar varios resultados (p.ej. la similitud
+        y los países a los que corresponde) leerla una vez y pasarla como 'datos'.
+        """
+        return self._datos
+
+    @property
+    def version_datos(self) -> str:
+        return self._datos.version_datos
+
+    @property
+    def df_destinos(self) -> pd.DataFrame:
+        return self._datos.df_destinos
+
+    @property
+    def df_panel(self) -> Optional[pd.DataFrame]:
+        return self._datos.df_panel
+
+    @property
+    def tabla_scores(self) -> Dict[Tuple[str, str], np.ndarray]:
+        return self._datos.actual.tabla_scores
+
+    @property
+    def indice_presupuesto(self) -> IndicePresupuesto:
+        return self._datos.actual.indice_presupuesto
+
+    @property
+    def codificador(self) -> CodificadorCategorias:
+        return self._datos.actual.codificador
+
+    @classmethod
+    def desde_csv(cls, csv_path: str = CSV_PATH, cache_dir: str = CACHE_DIR,
+                  tamano_bloque: Optional[int] = None, compacto: bool = False) -> 'MotorRecomendacion':
+        """
+        Crea el motor a partir del CSV (reutilizando el snapshot de datos_turismo).
+        Con tamano_bloque el CSV se ingiere por bloques con memoria acotada; con compacto
+        las tablas usan tipos reducidos (ver datos_turismo.compactar_tabla).
+        """
+        huella = huella_csv(csv_path)
+        ingesta = None
+        if tamano_bloque:
+            # Se conserva el estado de la ingesta para poder refrescar sin releer el CSV
+            ingesta = ingerir_csv(csv_path, tamano_bloque)
+            df_panel, df_destinos = ingesta.panel_reciente(), ingesta.destinos()
+            if compacto:
+                df_panel, df_destinos = compactar_tabla(df_panel), compactar_tabla(df_destinos)
+        else:
+            df_panel, df_destinos = cargar_datos(csv_path, cache_dir, compacto=compacto)
+        motor = cls(df_destinos, df_panel, version_datos=huella['sha1'][:16], cache_dir=cache_dir,
+                    compacto=compacto, csv_path=csv_path, huella_datos=huella)
+        motor._ingesta = ingesta
+        return motor
+
+    def actualizar_datos(self) -> Dict:
+        """
+        Refresca el motor cuando se agregan filas (p.ej. un año nuevo) al final del CSV.
+
+        Solo se parsean las filas nuevas: actualizan el estado incremental por país
+        (último registro, llegadas para el crecimiento) y la tabla de destinos se deriva
+        de ese estado. Luego se recalculan las estructuras derivadas (scores, índices),
+        se cambia version_datos y se descartan de la caché las entradas de la versión
+        anterior. Si el CSV se modificó de otra forma se hace una recarga completa.
+
+        Es seguro llamarlo en cada rerun: si el CSV no cambió (mismo tamaño y mtime)
+        solo cuesta un stat.
+
+        Returns:
+            Dict con 'cambios', 'recarga_completa', 'filas_nuevas', 'paises_afectados',
+            'version_anterior', 'version' y 'segundos'
+        """
+        with self._lock_actualizacion:
+            return self._actualizar_datos()
+
+    def _actualizar_datos(self) -> Dict:
+        inicio = time.perf_counter()
+        datos = self._datos
+        version_anterior = datos.version_datos
+        resumen = {'cambios': False, 'recarga_completa': False, 'filas_nuevas': 0, 'paises_afectados': [],
+                   'version_anterior': version_anterior, 'version': version_anterior}
+        if self.csv_path is None or self.huella_datos is None:
+            raise ValueError("El motor no se creó desde un CSV (usa MotorRecomendacion.desde_csv)")
+
+        nuevas = leer_filas_agregadas(self.csv_path, self.huella_datos)
+        if nuevas is None:
+            huella = huella_csv(self.csv_path)
+            df_panel, df_destinos = cargar_datos(self.csv_path, self.cache_dir, compacto=self.compacto)
+            self._ingesta = None
+            resumen['recarga_completa'] = True
+            resumen['paises_afectados'] = df_destinos['country'].astype(str).tolist()
+        else:
+            df_nuevas, huella = nuevas
+            if huella['sha1'] == self.huella_datos['sha1']:
+                self.huella_datos = huella  # p.ej. solo cambió el mtime
+                resumen['segundos'] = round(time.perf_counter() - inicio, 6)
+                return resumen
+            if self._ingesta is None:
+                # Primer refresco: el estado por país se arma una vez desde el panel completo
+                self._ingesta = IngestaPanel()
+                self._ingesta.agregar_bloque(datos.df_panel)
+            self._ingesta.agregar_bloque(df_nuevas)
+            df_destinos = self._ingesta.destinos()
+            df_panel = pd.concat([datos.df_panel, df_nuevas])
+            if self.compacto:
+                df_panel, df_destinos = compactar_tabla(df_panel), compactar_tabla(df_destinos)
+            elif self.cache_dir and self._ingesta.filas == len(df_panel):
+                # Con el panel completo en memoria se deja listo el snapshot del CSV nuevo
+                try:
+                    guardar_snapshot(ruta_snapshot(self.csv_path, self.cache_dir),
+                                     {'panel': df_panel, 'destinos': df_destinos}, huella)
+                except Exception:
+                    pass
+            resumen['filas_nuevas'] = len(df_nuevas)
+            resumen['paises_afectados'] = sorted(df_nuevas['country'].astype(str).unique().tolist())
+
+        self.huella_datos = huella
+        self._instalar_datos(df_destinos, df_panel, huella['sha1'][:16])
+        self.cache.descartar(lambda clave: isinstance(clave, tuple) and len(clave) > 1 and clave[1] == version_anterior)
+        resumen.update(cambios=True, version=self.version_datos, segundos=round(time.perf_counter() - inicio, 6))
+        return resumen
+
+    @property
+    def indice_vecinos(self) -> IndiceDestinos:
+        """
+        Índice KD-tree de destinos (se construye en el primer uso).
+        """
+        datos = self._datos
+        if datos.indice_vecinos is None:
+            datos.indice_vecinos = IndiceDestinos(datos.df_destinos)
+        return datos.indice_vecinos
+
+    @property
+    def similitud_paises(self) -> SimilitudPaises:
+        """
+        Matriz de similitud país-a-país (se lee de cache_dir o se construye en el primer uso).
+        """
+        return self._similitud_paises(self._datos)
+
+    def _similitud_paises(self, datos: _DatosMotor) -> SimilitudPaises:
+        if datos.similitud_paises is None:
+            datos.similitud_paises = cargar_similitud_paises(datos.df_destinos, self.cache_dir, datos.version_datos)
+        return datos.similitud_paises
+
+    @property
+    def tendencias(self) -> TendenciasTurismo:
+        """
+        Matrices país × año de crecimiento, CAGR y medias móviles del panel (se leen de
+        cache_dir o se construyen en el primer uso).
+        """
+        return self._tendencias(self._datos)
+
+    def _tendencias(self, datos: _DatosMotor) -> TendenciasTurismo:
+        if datos.tendencias is None:
+            if datos.df_panel is None:
+                raise ValueError("El motor no tiene panel histórico para calcular tendencias")
+            datos.tendencias = cargar_tendencias(datos.df_panel, self.cache_dir, datos.version_datos)
+        return datos.tendencias
+
+    @property
+    def ambiente(self) -> AmbienteTuristico:
+        """
+        Almacén del termómetro de ambiente turístico: hoteles por ciudad y agregados por
+        país (se lee de cache_dir o se construye en el primer uso).
+        """
+        datos = self._datos
+        if datos.ambiente is None:
+            datos.ambiente = cargar_ambiente(datos.df_destinos, self.hoteles_path, self.cache_dir, datos.version_datos)
+        return datos.ambiente
+
+    @property
+    def indice_as_of(self) -> IndiceAsOf:
+        """
+        Índice as-of del panel (tabla de destinos vista desde cada año; se construye en el primer uso).
+        """
+        return self._indice_as_of(self._datos)
+
+    def _indice_as_of(self, datos: _DatosMotor) -> IndiceAsOf:
+        if datos.indice_as_of is None:
+            if datos.df_panel is None:
+                raise ValueError("El motor no tiene panel histórico para consultas as-of")
+            datos.indice_as_of = IndiceAsOf.construir(datos.df_panel)
+        return datos.indice_as_of
+
+    def anios_disponibles(self) -> List[int]:
+        """
+        Años válidos para 'as_of_year' (los del panel cargado).
+        """
+        return self.indice_as_of.anios.tolist()
+
+    def _estado(self, as_of_year: Optional[int] = None, datos: Optional[_DatosMotor] = None) -> _EstadoAnual:
+        """
+        Estructuras precalculadas de la tabla actual o de la vista desde as_of_year
+        (de 'datos', o de la versión publicada). Las de cada año se arman una sola vez
+        (misma latencia que el modo actual después).
+        """
+        datos = datos or self._datos
+        if as_of_year is None:
+            return datos.actual
+        indice_as_of = self._indice_as_of(datos)
+        anio = indice_as_of.anio_efectivo(as_of_year)
+        estado = datos.estados_anuales.get(anio)
+        if estado is None:
+            df = indice_as_of.destinos(anio)
+            tabla_scores = {clave: scores.astype(self.dtype_scores, copy=False)
+                            for clave, scores in precalcular_scores(df).items()}
+            estado = _EstadoAnual(anio, df, tabla_scores, IndicePresupuesto(df), CodificadorCategorias(df))
+            datos.estados_anuales[anio] = estado
+        return estado
+
+    def crecimiento(self, ventana: int = 1, as_of_year: Optional[int] = None,
+                    datos: Optional[_DatosMotor] = None) -> np.ndarray:
+        """
+        Crecimiento de llegadas (%) alineado con la tabla de destinos (la actual o la
+        vista desde as_of_year). Con ventana 1 es la columna 'crecimiento_anual'; con
+        ventana > 1 es el CAGR de esos años, leído de las matrices de tendencias (los
+        países sin dato quedan en 0, como en 'crecimiento_anual').
+        """
+        datos = datos or self._datos
+        estado = self._estado(as_of_year, datos)
+        if ventana == 1:
+            return estado.df_destinos['crecimiento_anual'].to_numpy(dtype=float)
+        tendencias = self._tendencias(datos)
+        posiciones = np.array([tendencias.posicion_pais.get(pais, -1) for pais in estado.df_destinos['country']],
+                              dtype=np.int64)
+        # Centinela NaN al final: los países ausentes (-1) lo toman
+        crecimiento = np.append(tendencias.cagr(ventana, anio=estado.anio), np.nan)[posiciones]
+        return np.where(np.isnan(crecimiento), 0.0, crecimiento)
+
+    def tabla_scores_ventana(self, ventana: int = 1, as_of_year: Optional[int] = None,
+                             datos: Optional[_DatosMotor] = None) -> Dict[Tuple[str, str], np.ndarray]:
+        """
+        Tabla de scores con el crecimiento de 'ventana' años (con caché por versión, año y ventana).
+        """
+        datos = datos or self._datos
+        estado = self._estado(as_of_year, datos)
+        if ventana == 1:
+            return estado.tabla_scores
+
+        def calcular():
+            df = estado.df_destinos.assign(crecimiento_anual=self.crecimiento(ventana, as_of_year, datos))
+            return {clave: scores.astype(self.dtype_scores, copy=False)
+                    for clave, scores in precalcular_scores(df).items()}
+
+        return self.cache.obtener_o_calcular(('scores', datos.version_datos, ventana, estado.anio), calcular)
+
+    def memoria(self) -> Dict[str, int]:
+        """
+        Bytes de cada estructura cargada por el motor (para dimensionar workers por host).
+        """
+        datos = self._datos
+        memoria = {
+            'destinos': bytes_objeto(datos.df_destinos),
+            'panel': bytes_objeto(datos.df_panel),
+            'tabla_scores': bytes_objeto(datos.actual.tabla_scores),
+            'categorias': bytes_objeto(datos.actual.codificador.mascaras),
+        }
+        if datos.tendencias is not None:
+            memoria['tendencias'] = bytes_objeto([getattr(datos.tendencias, nombre) for nombre in
+                                                  ('valores', 'relleno', 'crecimiento', 'acumulado', 'conteo')])
+        if datos.ambiente is not None:
+            memoria['ambiente'] = bytes_objeto([getattr(datos.ambiente, nombre) for nombre in
+                                                ('offsets', 'ciudades', 'conteos', 'total_hoteles', 'concentracion',
+                                                 'participacion_top', 'hoteles_por_mil', 'percentil')])
+        if datos.indice_as_of is not None:
+            memoria['as_of'] = bytes_objeto([datos.indice_as_of.posiciones, datos.indice_as_of.crecimiento] +
+                                            [estado.df_destinos for estado in datos.estados_anuales.values()])
+        if datos.similitud_paises is not None:
+            memoria['similitud_paises'] = bytes_objeto([datos.similitud_paises.matriz, datos.similitud_paises.vecinos])
+        return memoria
+
+    def paises(self) -> List[str]:
+        """
+        Países disponibles, ordenados alfabéticamente.
+        """
+        return sorted(self.df_destinos['country'].unique().tolist())
+
+    def nuevo_acumulador(self, as_of_year: Optional[int] = None) -> AcumuladorPerfil:
+        """
+        Acumulador incremental de perfil sobre df_destinos, o sobre la tabla vista desde
+        as_of_year (uno por sesión, no es compartido).
+        """
+        return AcumuladorPerfil(self._estado(as_of_year).df_destinos)
+
+    def generar_perfil(self, paises_ideales: List[str], paises_no_ideales: List[str],
+                       acumulador: Optional[AcumuladorPerfil] = None, as_of_year: Optional[int] = None,
+                       datos: Optional[_DatosMotor] = None) -> Dict:
+        """
+        Perfil de usuario a partir de destinos ideales y no-ideales (con caché).
+
+        El perfil devuelto incluye 'huella' (países ordenados + versión del dataset + año),
+        que recomendar() usa como clave de la similitud, y 'preferencias_categoricas'
+        (regiones como máscaras de bits). Es compartido: no modificarlo.
+        Con as_of_year las métricas de los países se toman de la tabla vista desde ese año
+        (la misma contra la que recomendar calcula la similitud), no de la actual.
+        Si se pasa un acumulador (de nuevo_acumulador con el mismo as_of_year), el perfil
+        se obtiene aplicando solo los países agregados o quitados desde la última llamada.
+        """
+        datos = datos or self._datos
+        estado = self._estado(as_of_year, datos)
+        huella = huella_perfil(paises_ideales, paises_no_ideales, datos.version_datos, estado.anio)
+        clave = ('perfil', datos.version_datos, huella)
+        if estado.anio is not None:
+            clave += (estado.anio,)
+
+        def calcular():
+            if acumulador is not None:
+                acumulador.sincronizar(paises_ideales, paises_no_ideales)
+                perfil = acumulador.perfil()
+            else:
+                perfil = extraer_perfil_usuario(estado.df_destinos, paises_ideales, paises_no_ideales)
+            perfil['huella'] = huella
+            perfil['preferencias_categoricas'] = estado.codificador.preferencias(perfil)
+            return perfil
+
+        return self.cache.obtener_o_calcular(clave, calcular)
+
+    def similitud_perfil(self, perfil: Dict, pesos: Dict = None, as_of_year: Optional[int] = None,
+                         datos: Optional[_DatosMotor] = None) -> np.ndarray:
+        """
+        Similitud del perfil con cada destino de df_destinos, o de la tabla vista desde
+        as_of_year (con caché, solo lectura). No depende de los filtros: cada consulta
+        toma el subconjunto que necesita.
+        """
+        datos = datos or self._datos
+        huella = perfil.get('huella') or huella_contenido_perfil(perfil, datos.version_datos)
+        estado = self._estado(as_of_year, datos)
+        clave = ('similitud', datos.version_datos, huella, huella_pesos(pesos))
+        if estado.anio is not None:
+            clave += (estado.anio,)
+
+        def calcular():
+            similitud = calcular_similitud_para_todos(estado.df_destinos, perfil, pesos,
+                                                       estado.codificador).to_numpy(dtype=self.dtype_scores)
+            similitud.setflags(write=False)
+            return similitud
+
+        return self.cache.obtener_o_calcular(clave, calcular)
+
+    def recomendar(self, consulta: Dict) -> Dict:
+        """
+        Genera recomendaciones para una consulta.
+
+        Args:
+            consulta: Dict con 'presupuesto', 'interes_turistico', 'salud_economica',
+                      'region', 'perfil', 'k', 'ventana_crecimiento' y 'as_of_year' (las
+                      claves ausentes toman CONSULTA_POR_DEFECTO)
+
+        Returns:
+            Dict con:
+            - recomendaciones: DataFrame con el top-k
+            - perfil_activo: True si se aplicó la similitud personal a algún destino
+            - aviso: mensaje si la similitud personal falló (o None)
+            - as_of_year: año de los datos usados (None = tabla actual)
+        """
+        consulta = {**CONSULTA_POR_DEFECTO, **consulta}
+        if consulta['interes_turistico'] not in OPCIONES_INTERES:
+            raise ValueError(f"interes_turistico no válido: {consulta['interes_turistico']}")
+        if consulta['salud_economica'] not in OPCIONES_SALUD:
+            raise ValueError(f"salud_economica no válida: {consulta['salud_economica']}")
+        # Un presupuesto no numérico (o NaN) haría que el filtro dejara pasar todos los destinos
+        try:
+            presupuesto = float(consulta['presupuesto'])
+        except (TypeError, ValueError):
+            raise ValueError(f"presupuesto no válido: {consulta['presupuesto']!r}")
+        if np.isnan(presupuesto):
+            raise ValueError(f"presupuesto no válido: {consulta['presupuesto']!r}")
+        ventana = int(consulta['ventana_crecimiento'])
+        if ventana < 1:
+            raise ValueError(f"ventana_crecimiento no válida: {consulta['ventana_crecimiento']}")
+        as_of_year = None if consulta['as_of_year'] is None else int(consulta['as_of_year'])
+        # Una sola lectura de la versión publicada: filas, índice y scores son de los mismos datos
+        # aunque actualizar_datos publique otra versión mientras tanto
+        datos = self._datos
+        estado = self._estado(as_of_year, datos)
+
+        similitud = None
+        if consulta['perfil'] is not None:
+            try:
+                similitud = self.similitud_perfil(consulta['perfil'], as_of_year=as_of_year, datos=datos)
+            except Exception:
+                similitud = None  # generar_recomendaciones lo reintenta y reporta el aviso
+
+        recomendaciones, aviso = generar_recomendaciones(
+            datos.df_destinos,
+            presupuesto=presupuesto,
+            interes_turistico=consulta['interes_turistico'],
+            salud_economica=consulta['salud_economica'],
+            region=consulta['region'],
+            perfil_datos=consulta['perfil'],
+            tabla_scores=self.tabla_scores_ventana(ventana, as_of_year, datos),
+            indice_presupuesto=estado.indice_presupuesto,
+            k=consulta['k'],
+            similitud=similitud,
+            as_of_year=estado.anio,
+            indice_as_of=datos.indice_as_of
+        )
+        return {
+            'recomendaciones': recomendaciones,
+            'perfil_activo': consulta['perfil'] is not None and aviso is None and not recomendaciones.empty,
+            'aviso': aviso,
+            'as_of_year': estado.anio,
+        }
+
+    def vecinos_perfil(self, perfil: Dict, k: int = 5, presupuesto: Optional[float] = None,
+                       region: Optional[str] = None) -> pd.DataFrame:
+        """
+        Destinos más cercanos al perfil (ver IndiceDestinos.vecinos_perfil).
+        """
+        return self.indice_vecinos.vecinos_perfil(perfil, k, presupuesto, region)
+
+    def destinos_similares(self, pais: str, k: int = 5) -> pd.DataFrame:
+        """
+        "Más destinos como este": filas de los k destinos más parecidos a 'pais'
+        según la matriz precalculada, con la columna 'similitud_pais'.
+        """
+        datos = self._datos
+        posiciones, similitudes = self._similitud_paises(datos).similares(pais, k)
+        df_similares = datos.df_destinos.iloc[posiciones].copy()
+        df_similares['similitud_pais'] = similitudes
+        return df_similares
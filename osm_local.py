@@ -0,0 +1,507 @@
+# Extracción Offline de Hoteles desde Extractos OSM
+# Cuenta hoteles por ciudad a partir de un extracto local de OpenStreetMap (.osm XML o
+# .osm.pbf con pyosmium), sin depender de la API de Overpass. El archivo se recorre en
+# streaming: en memoria quedan los hoteles (como puntos) y los ids de vía de cada
+# límite de ciudad, y la geometría de los límites se lee por lotes acotados de vías
+# (cada lote, dos pasadas más). Cada extracto (un país) se procesa en su propio proceso.
+# La asignación hotel -> ciudad usa un índice espacial en grilla sobre las cajas de las
+# ciudades más punto-en-polígono exacto; la ruta por API (precompute_osm_data) lo comparte.
+# La salida tiene las mismas columnas que la ruta por API: country, city, hotel_count.
+
+import os
+import xml.etree.ElementTree as ET
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Extensiones de extracto reconocidas (en orden de preferencia si hay varias para un país)
+EXTENSIONES_EXTRACTO = ('.osm.pbf', '.osm')
+
+# Nivel administrativo de "ciudad" (igual que area._[admin_level=8] en la consulta Overpass)
+ADMIN_LEVEL_CIUDAD = '8'
+
+# Celdas (aristas × puntos) de cada matriz temporal de la prueba punto-en-polígono:
+# 2**20 son ~8 MB en float64, con cualquier cantidad de aristas del límite
+CELDAS_BLOQUE = 1 << 20
+
+# Vías de límite por lote al leer la geometría de las ciudades de un extracto. OSM
+# limita cada vía a 2000 nodos, así que un lote guarda a lo sumo 2000 × MAX_VIAS_LOTE
+# coordenadas (en la práctica unas 100 por vía)
+MAX_VIAS_LOTE = 20_000
+
+# Ciudades por celda buscadas al dimensionar la grilla del índice espacial
+CIUDADES_POR_CELDA = 4
+
+# Firma del visitante: (tipo, id, (lon, lat) o None, tags, refs de nodos, miembros (tipo, ref, rol))
+Visitante = Callable[[str, int, Optional[Tuple[float, float]], Dict[str, str], List[int],
+                      List[Tuple[str, int, str]]], None]
+
+
+# ============================================================================
+# SECCIÓN 1: LECTURA EN STREAMING
+# ============================================================================
+
+def _recorrer_osm_xml(path: str, tipos: Set[str], visitar: Visitante) -> None:
+    """
+    Recorre un .osm XML con iterparse. Cada elemento se libera al terminar de leerlo
+    (root.clear()), así que la memoria no crece con el tamaño del archivo.
+    """
+    contexto = ET.iterparse(path, events=('start', 'end'))
+    _, raiz = next(contexto)
+    for evento, elem in contexto:
+        if evento != 'end' or elem.tag not in ('node', 'way', 'relation'):
+            continue
+        if elem.tag in tipos:
+            tags, refs, miembros = {}, [], []
+            for hijo in elem:
+                if hijo.tag == 'tag':
+                    tags[hijo.get('k')] = hijo.get('v')
+                elif hijo.tag == 'nd':
+                    refs.append(int(hijo.get('ref')))
+                elif hijo.tag == 'member':
+                    miembros.append((hijo.get('type'), int(hijo.get('ref')), hijo.get('role') or ''))
+            coordenada = None
+            if elem.tag == 'node' and elem.get('lat') is not None:
+                coordenada = (float(elem.get('lon')), float(elem.get('lat')))
+            visitar(elem.tag, int(elem.get('id')), coordenada, tags, refs, miembros)
+        raiz.clear()
+
+
+def _recorrer_osm_pbf(path: str, tipos: Set[str], visitar: Visitante) -> None:
+    """
+    Recorre un .osm.pbf con pyosmium (dependencia opcional, solo para este formato).
+    """
+    try:
+        import osmium
+    except ImportError as e:
+        raise ImportError("Leer extractos .osm.pbf requiere pyosmium (pip install osmium); "
+                          "los .osm XML no lo necesitan") from e
+
+    tipos_miembro = {'n': 'node', 'w': 'way', 'r': 'relation'}
+
+    class _Manejador(osmium.SimpleHandler):
+        def node(self, n):
+            if 'node' in tipos:
+                coordenada = (n.location.lon, n.location.lat) if n.location.valid() else None
+                visitar('node', n.id, coordenada, {t.k: t.v for t in n.tags}, [], [])
+
+        def way(self, w):
+            if 'way' in tipos:
+                visitar('way', w.id, None, {t.k: t.v for t in w.tags}, [nd.ref for nd in w.nodes], [])
+
+        def relation(self, r):
+            if 'relation' in tipos:
+                miembros = [(tipos_miembro.get(m.type, m.type), m.ref, m.role) for m in r.members]
+                visitar('relation', r.id, None, {t.k: t.v for t in r.tags}, [], miembros)
+
+    _Manejador().apply_file(path)
+
+
+def recorrer_osm(path: str, tipos: Iterable[str], visitar: Visitante) -> None:
+    """
+    Llama a visitar(...) con cada elemento de los tipos pedidos ('node', 'way', 'relation').
+    """
+    tipos = set(tipos)
+    if path.endswith('.pbf'):
+        _recorrer_osm_pbf(path, tipos, visitar)
+    else:
+        _recorrer_osm_xml(path, tipos, visitar)
+
+
+# ============================================================================
+# SECCIÓN 2: GEOMETRÍA (ANILLOS Y PUNTO EN POLÍGONO)
+# ============================================================================
+
+def es_hotel(tags: Dict[str, str]) -> bool:
+    return tags.get('tourism') == 'hotel'
+
+
+def es_limite_ciudad(tags: Dict[str, str]) -> bool:
+    return tags.get('admin_level') == ADMIN_LEVEL_CIUDAD and 'name' in tags
+
+
+def ensamblar_anillos(segmentos: List[list]) -> List[list]:
+    """
+    Une vías por sus extremos hasta formar anillos cerrados. Los vértices pueden ser ids
+    de nodo o tuplas (lon, lat); los tramos que no llegan a cerrarse se descartan.
+    """
+    pendientes = [list(s) for s in segmentos if len(s) >= 2]
+    anillos = []
+    while pendientes:
+        anillo = pendientes.pop()
+        while anillo[0] != anillo[-1]:
+            for i, segmento in enumerate(pendientes):
+                if segmento[0] == anillo[-1]:
+                    anillo.extend(segmento[1:])
+                elif segmento[-1] == anillo[-1]:
+                    anillo.extend(segmento[-2::-1])
+                else:
+                    continue
+                pendientes.pop(i)
+                break
+            else:
+                break  # no hay continuación: anillo abierto
+        if anillo[0] == anillo[-1] and len(anillo) >= 4:
+            anillos.append(anillo)
+    return anillos
+
+
+def puntos_en_poligono(puntos: np.ndarray, anillos: List[np.ndarray]) -> np.ndarray:
+    """
+    Máscara de los puntos (N×2, lon/lat) dentro del polígono formado por los anillos
+    (regla par-impar: los anillos interiores quedan como huecos). Vectorizado por
+    bloques de aristas × puntos de a lo sumo CELDAS_BLOQUE celdas (un límite detallado
+    se recorre por tramos de aristas acumulando los cruces), con prefiltro por caja.
+    """
+    dentro = np.zeros(len(puntos), dtype=bool)
+    if len(puntos) == 0 or not anillos:
+        return dentro
+    vertices = np.concatenate(anillos)
+    minimo, maximo = vertices.min(axis=0), vertices.max(axis=0)
+    candidatos = np.flatnonzero(np.all((puntos >= minimo) & (puntos <= maximo), axis=1))
+
+    # Aristas de todos los anillos: (x1, y1) -> (x2, y2)
+    x1 = np.concatenate([a[:-1, 0] for a in anillos])[:, None]
+    y1 = np.concatenate([a[:-1, 1] for a in anillos])[:, None]
+    x2 = np.concatenate([a[1:, 0] for a in anillos])[:, None]
+    y2 = np.concatenate([a[1:, 1] for a in anillos])[:, None]
+
+    # Con pocas aristas se procesan muchos puntos por bloque; con muchas, un punto por
+    # bloque y las aristas en tramos de CELDAS_BLOQUE
+    aristas = len(x1)
+    bloque_puntos = max(1, CELDAS_BLOQUE // aristas)
+    tramo_aristas = max(1, CELDAS_BLOQUE // bloque_puntos)
+    for inicio in range(0, len(candidatos), bloque_puntos):
+        bloque = candidatos[inicio:inicio + bloque_puntos]
+        px, py = puntos[bloque, 0][None, :], puntos[bloque, 1][None, :]
+        cruces = np.zeros(len(bloque), dtype=np.int64)
+        for a in range(0, aristas, tramo_aristas):
+            tx1, ty1 = x1[a:a + tramo_aristas], y1[a:a + tramo_aristas]
+            tx2, ty2 = x2[a:a + tramo_aristas], y2[a:a + tramo_aristas]
+            cruza = (ty1 > py) != (ty2 > py)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x_corte = (tx2 - tx1) * (py - ty1) / (ty2 - ty1) + tx1
+            cruces += np.count_nonzero(cruza & (px < x_corte), axis=0)
+        dentro[bloque] = cruces % 2 == 1
+    return dentro
+
+
+class IndiceCiudades:
+    """
+    Índice espacial en grilla sobre las cajas envolventes de las ciudades.
+
+    Cada celda guarda las ciudades cuya caja la toca (pares celda -> ciudad ordenados
+    por celda + offsets). Asignar puntos es: celda de cada punto (O(1)), expansión a
+    las ciudades candidatas de esa celda, filtro por caja y punto-en-polígono exacto
+    solo para los candidatos, agrupados por ciudad. Todo vectorizado sobre los puntos.
+    """
+
+    def __init__(self, ciudades: List[Tuple[str, List[np.ndarray]]], ciudades_por_celda: int = CIUDADES_POR_CELDA):
+        self.nombres = [nombre for nombre, _ in ciudades]
+        self.anillos = [anillos for _, anillos in ciudades]
+        n = len(ciudades)
+        self.cajas = np.array([np.r_[np.concatenate(a).min(axis=0), np.concatenate(a).max(axis=0)]
+                               for a in self.anillos], dtype=np.float64).reshape(n, 4)
+        if n == 0:
+            self.lado = 1
+            self.origen, self.tamano_celda = np.zeros(2), np.ones(2)
+            self.offsets = np.zeros(2, dtype=np.int64)
+            self.ciudad_par = np.array([], dtype=np.int64)
+            return
+
+        self.lado = max(1, int(np.ceil(np.sqrt(n / ciudades_por_celda))))
+        self.origen = self.cajas[:, :2].min(axis=0)
+        extension = np.maximum(self.cajas[:, 2:].max(axis=0) - self.origen, 1e-12)
+        self.tamano_celda = extension / self.lado
+
+        # Pares (celda, ciudad) de todas las celdas que toca cada caja
+        desde = self._celda_xy(self.cajas[:, :2])
+        hasta = self._celda_xy(self.cajas[:, 2:])
+        celdas, ciudades_par = [], []
+        for c in range(n):
+            xs, ys = np.meshgrid(np.arange(desde[c, 0], hasta[c, 0] + 1), np.arange(desde[c, 1], hasta[c, 1] + 1))
+            ids = (ys * self.lado + xs).ravel()
+            celdas.append(ids)
+            ciudades_par.append(np.full(len(ids), c))
+        celdas, ciudades_par = np.concatenate(celdas), np.concatenate(ciudades_par)
+        orden = np.argsort(celdas, kind='stable')
+        self.ciudad_par = ciudades_par[orden]
+        self.offsets = np.searchsorted(celdas[orden], np.arange(self.lado * self.lado + 1)).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.nombres)
+
+    def _celda_xy(self, puntos: np.ndarray) -> np.ndarray:
+        return np.clip(((puntos - self.origen) // self.tamano_celda).astype(np.int64), 0, self.lado - 1)
+
+    def candidatos(self, puntos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pares (punto, ciudad) cuya caja contiene al punto (prefiltro, sin el polígono exacto).
+        """
+        if len(self) == 0 or len(puntos) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        xy = self._celda_xy(puntos)
+        celda = xy[:, 1] * self.lado + xy[:, 0]
+        inicio, fin = self.offsets[celda], self.offsets[celda + 1]
+        cantidad = fin - inicio
+        punto = np.repeat(np.arange(len(puntos)), cantidad)
+        # Posición de cada par dentro de la lista de su celda
+        desplazamiento = np.arange(cantidad.sum()) - np.repeat(np.cumsum(cantidad) - cantidad, cantidad)
+        ciudad = self.ciudad_par[np.repeat(inicio, cantidad) + desplazamiento]
+        cajas = self.cajas[ciudad]
+        en_caja = ((puntos[punto, 0] >= cajas[:, 0]) & (puntos[punto, 0] <= cajas[:, 2]) &
+                   (puntos[punto, 1] >= cajas[:, 1]) & (puntos[punto, 1] <= cajas[:, 3]))
+        return punto[en_caja], ciudad[en_caja]
+
+    def asignar(self, puntos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pares (punto, ciudad) con el punto dentro del polígono de la ciudad. Un punto
+        puede quedar en varias ciudades si se superponen.
+        """
+        punto, ciudad = self.candidatos(puntos)
+        if len(punto) == 0:
+            return punto, ciudad
+        orden = np.argsort(ciudad, kind='stable')
+        punto, ciudad = punto[orden], ciudad[orden]
+        limites = np.flatnonzero(np.diff(ciudad)) + 1
+        dentro = np.zeros(len(punto), dtype=bool)
+        for inicio, fin in zip(np.r_[0, limites], np.r_[limites, len(punto)]):
+            dentro[inicio:fin] = puntos_en_poligono(puntos[punto[inicio:fin]], self.anillos[ciudad[inicio]])
+        return punto[dentro], ciudad[dentro]
+
+    def contar(self, puntos: np.ndarray) -> Dict[str, int]:
+        """
+        Hoteles dentro de cada ciudad. Como 'is_in' en Overpass, un hotel cuenta en todas
+        las ciudades que lo contienen y las ciudades homónimas se suman.
+        """
+        _, ciudad = self.asignar(puntos)
+        conteos: Dict[str, int] = {}
+        for c, n in zip(*np.unique(ciudad, return_counts=True)):
+            conteos[self.nombres[c]] = conteos.get(self.nombres[c], 0) + int(n)
+        return conteos
+
+
+def contar_por_ciudad(puntos: np.ndarray, ciudades: List[Tuple[str, List[np.ndarray]]]) -> Dict[str, int]:
+    """
+    Hoteles por ciudad (ver IndiceCiudades.contar).
+    """
+    return IndiceCiudades(ciudades).contar(puntos)
+
+
+# ============================================================================
+# SECCIÓN 3: EXTRACCIÓN POR EXTRACTO
+# ============================================================================
+
+def extraer_hoteles_y_limites(path: str) -> Tuple[np.ndarray, List[Tuple[str, List[int]]]]:
+    """
+    Lee el extracto en tres pasadas (relaciones, vías, nodos) y devuelve los hoteles como
+    puntos y los límites de ciudad solo como listas de ids de vía: la geometría de los
+    límites se lee después, por lotes (ver lotes_de_ciudades).
+
+    Memoria: los puntos de los hoteles (16 bytes cada uno), los nodos de las vías y
+    relaciones de hotel durante la tercera pasada y los ids de vía de cada límite.
+
+    Returns:
+        Tupla (puntos N×2 lon/lat de los hoteles, [(nombre de ciudad, ids de sus vías)])
+        Vías y relaciones de hotel se representan por el centroide de sus nodos; una
+        ciudad cerrada como una sola vía queda como un límite de una vía.
+    """
+    # Pasada 1: relaciones de hotel y límites de ciudad
+    relaciones_hotel: List[List[Tuple[str, int, str]]] = []
+    limites: List[Tuple[str, List[int]]] = []
+
+    def visitar_relacion(tipo, _id, _coord, tags, _refs, miembros):
+        if es_hotel(tags):
+            relaciones_hotel.append(miembros)
+        elif es_limite_ciudad(tags):
+            limites.append((tags['name'], [ref for t, ref, _ in miembros if t == 'way']))
+
+    recorrer_osm(path, ['relation'], visitar_relacion)
+    vias_necesarias = {ref for miembros in relaciones_hotel for t, ref, _ in miembros if t == 'way'}
+
+    # Pasada 2: vías de hotel (y las de sus relaciones) y ciudades cerradas como una sola vía
+    vias: Dict[int, List[int]] = {}
+    vias_hotel: List[List[int]] = []
+
+    def visitar_via(tipo, id_via, _coord, tags, refs, _miembros):
+        if id_via in vias_necesarias:
+            vias[id_via] = refs
+        if es_hotel(tags):
+            vias_hotel.append(refs)
+        elif es_limite_ciudad(tags) and len(refs) >= 4 and refs[0] == refs[-1]:
+            limites.append((tags['name'], [id_via]))
+
+    recorrer_osm(path, ['way'], visitar_via)
+    nodos_necesarios = {ref for refs in vias.values() for ref in refs}
+    nodos_necesarios.update(ref for refs in vias_hotel for ref in refs)
+    nodos_necesarios.update(ref for miembros in relaciones_hotel for t, ref, _ in miembros if t == 'node')
+
+    # Pasada 3: hoteles como nodo y coordenadas de los nodos de hoteles como vía o relación
+    coordenadas: Dict[int, Tuple[float, float]] = {}
+    puntos = array('d')
+
+    def visitar_nodo(tipo, id_nodo, coord, tags, _refs, _miembros):
+        if coord is None:
+            return
+        if id_nodo in nodos_necesarios:
+            coordenadas[id_nodo] = coord
+        if tags and es_hotel(tags):
+            puntos.extend(coord)
+
+    recorrer_osm(path, ['node'], visitar_nodo)
+
+    def centroide(refs: Iterable[int]) -> Optional[Tuple[float, float]]:
+        coords = [coordenadas[ref] for ref in refs if ref in coordenadas]
+        return tuple(np.mean(coords, axis=0)) if coords else None
+
+    for refs in vias_hotel:
+        punto = centroide(refs)
+        if punto is not None:
+            puntos.extend(punto)
+    for miembros in relaciones_hotel:
+        refs = [ref for t, ref, _ in miembros if t == 'node']
+        refs += [ref for t, ref, _ in miembros if t == 'way' for ref in vias.get(ref, [])]
+        punto = centroide(refs)
+        if punto is not None:
+            puntos.extend(punto)
+
+    return np.frombuffer(puntos, dtype=np.float64).reshape(-1, 2).copy(), limites
+
+
+def lotes_de_ciudades(path: str, limites: List[Tuple[str, List[int]]],
+                      max_vias: int = MAX_VIAS_LOTE) -> Iterator[List[Tuple[str, List[np.ndarray]]]]:
+    """
+    Geometría de los límites por lotes de a lo sumo max_vias vías (un límite con más
+    vías forma su propio lote). Cada lote recorre vías y nodos del extracto una vez y
+    solo guarda los de sus ciudades, así que la memoria queda acotada por el lote y no
+    por el país: 2 pasadas extra por lote.
+
+    Yields:
+        [(nombre de ciudad, anillos lon/lat)] de cada lote (las ciudades sin anillos
+        cerrados o con nodos faltantes se omiten)
+    """
+    lote: List[Tuple[str, List[int]]] = []
+    vias_lote = 0
+    for limite in limites + [None]:
+        if limite is not None and (not lote or vias_lote + len(limite[1]) <= max_vias):
+            lote.append(limite)
+            vias_lote += len(limite[1])
+            continue
+        if lote:
+            yield _geometria_lote(path, lote)
+        if limite is not None:
+            lote, vias_lote = [limite], len(limite[1])
+
+
+def _geometria_lote(path: str, lote: List[Tuple[str, List[int]]]) -> List[Tuple[str, List[np.ndarray]]]:
+    vias_necesarias = {ref for _, refs in lote for ref in refs}
+    vias: Dict[int, List[int]] = {}
+
+    def visitar_via(tipo, id_via, _coord, _tags, refs, _miembros):
+        if id_via in vias_necesarias:
+            vias[id_via] = refs
+
+    recorrer_osm(path, ['way'], visitar_via)
+    nodos_necesarios = {ref for refs in vias.values() for ref in refs}
+    coordenadas: Dict[int, Tuple[float, float]] = {}
+
+    def visitar_nodo(tipo, id_nodo, coord, _tags, _refs, _miembros):
+        if coord is not None and id_nodo in nodos_necesarios:
+            coordenadas[id_nodo] = coord
+
+    recorrer_osm(path, ['node'], visitar_nodo)
+
+    def geometria(refs: List[int]) -> Optional[np.ndarray]:
+        coords = [coordenadas[ref] for ref in refs if ref in coordenadas]
+        return np.array(coords) if len(coords) == len(refs) else None
+
+    ciudades: List[Tuple[str, List[np.ndarray]]] = []
+    for nombre, refs_vias in lote:
+        anillos = [geometria(anillo) for anillo in ensamblar_anillos([vias[r] for r in refs_vias if r in vias])]
+        anillos = [a for a in anillos if a is not None]
+        if anillos:
+            ciudades.append((nombre, anillos))
+    return ciudades
+
+
+def extraer_hoteles_y_ciudades(path: str, max_vias_lote: int = MAX_VIAS_LOTE
+                               ) -> Tuple[np.ndarray, List[Tuple[str, List[np.ndarray]]]]:
+    """
+    Hoteles y todas las ciudades con su geometría en memoria a la vez (para inspeccionar
+    un extracto chico; contar_hoteles_extracto no materializa todas las ciudades).
+
+    Returns:
+        Tupla (puntos N×2 lon/lat de los hoteles, [(nombre de ciudad, anillos lon/lat)])
+    """
+    puntos, limites = extraer_hoteles_y_limites(path)
+    return puntos, [ciudad for lote in lotes_de_ciudades(path, limites, max_vias_lote) for ciudad in lote]
+
+
+def contar_hoteles_extracto(path: str, country_name: str, max_vias_lote: int = MAX_VIAS_LOTE) -> List[Dict]:
+    """
+    Ciudades con hoteles de un extracto local (mismo formato que la ruta por API).
+
+    La memoria es la de extraer_hoteles_y_limites más la geometría de un lote de a lo
+    sumo max_vias_lote vías de límite; cada lote se cuenta con su propio índice y se
+    descarta (un hotel cuenta en todas las ciudades que lo contienen, así que contar
+    por lotes da lo mismo que contar todo junto).
+
+    Returns:
+        Lista de {'country', 'city', 'hotel_count'}
+    """
+    puntos, limites = extraer_hoteles_y_limites(path)
+    conteos: Dict[str, int] = {}
+    for ciudades in lotes_de_ciudades(path, limites, max_vias_lote):
+        for ciudad, n in contar_por_ciudad(puntos, ciudades).items():
+            conteos[ciudad] = conteos.get(ciudad, 0) + n
+    return [{'country': country_name, 'city': ciudad, 'hotel_count': n} for ciudad, n in conteos.items()]
+
+
+def buscar_extracto(directorio: str, country_code: str) -> Optional[str]:
+    """
+    Extracto del país en el directorio: <country_code>.osm.pbf o <country_code>.osm.
+    """
+    for extension in EXTENSIONES_EXTRACTO:
+        path = os.path.join(directorio, f"{country_code}{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def contar_hoteles_extractos(countries: List[Tuple[str, str]], directorio: str, workers: int = None,
+                             al_completar: Optional[Callable] = None, max_vias_lote: int = MAX_VIAS_LOTE) -> List[Dict]:
+    """
+    Procesa los extractos de los países en paralelo (un proceso por extracto).
+
+    Args:
+        countries: pares (nombre, código); el extracto se busca con buscar_extracto
+        al_completar: como en precompute_osm_data.fetch_all_countries, se llama en el
+                      proceso principal con (nombre, código, filas, None) o (nombre, código, None, error)
+
+    Returns:
+        Filas de los países exitosos, en el orden de 'countries'
+    """
+    resultados: List[List[Dict]] = [[] for _ in countries]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futuros = {}
+        for i, (nombre, codigo) in enumerate(countries):
+            path = buscar_extracto(directorio, codigo)
+            if path is None:
+                if al_completar is not None:
+                    al_completar(nombre, codigo, None, FileNotFoundError(f"Sin extracto para {codigo} en {directorio}"))
+                continue
+            futuros[pool.submit(contar_hoteles_extracto, path, nombre, max_vias_lote)] = i
+        for futuro in as_completed(futuros):
+            i = futuros[futuro]
+            nombre, codigo = countries[i]
+            try:
+                resultados[i] = futuro.result()
+            except Exception as e:
+                if al_completar is not None:
+                    al_completar(nombre, codigo, None, e)
+                continue
+            if al_completar is not None:
+                al_completar(nombre, codigo, resultados[i], None)
+    return [fila for filas in resultados for fila in filas]
@@ -6,7 +6,10 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 from scipy.spatial.distance import cosine, euclidean
-from typing import Dict, List, Tuple
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from datos_turismo import AGREGACIONES
 
 # ============================================================================
 # SECCIÓN 1: EXTRACCIÓN DE PERFIL DE USUARIO
@@ -84,29 +87,29 @@ def extraer_perfil_usuario(df: pd.DataFrame, paises_ideales: List[str], paises_n
     ]
     
     # Crear máscara: excluir filas donde country coincida exactamente con agregaciones
+    # (sin materializar el frame filtrado: solo se toman las filas y columnas que se usan)
     mask = ~df['country'].isin(aggregations_exact)
-    df_paises = df[mask].copy()
     
     perfil = {}
     
     # Filtrar datos de ideales
     if paises_ideales:
-        df_ideales = df_paises[df_paises['country'].isin(paises_ideales)]
+        df_ideales = df[mask & df['country'].isin(paises_ideales)]
         perfil['densidad_ideal_media'] = df_ideales['tourism_arrivals'].mean()
         perfil['presupuesto_ideal_media'] = df_ideales['costo_por_turista'].mean()
         perfil['tipo_turismo_ideal'] = df_ideales['clasificacion_turismo'].mode()[0] if 'clasificacion_turismo' in df_ideales else "desconocido"
         perfil['regiones_ideales'] = df_ideales['region'].unique().tolist() if 'region' in df_ideales else []
         perfil['ingresos_ideales_media'] = df_ideales['tourism_receipts'].mean()
     else:
-        perfil['densidad_ideal_media'] = df_paises['tourism_arrivals'].median()
-        perfil['presupuesto_ideal_media'] = df_paises['costo_por_turista'].median()
+        perfil['densidad_ideal_media'] = df.loc[mask, 'tourism_arrivals'].median()
+        perfil['presupuesto_ideal_media'] = df.loc[mask, 'costo_por_turista'].median()
         perfil['tipo_turismo_ideal'] = "equilibrado"
         perfil['regiones_ideales'] = []
-        perfil['ingresos_ideales_media'] = df_paises['tourism_receipts'].median()
+        perfil['ingresos_ideales_media'] = df.loc[mask, 'tourism_receipts'].median()
     
     # Filtrar datos de no-ideales (para saber qué EVITAR)
     if paises_no_ideales:
-        df_no_ideales = df_paises[df_paises['country'].isin(paises_no_ideales)]
+        df_no_ideales = df[mask & df['country'].isin(paises_no_ideales)]
         perfil['densidad_evitar_media'] = df_no_ideales['tourism_arrivals'].mean()
         perfil['presupuesto_evitar_media'] = df_no_ideales['costo_por_turista'].mean()
         perfil['tipo_turismo_evitar'] = df_no_ideales['clasificacion_turismo'].mode()[0] if 'clasificacion_turismo' in df_no_ideales else "ninguno"
@@ -127,17 +130,213 @@ def extraer_perfil_usuario(df: pd.DataFrame, paises_ideales: List[str], paises_n
     return perfil
 
 
+# Columnas de las que se promedia el perfil (ideales y no-ideales)
+COLUMNAS_PERFIL = ['tourism_arrivals', 'costo_por_turista', 'tourism_receipts']
+
+
+class _EstadoSeleccion:
+    """
+    Estado acumulado de un lado de la selección (ideales o no-ideales).
+    """
+
+    def __init__(self):
+        self.paises = set()
+        self.sumas = {col: 0.0 for col in COLUMNAS_PERFIL}
+        self.conteos = {col: 0 for col in COLUMNAS_PERFIL}
+        self.regiones: Dict[object, Counter] = {}  # región -> posiciones de fila que la aportan
+        self.tipos = Counter()
+
+    def media(self, columna: str) -> float:
+        conteo = self.conteos[columna]
+        return self.sumas[columna] / conteo if conteo else np.nan
+
+
+class AcumuladorPerfil:
+    """
+    Perfil de usuario mantenido de forma incremental.
+
+    Guarda sumas y conteos por métrica y tablas de frecuencia de regiones y tipos de
+    turismo de cada lado de la selección, de modo que agregar o quitar un país solo
+    toca las filas de ese país. perfil() devuelve lo mismo que extraer_perfil_usuario
+    con la selección actual (las medias pueden diferir en el último decimal por el
+    orden de las sumas).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        df_paises = df[~df['country'].isin(AGREGACIONES)]
+        self._filas: Dict[str, List[int]] = {}
+        for posicion, pais in enumerate(df_paises['country'].tolist()):
+            self._filas.setdefault(pais, []).append(posicion)
+        self._valores = {col: df_paises[col].to_numpy(dtype=float) for col in COLUMNAS_PERFIL}
+        self._medianas = {col: df_paises[col].median() for col in COLUMNAS_PERFIL}
+        self._regiones = df_paises['region'].tolist() if 'region' in df_paises else None
+        self._tipos = df_paises['clasificacion_turismo'].tolist() if 'clasificacion_turismo' in df_paises else None
+        self._ideales = _EstadoSeleccion()
+        self._evitar = _EstadoSeleccion()
+
+    @classmethod
+    def desde_seleccion(cls, df: pd.DataFrame, paises_ideales: List[str],
+                        paises_no_ideales: List[str]) -> 'AcumuladorPerfil':
+        acumulador = cls(df)
+        acumulador.sincronizar(paises_ideales, paises_no_ideales)
+        return acumulador
+
+    @property
+    def paises_ideales(self) -> set:
+        return set(self._ideales.paises)
+
+    @property
+    def paises_no_ideales(self) -> set:
+        return set(self._evitar.paises)
+
+    def _actualizar(self, estado: _EstadoSeleccion, pais: str, signo: int) -> None:
+        for posicion in self._filas.get(pais, []):
+            for col in COLUMNAS_PERFIL:
+                valor = self._valores[col][posicion]
+                if valor == valor:  # mean() ignora NaN
+                    estado.sumas[col] += signo * valor
+                    estado.conteos[col] += signo
+                    if estado.conteos[col] == 0:
+                        estado.sumas[col] = 0.0  # evita arrastrar error de redondeo
+            if self._regiones is not None:
+                region = _clave_categoria(self._regiones[posicion])
+                posiciones = estado.regiones.setdefault(region, Counter())
+                posiciones[posicion] += signo
+                if posiciones[posicion] == 0:
+                    del posiciones[posicion]
+                if not posiciones:
+                    del estado.regiones[region]
+            if self._tipos is not None:
+                tipo = self._tipos[posicion]
+                if tipo is not None and tipo == tipo:  # mode() ignora nulos
+                    estado.tipos[tipo] += signo
+                    if estado.tipos[tipo] == 0:
+                        del estado.tipos[tipo]
+
+    def agregar(self, pais: str, ideal: bool = True) -> bool:
+        """
+        Agrega un país a los ideales (o a los no-ideales). Devuelve False si ya estaba.
+        """
+        estado = self._ideales if ideal else self._evitar
+        if pais in estado.paises:
+            return False
+        estado.paises.add(pais)
+        self._actualizar(estado, pais, +1)
+        return True
+
+    def quitar(self, pais: str, ideal: bool = True) -> bool:
+        """
+        Quita un país de los ideales (o de los no-ideales). Devuelve False si no estaba.
+        """
+        estado = self._ideales if ideal else self._evitar
+        if pais not in estado.paises:
+            return False
+        estado.paises.remove(pais)
+        self._actualizar(estado, pais, -1)
+        return True
+
+    def sincronizar(self, paises_ideales: Iterable[str], paises_no_ideales: Iterable[str]) -> int:
+        """
+        Lleva el acumulador a la selección dada aplicando solo las diferencias
+        (p.ej. el nuevo valor de un multiselect).
+
+        Returns:
+            Número de países agregados o quitados
+        """
+        cambios = 0
+        for estado, ideal, seleccion in ((self._ideales, True, set(paises_ideales)),
+                                         (self._evitar, False, set(paises_no_ideales))):
+            for pais in estado.paises - seleccion:
+                cambios += self.quitar(pais, ideal)
+            for pais in seleccion - estado.paises:
+                cambios += self.agregar(pais, ideal)
+        return cambios
+
+    def _regiones_ordenadas(self, estado: _EstadoSeleccion) -> list:
+        # Mismo orden que unique(): primera aparición en el DataFrame
+        return [_valor_categoria(region) for region, posiciones in
+                sorted(estado.regiones.items(), key=lambda item: min(item[1]))]
+
+    @staticmethod
+    def _moda(estado: _EstadoSeleccion, por_defecto: str) -> str:
+        # Igual que mode()[0]: el valor más frecuente y, en empate, el menor
+        if not estado.tipos:
+            return por_defecto
+        maximo = max(estado.tipos.values())
+        return min(tipo for tipo, conteo in estado.tipos.items() if conteo == maximo)
+
+    def perfil(self) -> Dict:
+        """
+        Perfil con la selección actual (mismas claves que extraer_perfil_usuario).
+        """
+        perfil = {}
+        ideales, evitar = self._ideales, self._evitar
+
+        if ideales.paises:
+            perfil['densidad_ideal_media'] = ideales.media('tourism_arrivals')
+            perfil['presupuesto_ideal_media'] = ideales.media('costo_por_turista')
+            perfil['tipo_turismo_ideal'] = self._moda(ideales, "desconocido")
+            perfil['regiones_ideales'] = self._regiones_ordenadas(ideales)
+            perfil['ingresos_ideales_media'] = ideales.media('tourism_receipts')
+        else:
+            perfil['densidad_ideal_media'] = self._medianas['tourism_arrivals']
+            perfil['presupuesto_ideal_media'] = self._medianas['costo_por_turista']
+            perfil['tipo_turismo_ideal'] = "equilibrado"
+            perfil['regiones_ideales'] = []
+            perfil['ingresos_ideales_media'] = self._medianas['tourism_receipts']
+
+        if evitar.paises:
+            perfil['densidad_evitar_media'] = evitar.media('tourism_arrivals')
+            perfil['presupuesto_evitar_media'] = evitar.media('costo_por_turista')
+            perfil['tipo_turismo_evitar'] = self._moda(evitar, "ninguno")
+            perfil['regiones_evitar'] = self._regiones_ordenadas(evitar)
+        else:
+            perfil['densidad_evitar_media'] = None
+            perfil['presupuesto_evitar_media'] = None
+            perfil['tipo_turismo_evitar'] = None
+            perfil['regiones_evitar'] = []
+
+        perfil['vector_caracteristicas'] = {
+            'densidad': perfil['densidad_ideal_media'],
+            'presupuesto': perfil['presupuesto_ideal_media'],
+            'ingresos': perfil['ingresos_ideales_media']
+        }
+        return perfil
+
+
+# NaN no es igual a sí mismo: se usa un marcador como clave en las tablas de frecuencia
+_REGION_NULA = object()
+
+
+def _clave_categoria(valor):
+    return _REGION_NULA if valor != valor else valor
+
+
+def _valor_categoria(clave):
+    return np.nan if clave is _REGION_NULA else clave
+
+
 # ============================================================================
 # SECCIÓN 2: CÁLCULO DE SIMILITUD
 # ============================================================================
 
+def ajustar_normalizador(df: pd.DataFrame, caracteristicas: List[str]) -> StandardScaler:
+    """
+    Ajusta el StandardScaler (Z-score) usado por normalizar_caracteristicas.
+    Se expone para poder transformar vectores nuevos (p.ej. el perfil) con la misma escala.
+    """
+    scaler = StandardScaler()
+    scaler.fit(df[caracteristicas])
+    return scaler
+
+
 def normalizar_caracteristicas(df: pd.DataFrame, caracteristicas: List[str]) -> pd.DataFrame:
     """
     Normaliza características usando Z-score (media=0, std=1).
     """
     df_norm = df.copy()
-    scaler = StandardScaler()
-    df_norm[caracteristicas] = scaler.fit_transform(df[caracteristicas])
+    scaler = ajustar_normalizador(df, caracteristicas)
+    df_norm[caracteristicas] = scaler.transform(df[caracteristicas])
     return df_norm
 
 
@@ -254,15 +453,250 @@ def similitud_hibrida(perfil: Dict, destino: Dict,
     return min(1.0, max(0.0, similitud_final))  # Clamp [0,1]
 
 
-def calcular_similitud_para_todos(df: pd.DataFrame, perfil: Dict) -> pd.Series:
+def _vector_perfil(perfil: Dict) -> np.ndarray:
+    """
+    Vector (densidad, presupuesto, ingresos) del perfil como array float.
+    """
+    return np.array([
+        perfil['vector_caracteristicas']['densidad'],
+        perfil['vector_caracteristicas']['presupuesto'],
+        perfil['vector_caracteristicas']['ingresos']
+    ], dtype=float)
+
+
+def matriz_destinos(df: pd.DataFrame) -> np.ndarray:
+    """
+    Matriz N×3 (tourism_arrivals, costo_por_turista, tourism_receipts) de los destinos.
+    Las columnas ausentes valen 0, igual que destino.get(..., 0) en las funciones por fila.
+    """
+    columnas = ['tourism_arrivals', 'costo_por_turista', 'tourism_receipts']
+    matriz = np.zeros((len(df), len(columnas)), dtype=float)
+    for j, col in enumerate(columnas):
+        if col in df:
+            matriz[:, j] = df[col].to_numpy(dtype=float)
+    return matriz
+
+
+# Columnas categóricas codificadas como etiquetas "<prefijo>=<valor>" (un valor por destino)
+COLUMNAS_CATEGORICAS = {'region': 'region', 'clasificacion_turismo': 'tipo'}
+
+# Columna opcional con varias etiquetas por destino separadas por ';' (p.ej. "playa;esqui;cultura")
+COLUMNA_ETIQUETAS = 'etiquetas'
+SEPARADOR_ETIQUETAS = ';'
+
+
+class CodificadorCategorias:
+    """
+    Codificación por diccionario de las categorías de los destinos en máscaras de bits.
+
+    Cada etiqueta (región, tipo de turismo o etiqueta libre) recibe un código entero y
+    cada destino una máscara N×W de palabras uint64 (W = ceil(n_etiquetas / 64)), así
+    que "¿comparte alguna etiqueta con el perfil?" es un AND + any() vectorizado sin
+    importar cuántas etiquetas haya. Los valores nulos no reciben bit.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        valores_por_columna = []
+        for columna, prefijo in COLUMNAS_CATEGORICAS.items():
+            if columna in df:
+                valores_por_columna.append([[f"{prefijo}={v}"] if _no_nulo(v) else []
+                                            for v in df[columna].tolist()])
+        if COLUMNA_ETIQUETAS in df:
+            valores_por_columna.append([
+                [f"etiqueta={e.strip()}" for e in str(v).split(SEPARADOR_ETIQUETAS) if e.strip()]
+                if _no_nulo(v) else [] for v in df[COLUMNA_ETIQUETAS].tolist()
+            ])
+
+        self.codigo: Dict[str, int] = {}
+        for valores in valores_por_columna:
+            for etiquetas in valores:
+                for etiqueta in etiquetas:
+                    self.codigo.setdefault(etiqueta, len(self.codigo))
+        self.etiquetas = list(self.codigo)
+        self.n_palabras = max(1, -(-len(self.etiquetas) // 64))
+        self.huella = hash(tuple(self.etiquetas))
+
+        self.mascaras = np.zeros((len(df), self.n_palabras), dtype=np.uint64)
+        for valores in valores_por_columna:
+            filas, codigos = [], []
+            for fila, etiquetas in enumerate(valores):
+                for etiqueta in etiquetas:
+                    filas.append(fila)
+                    codigos.append(self.codigo[etiqueta])
+            codigos = np.array(codigos, dtype=np.int64)
+            np.bitwise_or.at(self.mascaras, (np.array(filas, dtype=np.int64), codigos // 64),
+                             np.left_shift(np.uint64(1), (codigos % 64).astype(np.uint64)))
+
+    def __len__(self) -> int:
+        return len(self.mascaras)
+
+    def mascara(self, valores: List, prefijo: str = 'region') -> np.ndarray:
+        """
+        Máscara (W palabras) de una lista de valores; los desconocidos o nulos se ignoran.
+        """
+        mascara = np.zeros(self.n_palabras, dtype=np.uint64)
+        for valor in valores:
+            codigo = self.codigo.get(f"{prefijo}={valor}") if _no_nulo(valor) else None
+            if codigo is not None:
+                mascara[codigo // 64] |= np.uint64(1) << np.uint64(codigo % 64)
+        return mascara
+
+    def preferencias(self, perfil: Dict) -> Dict:
+        """
+        Preferencias categóricas del perfil como máscaras. Si el perfil ya trae
+        'preferencias_categoricas' de este mismo vocabulario, se reutilizan.
+        """
+        guardadas = perfil.get('preferencias_categoricas')
+        if guardadas is not None and guardadas['vocabulario'] == self.huella:
+            return guardadas
+        return {
+            'ideales': self.mascara(perfil['regiones_ideales']),
+            'evitar': self.mascara(perfil['regiones_evitar']),
+            # Los criterios cuentan aunque la región no esté en el vocabulario (igual que por fila)
+            'usa_ideales': bool(perfil['regiones_ideales']),
+            'usa_evitar': bool(perfil['regiones_evitar']),
+            'vocabulario': self.huella,
+        }
+
+
+def _no_nulo(valor) -> bool:
+    return valor is not None and valor == valor
+
+
+def _jaccard_desde_bits(en_ideales: np.ndarray, en_evitar: np.ndarray,
+                        usa_ideales: np.ndarray, usa_evitar: np.ndarray) -> np.ndarray:
+    # Misma regla que similitud_jaccard_categorica, con usa_* ya alineados por broadcasting
+    total_criterios = 0.5 * usa_ideales + 0.5 * usa_evitar
+    score = np.where(usa_ideales, np.where(en_ideales, 0.5, np.where(en_evitar, 0.0, 0.25)), 0.0)
+    score = score + np.where(usa_evitar, np.where(en_evitar, 0.0, 0.5), 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        jaccard = score / total_criterios
+    return np.where(total_criterios == 0, 0.5, jaccard)
+
+
+def similitud_jaccard_bits(preferencias: Dict, mascaras: np.ndarray) -> np.ndarray:
+    """
+    Jaccard categórico de un perfil contra N destinos con operaciones de bits.
+
+    Args:
+        preferencias: salida de CodificadorCategorias.preferencias
+        mascaras: array N×W de máscaras de los destinos (CodificadorCategorias.mascaras)
+    """
+    en_ideales = np.bitwise_and(mascaras, preferencias['ideales']).any(axis=1)
+    en_evitar = np.bitwise_and(mascaras, preferencias['evitar']).any(axis=1)
+    return _jaccard_desde_bits(en_ideales, en_evitar, preferencias['usa_ideales'], preferencias['usa_evitar'])
+
+
+def similitud_jaccard_vectorizada(perfil: Dict, regiones: np.ndarray) -> np.ndarray:
+    """
+    Equivalente vectorizado de similitud_jaccard_categorica.
+    """
+    score = np.zeros(len(regiones), dtype=float)
+    total_criterios = 0.0
+    en_ideales = np.isin(regiones, perfil['regiones_ideales'])
+    en_evitar = np.isin(regiones, perfil['regiones_evitar'])
+    
+    if perfil['regiones_ideales']:
+        total_criterios += 0.5
+        score += np.where(en_ideales, 0.5, np.where(en_evitar, 0.0, 0.25))
+    
+    if perfil['regiones_evitar']:
+        total_criterios += 0.5
+        score += np.where(en_evitar, 0.0, 0.5)
+    
+    if total_criterios == 0:
+        return np.full(len(regiones), 0.5)  # Neutral si no hay criterios categóricos
+    
+    return score / total_criterios
+
+
+def similitud_hibrida_vectorizada(perfil: Dict, matriz: np.ndarray, regiones: Optional[np.ndarray],
+                                  pesos: Dict = None,
+                                  codificador: Optional[CodificadorCategorias] = None) -> np.ndarray:
+    """
+    Equivalente matricial de similitud_hibrida para todos los destinos a la vez.
+    
+    Args:
+        perfil: Dict con información del perfil de usuario
+        matriz: array N×3 generado por matriz_destinos
+        regiones: array N con la región de cada destino ('' si no hay columna)
+        pesos: Dict con 'coseno', 'euclidiana', 'jaccard' (por defecto 0.5, 0.3, 0.2)
+        codificador: máscaras de categorías de los mismos N destinos; si se pasa, el
+                     Jaccard se calcula con bits y 'regiones' no se usa
+    
+    Returns:
+        array N con similitud final ponderada [0,1]
+    """
+    if pesos is None:
+        pesos = {'coseno': 0.5, 'euclidiana': 0.3, 'jaccard': 0.2}
+    
+    vector_perfil = _vector_perfil(perfil)
+    
+    # Coseno: producto punto / (norma perfil * norma destino); 0 si alguna norma es 0
+    norma_perfil = np.linalg.norm(vector_perfil)
+    normas_destino = np.linalg.norm(matriz, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sim_cos = np.clip((matriz @ vector_perfil) / (norma_perfil * normas_destino), -1.0, 1.0)
+    sim_cos[(normas_destino == 0) | (norma_perfil == 0)] = 0.0
+    
+    # Euclidiana sobre el presupuesto (1 dimensión = diferencia absoluta)
+    sim_euc = np.exp(-np.abs(matriz[:, 1] - vector_perfil[1]) / 1000)
+    
+    # Jaccard categórico sobre regiones
+    if codificador is not None:
+        sim_jac = similitud_jaccard_bits(codificador.preferencias(perfil), codificador.mascaras)
+    else:
+        sim_jac = similitud_jaccard_vectorizada(perfil, regiones)
+    
+    similitud_final = (
+        pesos['coseno'] * sim_cos +
+        pesos['euclidiana'] * sim_euc +
+        pesos['jaccard'] * sim_jac
+    )
+    
+    # Clamp [0,1]; NaN (p.ej. perfil sin datos) se trata como 0 igual que min/max por fila
+    return np.where(np.isnan(similitud_final), 0.0, np.clip(similitud_final, 0.0, 1.0))
+
+
+def _regiones_destinos(df: pd.DataFrame) -> np.ndarray:
+    """
+    Regiones de los destinos como array de objetos ('' si no hay columna 'region').
+    """
+    if 'region' in df:
+        return df['region'].to_numpy(dtype=object)
+    return np.full(len(df), '', dtype=object)
+
+
+def calcular_similitud_para_todos(df: pd.DataFrame, perfil: Dict, pesos: Dict = None,
+                                  codificador: Optional[CodificadorCategorias] = None) -> pd.Series:
     """
     Calcula similitud para cada país en el DataFrame.
     
+    Usa la versión matricial (similitud_hibrida_vectorizada) con las categorías en
+    máscaras de bits; las funciones por fila de arriba se mantienen como referencia
+    (ver calcular_similitud_por_fila).
+    
+    Args:
+        codificador: CodificadorCategorias construido sobre este mismo df (se crea si no se pasa)
+    
     Returns:
         Series con similitud [0,1] para cada país
     """
+    if codificador is None:
+        codificador = CodificadorCategorias(df)
+    similitudes = similitud_hibrida_vectorizada(
+        perfil, matriz_destinos(df), None, pesos, codificador
+    )
+    return pd.Series(similitudes, index=df.index, dtype=float)
+
+
+def calcular_similitud_por_fila(df: pd.DataFrame, perfil: Dict, pesos: Dict = None) -> pd.Series:
+    """
+    Implementación de referencia (una llamada a similitud_hibrida por fila).
+    Útil para validar la versión vectorizada; no usar en el camino crítico.
+    """
     similitudes = df.apply(
-        lambda row: similitud_hibrida(perfil, row),
+        lambda row: similitud_hibrida(perfil, row, pesos),
         axis=1
     )
     return similitudes
@@ -296,10 +730,39 @@ def segmentar_por_presupuesto(df: pd.DataFrame,
             (5000, float('inf'), 'Presupuesto Lujo')
         ]
     
+    if not bandas:
+        return {}
+    
+    # Bandas contiguas: una sola pasada con searchsorted asigna cada destino a su banda,
+    # se ordena una vez por (banda, similitud) y cada banda es un slice de ese orden
+    limites = [bandas[0][0]] + [max_val for _, max_val, _ in bandas]
+    contiguas = all(bandas[i][1] == bandas[i + 1][0] for i in range(len(bandas) - 1))
+    if not contiguas or any(a >= b for a, b in zip(limites[:-1], limites[1:])):
+        return _segmentar_por_mascaras(df, bandas)
+    
+    costos = df['costo_por_turista'].to_numpy(dtype=float)
+    banda = np.searchsorted(limites, costos, side='right')  # 0 = debajo del mínimo, len = fuera
+    similitud = df['similitud_score'].to_numpy(dtype=float)
+    orden = np.lexsort((-similitud, banda))
+    df_ordenado = df.iloc[orden]
+    cortes = np.searchsorted(banda[orden], np.arange(1, len(limites) + 1), side='left')
+    
+    segmentacion = {}
+    for i, (_, _, etiqueta) in enumerate(bandas):
+        if cortes[i + 1] > cortes[i]:
+            segmentacion[etiqueta] = df_ordenado.iloc[cortes[i]:cortes[i + 1]]
+    
+    return segmentacion
+
+
+def _segmentar_por_mascaras(df: pd.DataFrame, bandas: List[Tuple]) -> Dict[str, pd.DataFrame]:
+    """
+    Segmentación banda a banda (una máscara por banda) para bandas no contiguas o solapadas.
+    """
     segmentacion = {}
     for min_val, max_val, etiqueta in bandas:
         df_banda = df[(df['costo_por_turista'] >= min_val) & 
-                      (df['costo_por_turista'] < max_val)].copy()
+                      (df['costo_por_turista'] < max_val)]
         if not df_banda.empty:
             segmentacion[etiqueta] = df_banda.sort_values('similitud_score', ascending=False)
     
@@ -345,3 +808,77 @@ def categorizar_densidad(llegadas: float) -> Tuple[str, str]:
         return ("🟡", "Media")
     else:
         return ("🟢", "Baja")
+
+
+# ============================================================================
+# SECCIÓN 5: SIMILITUD EN LOTE (MUCHOS PERFILES × TODOS LOS DESTINOS)
+# ============================================================================
+
+def _jaccard_lote(perfiles: List[Dict], codificador: CodificadorCategorias) -> np.ndarray:
+    """
+    Jaccard categórico para P perfiles × N destinos con máscaras de bits.
+    Equivale a similitud_jaccard_bits aplicada a cada perfil.
+    """
+    preferencias = [codificador.preferencias(p) for p in perfiles]
+    ideales = np.array([p['ideales'] for p in preferencias]).reshape(len(perfiles), 1, -1)   # P×1×W
+    evitar = np.array([p['evitar'] for p in preferencias]).reshape(len(perfiles), 1, -1)
+    usa_ideales = np.array([p['usa_ideales'] for p in preferencias])[:, None]
+    usa_evitar = np.array([p['usa_evitar'] for p in preferencias])[:, None]
+    
+    mascaras = codificador.mascaras[None, :, :]                                                # 1×N×W
+    en_ideales = np.bitwise_and(mascaras, ideales).any(axis=2)                                 # P×N
+    en_evitar = np.bitwise_and(mascaras, evitar).any(axis=2)
+    return _jaccard_desde_bits(en_ideales, en_evitar, usa_ideales, usa_evitar)
+
+
+def iterar_similitud_lote(df: pd.DataFrame, perfiles: List[Dict], pesos: Dict = None,
+                          tamano_bloque: int = 1024, codificador: Optional[CodificadorCategorias] = None):
+    """
+    Calcula la similitud híbrida de P perfiles contra todos los destinos por bloques.
+    
+    Cada bloque es una matriz (≤ tamano_bloque)×N calculada con broadcasting, así que la
+    memoria de trabajo queda acotada por tamano_bloque × N aunque P sea muy grande.
+    
+    Yields:
+        Tuplas (inicio, bloque) donde bloque[i, j] = similitud del perfil inicio+i con df.iloc[j]
+    """
+    if pesos is None:
+        pesos = {'coseno': 0.5, 'euclidiana': 0.3, 'jaccard': 0.2}
+    
+    matriz = matriz_destinos(df)                     # N×3
+    normas_destino = np.linalg.norm(matriz, axis=1)  # N
+    if codificador is None:
+        codificador = CodificadorCategorias(df)
+    
+    for inicio in range(0, len(perfiles), tamano_bloque):
+        bloque_perfiles = perfiles[inicio:inicio + tamano_bloque]
+        vectores = np.array([_vector_perfil(p) for p in bloque_perfiles]).reshape(-1, 3)  # B×3
+        normas_perfil = np.linalg.norm(vectores, axis=1)
+        
+        # Coseno: B×N productos punto normalizados
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sim_cos = np.clip((vectores @ matriz.T) / np.outer(normas_perfil, normas_destino), -1.0, 1.0)
+        sim_cos[(normas_perfil == 0)[:, None] | (normas_destino == 0)[None, :]] = 0.0
+        
+        # Euclidiana sobre el presupuesto
+        sim_euc = np.exp(-np.abs(matriz[None, :, 1] - vectores[:, 1, None]) / 1000)
+        
+        sim_jac = _jaccard_lote(bloque_perfiles, codificador)
+        
+        similitud = pesos['coseno'] * sim_cos + pesos['euclidiana'] * sim_euc + pesos['jaccard'] * sim_jac
+        yield inicio, np.where(np.isnan(similitud), 0.0, np.clip(similitud, 0.0, 1.0))
+
+
+def calcular_similitud_lote(df: pd.DataFrame, perfiles: List[Dict], pesos: Dict = None,
+                            tamano_bloque: int = 1024, dtype=np.float32,
+                            codificador: Optional[CodificadorCategorias] = None) -> np.ndarray:
+    """
+    Matriz P×N de similitud híbrida (fila i = perfiles[i], columna j = df.iloc[j]).
+    
+    Para P muy grande conviene usar iterar_similitud_lote y consumir bloque a bloque
+    (p.ej. guardando solo el top-k de cada perfil) en vez de materializar la matriz.
+    """
+    resultado = np.empty((len(perfiles), len(df)), dtype=dtype)
+    for inicio, bloque in iterar_similitud_lote(df, perfiles, pesos, tamano_bloque, codificador):
+        resultado[inicio:inicio + len(bloque)] = bloque
+    return resultado
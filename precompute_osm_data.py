@@ -1,11 +1,287 @@
+import argparse
+import codecs
+import json
+import numpy as np
 import pandas as pd
+import random
 import requests
+import threading
 import time
 import os
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-# URL del API de Overpass (OpenStreetMap)
-OVERPASS_URL = "http://overpass-api.de/api/interpreter"
+from ambiente_turistico import cargar_ambiente
+from datos_turismo import CACHE_DIR, TAMANO_BLOQUE, cargar_datos, huella_csv, leer_panel_por_bloques
+from osm_local import IndiceCiudades, contar_hoteles_extractos, ensamblar_anillos, es_hotel, es_limite_ciudad
+
+# URL del API de Overpass (OpenStreetMap); se puede cambiar con OVERPASS_URL o --url
+# (p.ej. una instancia propia o un servidor de prueba local)
+OVERPASS_URL = os.environ.get('OVERPASS_URL', "http://overpass-api.de/api/interpreter")
+
+# Límites por defecto: consultas por segundo (token bucket), ráfaga y consultas en vuelo.
+# El servidor público admite pocas consultas simultáneas por IP.
+TASA_CONSULTAS = 0.5
+RAFAGA_CONSULTAS = 2
+MAX_EN_VUELO = 2
+
+# Presupuesto del servidor por consulta ([timeout:...]): la de un país trae también la
+# geometría de todos sus límites de ciudad, así que se conserva el margen original
+TIMEOUT_CONSULTA = 300
+
+# Timeouts (conexión, lectura) en segundos; la lectura cubre el [timeout:...] de la consulta
+TIMEOUT_CONEXION = 10
+TIMEOUT_LECTURA = TIMEOUT_CONSULTA + 30
+
+# Reintentos con backoff exponencial y jitter ante 429/5xx, timeouts y errores de conexión
+MAX_REINTENTOS = 5
+BACKOFF_BASE = 2.0
+BACKOFF_MAXIMO = 120.0
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+# Bytes leídos por vez al consumir la respuesta en streaming
+TAMANO_FRAGMENTO_JSON = 64 * 1024
+
+# Shards por país (un CSV por país + manifiesto) para poder reanudar una ejecución cortada
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SHARDS_DIR = os.path.join(SCRIPT_DIR, "osm_shards")
+OUTPUT_PATH = os.path.join(SCRIPT_DIR, "osm_cities_with_hotels.csv")
+NOMBRE_MANIFIESTO = "manifiesto.json"
+COLUMNAS_SALIDA = ['country', 'city', 'hotel_count']
+
+# Con --resume se vuelven a consultar los países con datos más viejos que esto
+MAX_EDAD_DIAS = 30
+
+
+# ============================================================================
+# SECCIÓN 1: LÍMITE DE TASA Y SESIÓN HTTP
+# ============================================================================
+
+class ErrorOverpass(RuntimeError):
+    """
+    La consulta llegó a Overpass pero no produjo un resultado completo (remark de error,
+    corte por tiempo o respuesta vacía sospechosa): el país se registra como fallido.
+    """
+
+
+class LimitadorTasa:
+    """
+    Token bucket compartido entre hilos: se reponen 'tasa' fichas por segundo hasta
+    'rafaga' fichas; cada consulta consume una y espera solo lo necesario si no hay.
+    El tiempo total queda acotado por la tasa permitida y no por pausas fijas.
+    """
+
+    def __init__(self, tasa: float = TASA_CONSULTAS, rafaga: int = RAFAGA_CONSULTAS,
+                 reloj=time.monotonic, dormir=time.sleep):
+        if tasa <= 0:
+            raise ValueError("La tasa debe ser positiva")
+        self.tasa = tasa
+        self.rafaga = max(1, rafaga)
+        self.reloj = reloj
+        self.dormir = dormir
+        self._fichas = float(self.rafaga)
+        self._ultimo = reloj()
+        self._lock = threading.Lock()
+
+    def adquirir(self) -> float:
+        """
+        Bloquea hasta obtener una ficha. Devuelve los segundos esperados.
+        """
+        esperado = 0.0
+        while True:
+            with self._lock:
+                ahora = self.reloj()
+                self._fichas = min(self.rafaga, self._fichas + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return esperado
+                espera = (1 - self._fichas) / self.tasa
+            self.dormir(espera)
+            esperado += espera
+
+
+def crear_sesion(max_conexiones: int = MAX_EN_VUELO) -> requests.Session:
+    """
+    Sesión con pool de conexiones keep-alive reutilizadas por todos los hilos.
+    """
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=max_conexiones)
+    sesion.mount('http://', adaptador)
+    sesion.mount('https://', adaptador)
+    return sesion
+
+
+def espera_backoff(intento: int, base: float = BACKOFF_BASE, maximo: float = BACKOFF_MAXIMO,
+                   retry_after: Optional[str] = None) -> float:
+    """
+    Segundos a esperar antes del reintento 'intento' (0, 1, ...): backoff exponencial con
+    jitter completo, o el Retry-After del servidor si es mayor.
+    """
+    espera = random.uniform(0, min(maximo, base * (2 ** intento)))
+    if retry_after:
+        try:
+            espera = max(espera, min(maximo, float(retry_after)))
+        except ValueError:
+            pass
+    return espera
+
+
+def _enviar_consulta(query: str, sesion: requests.Session, url: str, limitador: Optional[LimitadorTasa],
+                     timeout: Tuple[float, float], reintentos: int, dormir, stream: bool) -> requests.Response:
+    for intento in range(reintentos + 1):
+        if limitador is not None:
+            limitador.adquirir()
+        try:
+            response = sesion.post(url, data={'data': query}, timeout=timeout, stream=stream)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if intento == reintentos:
+                raise
+            dormir(espera_backoff(intento))
+            continue
+        if response.status_code in ESTADOS_REINTENTABLES and intento < reintentos:
+            response.close()
+            dormir(espera_backoff(intento, retry_after=response.headers.get('Retry-After')))
+            continue
+        if not response.ok:
+            response.close()
+        response.raise_for_status()  # Lanza un error para códigos 4xx/5xx
+        return response
+
+
+def consultar_overpass(query: str, sesion: requests.Session, url: str = OVERPASS_URL,
+                       limitador: Optional[LimitadorTasa] = None,
+                       timeout: Tuple[float, float] = (TIMEOUT_CONEXION, TIMEOUT_LECTURA),
+                       reintentos: int = MAX_REINTENTOS, dormir=time.sleep) -> Dict:
+    """
+    Envía una consulta respetando el límite de tasa y reintentando los errores transitorios.
+
+    Returns:
+        Respuesta JSON de Overpass
+
+    Raises:
+        requests.exceptions.RequestException si se agotan los reintentos o el error no es transitorio;
+        ErrorOverpass si la respuesta trae un 'remark' de error
+    """
+    data = _enviar_consulta(query, sesion, url, limitador, timeout, reintentos, dormir, stream=False).json()
+    verificar_remark(data.get('remark'))
+    return data
+
+
+def consultar_overpass_elementos(query: str, sesion: requests.Session, url: str = OVERPASS_URL,
+                                 limitador: Optional[LimitadorTasa] = None,
+                                 timeout: Tuple[float, float] = (TIMEOUT_CONEXION, TIMEOUT_LECTURA),
+                                 reintentos: int = MAX_REINTENTOS, dormir=time.sleep) -> Iterator[Dict]:
+    """
+    Igual que consultar_overpass, pero la respuesta se consume en streaming: devuelve
+    un iterador sobre 'elements' que decodifica un elemento a la vez, sin materializar
+    el JSON completo. La consulta se envía (y sus errores se lanzan) al llamar; si la
+    respuesta termina con un 'remark' de error, el iterador lanza ErrorOverpass al
+    agotarse (los elementos ya entregados son parciales y deben descartarse).
+    """
+    response = _enviar_consulta(query, sesion, url, limitador, timeout, reintentos, dormir, stream=True)
+
+    def elementos():
+        resto = {}
+        with response:
+            yield from iterar_elementos_json(response.iter_content(TAMANO_FRAGMENTO_JSON), resto=resto)
+        verificar_remark(resto.get('remark'))
+
+    return elementos()
+
+
+def iterar_elementos_json(fragmentos: Iterable[bytes], clave: str = 'elements',
+                          resto: Optional[Dict] = None) -> Iterator[Dict]:
+    """
+    Decodifica incrementalmente los objetos del arreglo 'clave' de un JSON que llega por
+    fragmentos (bytes UTF-8), con json.JSONDecoder.raw_decode sobre un buffer que solo
+    conserva lo pendiente. La memoria depende del elemento más grande, no de la respuesta.
+
+    Si se pasa 'resto', al cerrar el arreglo se sigue leyendo la respuesta hasta el final
+    y se guardan en ese dict los campos que vienen después (Overpass agrega ahí 'remark'
+    cuando la consulta falla o se corta por tiempo, aun respondiendo 200).
+
+    Raises:
+        json.JSONDecodeError si el JSON está mal formado; ValueError si se corta a mitad del
+        arreglo o la respuesta no tiene 'clave'
+    """
+    decodificador = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    fragmentos = iter(fragmentos)
+    marcador = f'"{clave}"'
+    buffer, pos = '', 0
+    en_arreglo, agotado = False, False
+    minimo = 0  # caracteres pendientes requeridos antes de reintentar un elemento incompleto
+
+    while True:
+        if not en_arreglo:
+            i = buffer.find(marcador, pos)
+            j = buffer.find('[', i + len(marcador)) if i >= 0 else -1
+            if j >= 0:
+                en_arreglo, pos = True, j + 1
+                continue
+            # Se conserva solo lo que aún puede contener el marcador
+            pos = i if i >= 0 else max(pos, len(buffer) - len(marcador))
+        else:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) and len(buffer) - pos >= minimo:
+                if buffer[pos] == ']':
+                    if resto is not None:
+                        resto.update(_campos_finales(buffer[pos + 1:], fragmentos, utf8))
+                    return
+                try:
+                    elemento, pos = decodificador.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if agotado:
+                        raise
+                    # Elemento incompleto: esperar al doble de datos (costo amortizado lineal)
+                    minimo = 2 * (len(buffer) - pos)
+                else:
+                    minimo = 0
+                    yield elemento
+                    continue
+
+        if agotado:
+            if en_arreglo:
+                raise ValueError(f"Respuesta JSON cortada dentro de '{clave}'")
+            raise ValueError(f"La respuesta JSON no tiene '{clave}'")
+        fragmento = next(fragmentos, None)
+        if fragmento is None:
+            agotado, minimo = True, 0
+            buffer = buffer[pos:] + utf8.decode(b'', final=True)
+        else:
+            buffer = buffer[pos:] + utf8.decode(fragmento)
+        pos = 0
+
+
+def _campos_finales(cola: str, fragmentos: Iterator[bytes], utf8) -> Dict:
+    # Lo que sigue al arreglo (p.ej. ',\n"remark": "..."\n}') es corto: se lee entero y se
+    # decodifica como los campos restantes del objeto
+    texto = cola + ''.join(utf8.decode(fragmento) for fragmento in fragmentos) + utf8.decode(b'', final=True)
+    texto = texto.strip().lstrip(',')
+    return json.loads('{' + texto) if texto.strip() != '}' else {}
+
+
+def verificar_remark(remark: Optional[str]) -> None:
+    """
+    Overpass informa los errores de ejecución (p.ej. 'runtime error: Query timed out')
+    en el campo 'remark' de una respuesta 200, con los elementos parciales o sin ninguno.
+
+    Raises:
+        ErrorOverpass si el remark indica un error o un corte por tiempo
+    """
+    if remark and any(marca in remark.lower() for marca in ('error', 'timed out')):
+        raise ErrorOverpass(remark.strip())
+
+
+# ============================================================================
+# SECCIÓN 2: CONSULTA POR PAÍS
+# ============================================================================
 
 def get_country_list(df_main: pd.DataFrame) -> pd.DataFrame:
     """
@@ -45,94 +321,379 @@ def get_country_list(df_main: pd.DataFrame) -> pd.DataFrame:
     print(f"🌍 Encontrados {len(unique_countries)} países únicos para procesar.")
     return unique_countries
 
-def get_cities_with_hotels_for_country(country_name: str, country_code: str) -> list:
+def hoteles_y_ciudades_desde_overpass(data: Dict) -> Tuple[np.ndarray, List[Tuple[str, List[np.ndarray]]]]:
     """
-    Consulta la API de Overpass UNA VEZ por país para obtener todas las ciudades con hoteles.
-    
-    Args:
-        country_name: Nombre del país (para los resultados).
-        country_code: Código ISO 3166-1 alpha-2 del país.
-    
+    Separa la respuesta de Overpass (ya decodificada) en coordenadas de hoteles y polígonos de ciudades.
+    """
+    return hoteles_y_ciudades_desde_elementos(data.get('elements', []))
+
+
+def hoteles_y_ciudades_desde_elementos(elementos: Iterable[Dict]) -> Tuple[np.ndarray, List[Tuple[str, List[np.ndarray]]]]:
+    """
+    Reduce los elementos de Overpass (p.ej. desde iterar_elementos_json) a coordenadas de
+    hoteles y polígonos de ciudades a medida que llegan: cada hotel ocupa dos floats y
+    cada ciudad sus anillos como arrays, sin conservar los dicts de la respuesta.
+
     Returns:
-        Una lista de diccionarios, cada uno con {'country', 'city', 'hotel_count'}.
+        Tupla (puntos N×2 lon/lat, [(nombre de ciudad, anillos lon/lat)]), el mismo
+        formato que osm_local.extraer_hoteles_y_ciudades
+    """
+    coordenadas, ciudades = array('d'), []
+    for element in elementos:
+        tags = element.get('tags', {})
+        if es_hotel(tags):
+            coordenada = element.get('center', element)
+            if 'lat' in coordenada and 'lon' in coordenada:
+                coordenadas.extend((coordenada['lon'], coordenada['lat']))
+        elif es_limite_ciudad(tags):
+            if element.get('type') == 'relation':
+                segmentos = [[(p['lon'], p['lat']) for p in miembro['geometry'] if p]
+                             for miembro in element.get('members', [])
+                             if miembro.get('type') == 'way' and miembro.get('geometry')]
+            else:
+                segmentos = [[(p['lon'], p['lat']) for p in element.get('geometry', []) if p]]
+            anillos = [np.array(anillo, dtype=np.float64) for anillo in ensamblar_anillos(segmentos)]
+            if anillos:
+                ciudades.append((tags['name'], anillos))
+    return np.frombuffer(coordenadas, dtype=np.float64).reshape(-1, 2).copy(), ciudades
+
+
+def construir_consulta(country_code: str) -> str:
     """
+    Consulta Overpass QL de un país (hoteles con coordenadas + límites de ciudad).
+
+    Args:
+        country_code: código ISO 3166-1 del país; alpha-3 (el del CSV del Banco Mundial)
+                      o alpha-2.
+    """
+    # La etiqueta "ISO3166-1" de OSM guarda el código alpha-2; el alpha-3 está en
+    # "ISO3166-1:alpha3". Con la etiqueta equivocada el área no coincide con nada.
+    etiqueta = 'ISO3166-1' if len(country_code) == 2 else 'ISO3166-1:alpha3'
     # Consulta Overpass QL optimizada:
     # 1. Define el área del país.
-    # 2. Encuentra todos los hoteles (nodos, vías, relaciones) dentro de esa área.
-    # 3. Para cada hotel, encuentra la ciudad que lo contiene.
-    # 4. Agrupa por ciudad y cuenta los hoteles.
-    query = f"""
-    [out:json][timeout:300];
-    area["ISO3166-1"="{country_code}"][admin_level=2]->.country;
+    # 2. Devuelve las coordenadas de todos los hoteles (nodos, vías y relaciones, estas
+    #    dos por su centro).
+    # 3. Devuelve una sola vez los límites de ciudad (admin_level=8) con su geometría.
+    # La asignación hotel -> ciudad se hace localmente con un índice espacial, en lugar
+    # de un 'is_in' por hotel en el servidor.
+    return f"""
+    [out:json][timeout:{TIMEOUT_CONSULTA}];
+    area["{etiqueta}"="{country_code}"][admin_level=2]->.country;
     (
       node["tourism"="hotel"](area.country);
       way["tourism"="hotel"](area.country);
       relation["tourism"="hotel"](area.country);
-    )->.hotels;
-    foreach .hotels -> .hotel (
-      .hotel is_in;
-      area._[admin_level=8]["name"];
-      out;
-    )
+    );
+    out center tags;
+    (
+      relation["admin_level"="8"]["name"](area.country);
+      way["admin_level"="8"]["name"](area.country);
+    );
+    out geom tags;
     """
+
+
+def get_cities_with_hotels_for_country(country_name: str, country_code: str,
+                                       sesion: Optional[requests.Session] = None, url: str = OVERPASS_URL,
+                                       limitador: Optional[LimitadorTasa] = None, lanzar_errores: bool = False) -> list:
+    """
+    Consulta la API de Overpass UNA VEZ por país para obtener todas las ciudades con hoteles.
+    
+    Args:
+        country_name: Nombre del país (para los resultados).
+        country_code: Código ISO 3166-1 del país (alpha-3, como en el CSV principal, o alpha-2).
+        sesion: sesión HTTP compartida (por defecto una nueva).
+        url: endpoint de Overpass.
+        limitador: límite de tasa compartido entre hilos (None = sin límite).
+        lanzar_errores: si es True, los errores se propagan en lugar de devolver []
+                        (para distinguir un país sin ciudades con hoteles de uno que falló;
+                        una respuesta sin ningún hotel también se trata como error).
+    
+    Returns:
+        Una lista de diccionarios, cada uno con {'country', 'city', 'hotel_count'}.
+    """
+    query = construir_consulta(country_code)
     try:
-        response = requests.post(OVERPASS_URL, data={'data': query})
-        response.raise_for_status()  # Lanza un error para códigos 4xx/5xx
-        data = response.json()
+        # La respuesta se decodifica en streaming, elemento a elemento
+        elementos = consultar_overpass_elementos(query, sesion or crear_sesion(1), url, limitador)
         
-        # Procesar la respuesta para contar hoteles por ciudad
-        city_counts = {}
-        for element in data.get('elements', []):
-            if element.get('type') == 'area' and 'name' in element.get('tags', {}):
-                city_name = element['tags']['name']
-                city_counts[city_name] = city_counts.get(city_name, 0) + 1
+        # Contar hoteles por ciudad con el índice espacial
+        puntos, ciudades = hoteles_y_ciudades_desde_elementos(elementos)
+        if len(puntos) == 0:
+            # Ningún país con datos de turismo tiene 0 hoteles en OSM: casi siempre es un área
+            # que no coincidió o una respuesta incompleta, así que no se guarda como 'ok'
+            raise ErrorOverpass(f"0 hoteles para {country_code} (área sin coincidencias o respuesta incompleta)")
+        city_counts = IndiceCiudades(ciudades).contar(puntos)
         
         # Formatear la salida
         return [{'country': country_name, 'city': city, 'hotel_count': count} for city, count in city_counts.items()]
 
     except requests.exceptions.RequestException as e:
         print(f"   - ❌ Error de red para {country_name}: {e}")
+        if lanzar_errores:
+            raise
+        return []
+    except ErrorOverpass as e:
+        print(f"   - ⚠️ Respuesta incompleta para {country_name}: {e}")
+        if lanzar_errores:
+            raise
         return []
     except Exception as e:
         print(f"   - ❌ Error inesperado procesando {country_name}: {e}")
+        if lanzar_errores:
+            raise
         return []
 
+# ============================================================================
+# SECCIÓN 3: SHARDS POR PAÍS Y MANIFIESTO
+# ============================================================================
+
+def _escribir_atomico(path: str, escribir: Callable) -> None:
+    # Archivo temporal + os.replace: un corte a mitad de escritura no deja archivos truncados
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        escribir(f)
+    os.replace(tmp_path, path)
+
+
+def ruta_shard(directorio: str, country_code: str) -> str:
+    return os.path.join(directorio, f"{country_code}.csv")
+
+
+def escribir_shard(directorio: str, country_code: str, filas: List[Dict]) -> str:
+    """
+    Guarda las ciudades de un país (aunque no tenga ninguna) de forma atómica.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    path = ruta_shard(directorio, country_code)
+    df = pd.DataFrame(filas, columns=COLUMNAS_SALIDA)
+    _escribir_atomico(path, lambda f: df.to_csv(f, index=False))
+    return path
+
+
+def leer_manifiesto(directorio: str) -> Dict[str, Dict]:
+    """
+    Returns:
+        Dict {country_code: {'country', 'estado', 'filas', 'timestamp', 'ultimo_error', 'timestamp_error'}}
+        (vacío si todavía no hay manifiesto). 'estado' es 'ok' si el país tiene un shard
+        válido (de la consulta exitosa de 'timestamp') y 'error' si nunca lo tuvo;
+        'ultimo_error' y 'timestamp_error' describen la última consulta fallida posterior.
+    """
+    path = os.path.join(directorio, NOMBRE_MANIFIESTO)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def guardar_manifiesto(directorio: str, manifiesto: Dict[str, Dict]) -> None:
+    os.makedirs(directorio, exist_ok=True)
+    _escribir_atomico(os.path.join(directorio, NOMBRE_MANIFIESTO),
+                      lambda f: json.dump(manifiesto, f, ensure_ascii=False, indent=1, sort_keys=True))
+
+
+def paises_pendientes(countries: List[Tuple[str, str]], manifiesto: Dict[str, Dict], directorio: str,
+                      max_edad: timedelta = timedelta(days=MAX_EDAD_DIAS),
+                      ahora: Optional[datetime] = None) -> List[Tuple[str, str]]:
+    """
+    Países sin shard válido y actual: nunca consultados, fallidos (aunque conserven el
+    shard de una consulta anterior), con datos más viejos que max_edad o cuyo archivo
+    ya no existe.
+    """
+    ahora = ahora or datetime.now(timezone.utc)
+    pendientes = []
+    for nombre, codigo in countries:
+        entrada = manifiesto.get(codigo)
+        vigente = (
+            entrada is not None
+            and entrada.get('estado') == 'ok'
+            and 'ultimo_error' not in entrada
+            and ahora - datetime.fromisoformat(entrada['timestamp']) <= max_edad
+            and os.path.exists(ruta_shard(directorio, codigo))
+        )
+        if not vigente:
+            pendientes.append((nombre, codigo))
+    return pendientes
+
+
+def fusionar_shards(countries: List[Tuple[str, str]], manifiesto: Dict[str, Dict], directorio: str,
+                    output_path: str = OUTPUT_PATH) -> pd.DataFrame:
+    """
+    Compacta los shards exitosos en el CSV final (en el orden de 'countries'), de forma
+    atómica. Un país cuyo último refresco falló entra con su shard exitoso anterior.
+    """
+    partes = [
+        pd.read_csv(ruta_shard(directorio, codigo))
+        for _, codigo in countries
+        if manifiesto.get(codigo, {}).get('estado') == 'ok' and os.path.exists(ruta_shard(directorio, codigo))
+    ]
+    df = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUMNAS_SALIDA)
+    _escribir_atomico(output_path, lambda f: df.to_csv(f, index=False))
+    return df
+
+
+# ============================================================================
+# SECCIÓN 4: ORQUESTACIÓN CONCURRENTE
+# ============================================================================
+
+def fetch_all_countries(countries: List[Tuple[str, str]], url: str = OVERPASS_URL,
+                        max_en_vuelo: int = MAX_EN_VUELO, tasa: float = TASA_CONSULTAS,
+                        rafaga: int = RAFAGA_CONSULTAS, progreso: bool = True,
+                        al_completar: Optional[Callable[[str, str, Optional[List[Dict]], Optional[Exception]], None]] = None
+                        ) -> List[Dict]:
+    """
+    Consulta todos los países con a lo sumo max_en_vuelo consultas simultáneas, una
+    sesión con pool de conexiones compartida y un token bucket común.
+
+    Args:
+        countries: pares (nombre, código) a consultar.
+        al_completar: se llama en el hilo principal al terminar cada país con
+                      (nombre, código, filas, None) o (nombre, código, None, error).
+
+    Returns:
+        Filas {'country', 'city', 'hotel_count'} de los países exitosos, en el mismo orden que 'countries'.
+    """
+    sesion = crear_sesion(max_en_vuelo)
+    limitador = LimitadorTasa(tasa, rafaga)
+    resultados: List[List[Dict]] = [[] for _ in countries]
+
+    with ThreadPoolExecutor(max_workers=max_en_vuelo) as pool:
+        futuros = {
+            pool.submit(get_cities_with_hotels_for_country, nombre, codigo, sesion, url, limitador, True): i
+            for i, (nombre, codigo) in enumerate(countries)
+        }
+        for futuro in tqdm(as_completed(futuros), total=len(futuros), desc="Procesando Países", disable=not progreso):
+            i = futuros[futuro]
+            nombre, codigo = countries[i]
+            try:
+                resultados[i] = futuro.result()
+            except Exception as e:
+                if al_completar is not None:
+                    al_completar(nombre, codigo, None, e)
+                continue
+            if al_completar is not None:
+                al_completar(nombre, codigo, resultados[i], None)
+            if resultados[i]:
+                print(f"  - ✔️ {nombre}: Encontradas {len(resultados[i])} ciudades con hoteles.")
+
+    sesion.close()
+    return [fila for filas in resultados for fila in filas]
+
+
+def precalcular_shards(countries: List[Tuple[str, str]], directorio: str = SHARDS_DIR, resume: bool = False,
+                       max_edad: timedelta = timedelta(days=MAX_EDAD_DIAS), extractos: Optional[str] = None,
+                       procesos: Optional[int] = None, **opciones_fetch) -> Dict[str, Dict]:
+    """
+    Consulta los países (con resume, solo los pendientes) y guarda cada uno en su shard
+    apenas termina, registrando éxito/error y fecha en el manifiesto. Un corte a mitad
+    de ejecución conserva todo lo ya escrito. Si falla el refresco de un país que ya
+    tenía un shard exitoso, ese shard se conserva (y se sigue fusionando); el fallo
+    queda en 'ultimo_error' y el país sigue pendiente para el próximo --resume.
+
+    Con 'extractos' los datos salen de extractos OSM locales (<código>.osm / .osm.pbf en
+    ese directorio, ver osm_local) procesados en 'procesos' procesos, sin usar la API.
+
+    Returns:
+        Manifiesto actualizado
+    """
+    # El manifiesto se lee siempre (también sin resume) para no perder los shards exitosos
+    # de países cuyo refresco falle
+    manifiesto = leer_manifiesto(directorio)
+    pendientes = paises_pendientes(countries, manifiesto, directorio, max_edad) if resume else list(countries)
+    print(f"📋 {len(pendientes)} de {len(countries)} países por consultar"
+          + (f" ({len(countries) - len(pendientes)} vigentes reutilizados)" if resume else ""))
+
+    def registrar(nombre: str, codigo: str, filas: Optional[List[Dict]], error: Optional[Exception]) -> None:
+        ahora = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        if error is None:
+            escribir_shard(directorio, codigo, filas)
+            entrada = {'country': nombre, 'estado': 'ok', 'filas': len(filas), 'timestamp': ahora}
+        else:
+            anterior = manifiesto.get(codigo, {})
+            if anterior.get('estado') == 'ok' and os.path.exists(ruta_shard(directorio, codigo)):
+                # Un error transitorio no borra datos: se conserva el último shard exitoso
+                entrada = dict(anterior)
+            else:
+                entrada = {'country': nombre, 'estado': 'error'}
+            entrada.update(ultimo_error=f"{type(error).__name__}: {error}", timestamp_error=ahora)
+        manifiesto[codigo] = entrada
+        guardar_manifiesto(directorio, manifiesto)
+
+    if extractos:
+        contar_hoteles_extractos(pendientes, extractos, procesos, al_completar=registrar)
+    else:
+        fetch_all_countries(pendientes, al_completar=registrar, **opciones_fetch)
+    return manifiesto
+
+
 def main():
     """
     Función principal para ejecutar el pre-cómputo de datos de hoteles.
     """
+    parser = argparse.ArgumentParser(description="Pre-cálculo de ciudades con hoteles desde OpenStreetMap (Overpass)")
+    parser.add_argument('--url', default=OVERPASS_URL, help="Endpoint de Overpass (por defecto $OVERPASS_URL o el público)")
+    parser.add_argument('--workers', type=int, default=MAX_EN_VUELO, help="Consultas simultáneas como máximo")
+    parser.add_argument('--tasa', type=float, default=TASA_CONSULTAS, help="Consultas por segundo (token bucket)")
+    parser.add_argument('--rafaga', type=int, default=RAFAGA_CONSULTAS, help="Consultas seguidas permitidas sin esperar")
+    parser.add_argument('--shards', default=SHARDS_DIR, help="Directorio de shards por país y manifiesto")
+    parser.add_argument('--resume', action='store_true',
+                        help="Reanudar: solo consulta países fallidos, faltantes o con datos viejos")
+    parser.add_argument('--max-edad-dias', type=float, default=MAX_EDAD_DIAS,
+                        help="Con --resume, antigüedad máxima de un shard para reutilizarlo")
+    parser.add_argument('--solo-fusionar', action='store_true', help="No consultar: solo compactar los shards en el CSV")
+    parser.add_argument('-o', '--salida', default=OUTPUT_PATH, help="CSV final")
+    parser.add_argument('--extractos', help="Modo offline: directorio con extractos OSM <country_code>.osm "
+                                            "o .osm.pbf (uno por país); no se usa la API")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos para el modo offline (por defecto, CPUs)")
+    args = parser.parse_args()
+
     print("🚀 Iniciando el script para pre-calcular datos de hoteles desde OpenStreetMap.")
     
     # Cargar datos principales para obtener la lista de países
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    main_csv_path = os.path.join(script_dir, "world_tourism_economy_data.csv")
-    df_main = pd.read_csv(main_csv_path)
+    main_csv_path = os.path.join(SCRIPT_DIR, "world_tourism_economy_data.csv")
+    # Solo se necesitan los pares (país, código): se leen por bloques y se deduplican
+    # en cada bloque, así que la memoria no depende del tamaño del CSV (get_country_list
+    # aplica su propia lista de agregaciones)
+    df_main = pd.concat(
+        bloque.drop_duplicates()
+        for bloque in leer_panel_por_bloques(main_csv_path, TAMANO_BLOQUE, columnas=['country', 'country_code'],
+                                             filtrar=False)
+    ).drop_duplicates()
     
     countries_to_process = get_country_list(df_main)
-    
-    all_results = []
-    
-    # Usar tqdm para una barra de progreso
-    for index, row in tqdm(countries_to_process.iterrows(), total=len(countries_to_process), desc="Procesando Países"):
-        country_name = row['country']
-        # El código de país debe ser el alpha-2 (2 letras) para la API de Overpass
-        country_code_alpha2 = df_main[df_main['country_code'] == row['country_code']]['country_code'].iloc[0]
-        
-        # Realizar una única consulta por país
-        country_cities_data = get_cities_with_hotels_for_country(country_name, country_code_alpha2)
-        
-        if country_cities_data:
-            all_results.extend(country_cities_data)
-            print(f"  - ✔️ {country_name}: Encontradas {len(country_cities_data)} ciudades con hoteles.")
-        
-        time.sleep(10) # Pausa de 10 segundos entre cada país para ser respetuosos con la API
+    countries = list(zip(countries_to_process['country'], countries_to_process['country_code']))
 
-    # Guardar los resultados en un nuevo CSV
-    df_results = pd.DataFrame(all_results)
-    output_path = os.path.join(script_dir, "osm_cities_with_hotels.csv")
-    df_results.to_csv(output_path, index=False)
-    
-    print(f"\n✅ Proceso completado. Datos guardados en: {output_path}")
+    if args.solo_fusionar:
+        manifiesto = leer_manifiesto(args.shards)
+    else:
+        # Consultas concurrentes limitadas por tasa (o extractos locales); cada país se guarda apenas termina
+        inicio = time.perf_counter()
+        manifiesto = precalcular_shards(countries, args.shards, args.resume, timedelta(days=args.max_edad_dias),
+                                        args.extractos, args.procesos,
+                                        url=args.url, max_en_vuelo=args.workers, tasa=args.tasa, rafaga=args.rafaga)
+        print(f"⏱️ Consultas terminadas en {time.perf_counter() - inicio:.1f}s")
+
+    # Compactar los shards en el CSV final
+    df_results = fusionar_shards(countries, manifiesto, args.shards, args.salida)
+    fallidos = [nombre for nombre, codigo in countries if manifiesto.get(codigo, {}).get('estado') != 'ok']
+    desactualizados = [nombre for nombre, codigo in countries
+                       if manifiesto.get(codigo, {}).get('estado') == 'ok' and 'ultimo_error' in manifiesto[codigo]]
+
+    print(f"\n✅ Proceso completado. {len(df_results):,} ciudades guardadas en: {args.salida}")
+    if fallidos:
+        print(f"⚠️ {len(fallidos)} países sin datos (fallidos o sin consultar); "
+              f"vuelve a ejecutar con --resume para reintentarlos: {', '.join(fallidos[:10])}"
+              + ("..." if len(fallidos) > 10 else ""))
+    if desactualizados:
+        print(f"⚠️ {len(desactualizados)} países con datos de una consulta anterior (falló el refresco); "
+              f"vuelve a ejecutar con --resume para reintentarlos: {', '.join(desactualizados[:10])}"
+              + ("..." if len(desactualizados) > 10 else ""))
+
+    # Agregados del termómetro de ambiente turístico, precalculados para que la app solo los lea
+    if os.path.abspath(args.salida) == OUTPUT_PATH:
+        _, df_destinos = cargar_datos(main_csv_path, CACHE_DIR)
+        ambiente = cargar_ambiente(df_destinos, args.salida, CACHE_DIR, huella_csv(main_csv_path)['sha1'][:16])
+        print(f"🌡️ Termómetro de ambiente turístico precalculado para {len(ambiente)} países")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
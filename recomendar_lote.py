@@ -0,0 +1,231 @@
+# Recomendaciones en Lote
+# CLI para precalcular recomendaciones de un archivo de perfiles de viajero (JSONL o CSV).
+# Los perfiles se leen en streaming, se reparten en lotes a un pool de procesos (cada
+# worker carga el dataset una sola vez) y los resultados se escriben en orden a un JSONL.
+#
+# Formato de entrada (un perfil por línea/fila):
+#   id, paises_ideales, paises_no_ideales, presupuesto, interes_turistico, salud_economica, region, k,
+#   ventana_crecimiento, as_of_year
+#   En CSV las listas de países se separan con ';' (p.ej. "Spain;France").
+#
+# Uso:
+#   python recomendar_lote.py perfiles.jsonl -o recomendaciones.jsonl --workers 8
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from datos_turismo import CSV_PATH
+from motor_recomendacion import MotorRecomendacion
+
+CAMPOS_CONSULTA = ('presupuesto', 'interes_turistico', 'salud_economica', 'region', 'k', 'ventana_crecimiento',
+                   'as_of_year')
+SEPARADOR_PAISES = ';'
+# Campos numéricos que en CSV llegan como texto; se convierten en el worker (ver recomendar_perfil)
+TIPOS_CSV = {'presupuesto': float, 'k': int, 'ventana_crecimiento': int, 'as_of_year': int}
+
+_MOTOR = None
+
+
+class EntradaInvalida(NamedTuple):
+    """
+    Línea del JSONL que no es un perfil; se reporta como error en su registro de salida.
+    """
+    linea: int
+    error: str
+
+
+# ============================================================================
+# SECCIÓN 1: LECTURA DE PERFILES
+# ============================================================================
+
+def leer_perfiles(path: str) -> Iterator[Union[Dict, EntradaInvalida]]:
+    """
+    Lee perfiles en streaming desde un .jsonl o .csv (según la extensión). Una línea
+    JSONL mal formada o que no es un objeto se entrega como EntradaInvalida (con su
+    número de línea) en lugar de detener la lectura.
+    """
+    if path.lower().endswith('.csv'):
+        yield from _leer_perfiles_csv(path)
+    else:
+        with open(path, encoding='utf-8') as f:
+            for numero, linea in enumerate(f, start=1):
+                if not linea.strip():
+                    continue
+                try:
+                    perfil = json.loads(linea)
+                except json.JSONDecodeError as e:
+                    yield EntradaInvalida(numero, f"JSON inválido: {e}")
+                    continue
+                if isinstance(perfil, dict):
+                    yield perfil
+                else:
+                    yield EntradaInvalida(numero, f"el perfil debe ser un objeto JSON (recibido {type(perfil).__name__})")
+
+
+def _leer_perfiles_csv(path: str) -> Iterator[Dict]:
+    # Los valores quedan como texto: una celda mal escrita debe fallar solo su fila, en el worker
+    with open(path, encoding='utf-8', newline='') as f:
+        for fila in csv.DictReader(f):
+            perfil = {clave: valor for clave, valor in fila.items() if valor not in (None, '')}
+            for clave in ('paises_ideales', 'paises_no_ideales'):
+                perfil[clave] = [p.strip() for p in perfil.get(clave, '').split(SEPARADOR_PAISES) if p.strip()]
+            yield perfil
+
+
+# ============================================================================
+# SECCIÓN 2: SCORING (workers)
+# ============================================================================
+
+def _inicializar_worker(csv_path: str, compacto: bool = False) -> None:
+    """
+    Carga el motor una vez por proceso (reutiliza el snapshot binario del CSV).
+    """
+    global _MOTOR
+    _MOTOR = MotorRecomendacion.desde_csv(csv_path, compacto=compacto)
+
+
+def recomendar_perfil(motor: MotorRecomendacion, entrada: Union[Dict, EntradaInvalida]) -> Dict:
+    """
+    Recomendaciones para un perfil de viajero. Los errores se devuelven en el registro
+    para no detener el lote completo.
+    """
+    salida = {'id': None}
+    try:
+        if isinstance(entrada, EntradaInvalida):
+            raise ValueError(f"línea {entrada.linea}: {entrada.error}")
+        if not isinstance(entrada, dict):
+            raise ValueError(f"el perfil debe ser un objeto (recibido {type(entrada).__name__})")
+        salida['id'] = entrada.get('id')
+        consulta = {clave: _convertir_campo(clave, entrada[clave]) for clave in CAMPOS_CONSULTA if clave in entrada}
+        as_of_year = consulta.get('as_of_year')
+        consulta['perfil'] = motor.generar_perfil(entrada.get('paises_ideales', []),
+                                                  entrada.get('paises_no_ideales', []),
+                                                  as_of_year=None if as_of_year is None else int(as_of_year))
+        resultado = motor.recomendar(consulta)
+        df = resultado['recomendaciones']
+        salida['recomendaciones'] = [
+            {'country': pais, 'score_final': _redondear(score), 'similitud_score': _redondear(similitud)}
+            for pais, score, similitud in zip(df['country'], df['score_final'], df['similitud_score'])
+        ]
+        if resultado['aviso']:
+            salida['aviso'] = resultado['aviso']
+    except Exception as e:
+        salida['error'] = str(e)
+    return salida
+
+
+def _convertir_campo(clave: str, valor):
+    """
+    Convierte los campos numéricos que llegan como texto (CSV); el resto queda igual.
+
+    Raises:
+        ValueError: Si el texto no es un número válido para el campo
+    """
+    tipo = TIPOS_CSV.get(clave)
+    if tipo is None or not isinstance(valor, str):
+        return valor
+    try:
+        return tipo(valor)
+    except ValueError:
+        raise ValueError(f"'{clave}' debe ser numérico (recibido {valor!r})") from None
+
+
+def _redondear(valor: float) -> Optional[float]:
+    # NaN no es JSON válido: se escribe como null
+    return None if valor != valor else round(float(valor), 6)
+
+
+def _procesar_lote(lote: List[Dict]) -> Tuple[List[str], int]:
+    # Se devuelven líneas JSON ya serializadas para no re-serializar en el proceso principal
+    resultados = [recomendar_perfil(_MOTOR, entrada) for entrada in lote]
+    lineas = [json.dumps(resultado, ensure_ascii=False) for resultado in resultados]
+    return lineas, sum('error' in resultado for resultado in resultados)
+
+
+# ============================================================================
+# SECCIÓN 3: ORQUESTACIÓN
+# ============================================================================
+
+def _lotes(perfiles: Iterator[Dict], tamano: int) -> Iterator[List[Dict]]:
+    while True:
+        lote = list(islice(perfiles, tamano))
+        if not lote:
+            return
+        yield lote
+
+
+def procesar_archivo(entrada: str, salida: str, workers: int, tamano_lote: int = 256,
+                     csv_path: str = CSV_PATH, progreso: bool = True, compacto: bool = False) -> Dict:
+    """
+    Procesa el archivo de perfiles con memoria acotada: como máximo 2 × workers lotes
+    en vuelo; los resultados se escriben en el mismo orden que la entrada.
+
+    Returns:
+        Dict con 'perfiles', 'errores', 'segundos' y 'perfiles_por_segundo'
+    """
+    inicio = time.perf_counter()
+    total = errores = 0
+    max_en_vuelo = 2 * workers
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker,
+                             initargs=(csv_path, compacto)) as pool, \
+            open(salida, 'w', encoding='utf-8') as f_salida:
+        pendientes = deque()
+
+        def escribir_siguiente():
+            nonlocal total, errores
+            lineas, errores_lote = pendientes.popleft().result()
+            f_salida.write('\n'.join(lineas) + '\n')
+            total += len(lineas)
+            errores += errores_lote
+            if progreso:
+                segundos = time.perf_counter() - inicio
+                print(f"\r  - {total:,} perfiles ({total / segundos:,.0f} perfiles/s)", end='', file=sys.stderr)
+
+        for lote in _lotes(leer_perfiles(entrada), tamano_lote):
+            pendientes.append(pool.submit(_procesar_lote, lote))
+            if len(pendientes) >= max_en_vuelo:
+                escribir_siguiente()
+        while pendientes:
+            escribir_siguiente()
+
+    segundos = time.perf_counter() - inicio
+    if progreso:
+        print(file=sys.stderr)
+    return {
+        'perfiles': total,
+        'errores': errores,
+        'segundos': round(segundos, 3),
+        'perfiles_por_segundo': round(total / segundos, 1) if segundos > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recomendaciones en lote para un archivo de perfiles (JSONL/CSV)")
+    parser.add_argument('entrada', help="Archivo de perfiles (.jsonl o .csv)")
+    parser.add_argument('-o', '--salida', default='recomendaciones_lote.jsonl', help="Archivo JSONL de salida")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--tamano-lote', type=int, default=256, help="Perfiles por tarea enviada a un worker")
+    parser.add_argument('--csv', default=CSV_PATH, help="Ruta del CSV de datos")
+    parser.add_argument('--compacto', action='store_true',
+                        help="Tipos reducidos (category/int16/float32) para bajar la memoria por worker")
+    args = parser.parse_args()
+
+    print(f"🚀 Procesando {args.entrada} con {args.workers} workers...")
+    resumen = procesar_archivo(args.entrada, args.salida, args.workers, args.tamano_lote, args.csv,
+                               compacto=args.compacto)
+    print(f"✅ {resumen['perfiles']:,} perfiles en {resumen['segundos']:.1f}s "
+          f"({resumen['perfiles_por_segundo']:,.0f} perfiles/s, {resumen['errores']} con error)")
+    print(f"   Resultados guardados en: {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
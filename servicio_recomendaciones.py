@@ -0,0 +1,382 @@
+# Servicio JSON de Recomendaciones
+# Servidor HTTP asyncio (solo librería estándar) que expone el motor de recomendación
+# a otras aplicaciones internas sin abrir una sesión de Streamlit por cliente.
+#
+# Endpoints:
+#   POST /recomendar  -> top-k de destinos (mismos parámetros que la UI)
+#   POST /similitud   -> similitud del perfil con cada destino
+#   GET  /metrics     -> contadores, histogramas de latencia y caché de resultados por worker
+#   GET  /salud       -> estado del servicio
+#
+# Uso:
+#   python servicio_recomendaciones.py --port 8502 --workers 4
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from cache_resultados import CACHE_RESULTADOS
+from datos_turismo import CSV_PATH
+from motor_recomendacion import MotorRecomendacion
+
+# Columnas devueltas por /recomendar
+COLUMNAS_RESPUESTA = [
+    'country', 'country_code', 'year', 'costo_por_turista', 'tourism_arrivals', 'tourism_receipts',
+    'crecimiento_anual', 'inflation', 'unemployment', 'gdp', 'score_general', 'similitud_score', 'score_final',
+]
+
+# Límites superiores (segundos) de los buckets del histograma de latencia
+BUCKETS_LATENCIA = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+
+MAX_CUERPO = 1 << 20  # 1 MB
+
+MENSAJES_HTTP = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                 413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+# ============================================================================
+# SECCIÓN 1: TRABAJO DE SCORING (se ejecuta en el pool de workers)
+# ============================================================================
+
+_MOTOR = None
+_CSV_WORKER = CSV_PATH
+_COMPACTO_WORKER = False
+_LOCK_MOTOR = threading.Lock()
+
+
+def _inicializar_worker(csv_path: str, compacto: bool = False) -> None:
+    """
+    Inicializador del pool: carga el motor una vez por proceso worker.
+    """
+    global _CSV_WORKER, _COMPACTO_WORKER
+    _CSV_WORKER = csv_path
+    _COMPACTO_WORKER = compacto
+    _obtener_motor()
+
+
+def _obtener_motor() -> MotorRecomendacion:
+    global _MOTOR
+    if _MOTOR is None:
+        with _LOCK_MOTOR:
+            if _MOTOR is None:
+                _MOTOR = MotorRecomendacion.desde_csv(_CSV_WORKER, compacto=_COMPACTO_WORKER)
+    return _MOTOR
+
+
+def _perfil_de_consulta(motor: MotorRecomendacion, cuerpo: Dict, as_of_year: Optional[int] = None) -> Optional[Dict]:
+    """
+    Construye el perfil si la consulta trae 'paises_ideales' o 'paises_no_ideales'
+    (con as_of_year, sobre la tabla vista desde ese año).
+    """
+    if 'paises_ideales' not in cuerpo and 'paises_no_ideales' not in cuerpo:
+        return None
+    return motor.generar_perfil(list(cuerpo.get('paises_ideales', [])), list(cuerpo.get('paises_no_ideales', [])),
+                                as_of_year=as_of_year)
+
+
+def ejecutar_recomendar(cuerpo: Dict) -> Dict:
+    """
+    Scoring de /recomendar (función de módulo para poder enviarla a otro proceso).
+    """
+    motor = _obtener_motor()
+    consulta = {clave: cuerpo[clave] for clave in
+                ('presupuesto', 'interes_turistico', 'salud_economica', 'region', 'k', 'ventana_crecimiento', 'as_of_year') if clave in cuerpo}
+    as_of_year = consulta.get('as_of_year')
+    consulta['perfil'] = _perfil_de_consulta(motor, cuerpo, None if as_of_year is None else int(as_of_year))
+    resultado = motor.recomendar(consulta)
+    df = resultado['recomendaciones']
+    columnas = [col for col in COLUMNAS_RESPUESTA if col in df]
+    return {
+        'recomendaciones': json.loads(df[columnas].to_json(orient='records')),
+        'perfil_activo': resultado['perfil_activo'],
+        'aviso': resultado['aviso'],
+    }
+
+
+def ejecutar_similitud(cuerpo: Dict) -> Dict:
+    """
+    Scoring de /similitud: similitud del perfil con todos los destinos (o con 'paises').
+    """
+    motor = _obtener_motor()
+    perfil = _perfil_de_consulta(motor, cuerpo) or motor.generar_perfil([], [])
+    # Misma clave de caché que el motor: el vector completo se calcula una vez por perfil.
+    # Vector y países se leen de la misma versión de los datos
+    datos = motor.datos
+    similitudes = motor.similitud_perfil(perfil, datos=datos)
+    paises = datos.df_destinos['country']
+    if cuerpo.get('paises'):
+        seleccion = paises.isin(cuerpo['paises']).to_numpy()
+        paises, similitudes = paises[seleccion], similitudes[seleccion]
+    return {'similitud': dict(zip(paises.tolist(), similitudes.astype(float).round(6).tolist()))}
+
+
+def ejecutar_en_worker(ruta: str, cuerpo: Dict) -> Tuple[Dict, int, Dict]:
+    """
+    Ejecuta el scoring de una ruta y adjunta el pid y las estadísticas de la caché de
+    resultados del worker, para poder reportarlas en /metrics.
+    """
+    resultado = ServicioRecomendaciones.RUTAS_SCORING[ruta](cuerpo)
+    return resultado, os.getpid(), CACHE_RESULTADOS.estadisticas()
+
+
+# ============================================================================
+# SECCIÓN 2: MÉTRICAS
+# ============================================================================
+
+class HistogramaLatencia:
+    """
+    Histograma acumulado de latencias (estilo Prometheus: count, sum y buckets 'le').
+    """
+
+    def __init__(self, buckets: List[float] = None):
+        self.buckets = buckets or BUCKETS_LATENCIA
+        self.conteos = [0] * (len(self.buckets) + 1)
+        self.total = 0
+        self.suma = 0.0
+
+    def observar(self, segundos: float) -> None:
+        self.total += 1
+        self.suma += segundos
+        for i, limite in enumerate(self.buckets):
+            if segundos <= limite:
+                self.conteos[i] += 1
+                return
+        self.conteos[-1] += 1
+
+    def a_dict(self) -> Dict:
+        acumulado, buckets = 0, {}
+        for limite, conteo in zip(self.buckets + ['+Inf'], self.conteos):
+            acumulado += conteo
+            buckets[str(limite)] = acumulado
+        return {'count': self.total, 'sum': round(self.suma, 6), 'buckets': buckets}
+
+
+class Metricas:
+    """
+    Contadores del servicio. Solo se modifica desde el event loop, así que no necesita locks.
+    """
+
+    def __init__(self):
+        self.inicio = time.time()
+        self.latencias: Dict[str, HistogramaLatencia] = {}
+        self.peticiones: Dict[str, int] = {}
+        self.errores: Dict[str, int] = {}
+        self.coalescidas = 0
+        self.rechazadas = 0
+        self.en_curso = 0
+        self.cache_por_worker: Dict[int, Dict] = {}
+
+    def registrar(self, ruta: str, estado: int, segundos: float) -> None:
+        self.peticiones[ruta] = self.peticiones.get(ruta, 0) + 1
+        if estado >= 400:
+            self.errores[ruta] = self.errores.get(ruta, 0) + 1
+        self.latencias.setdefault(ruta, HistogramaLatencia()).observar(segundos)
+
+    def a_dict(self) -> Dict:
+        return {
+            'uptime_s': round(time.time() - self.inicio, 3),
+            'peticiones': self.peticiones,
+            'errores': self.errores,
+            'coalescidas': self.coalescidas,
+            'rechazadas': self.rechazadas,
+            'en_curso': self.en_curso,
+            'latencia_s': {ruta: hist.a_dict() for ruta, hist in self.latencias.items()},
+            'cache_por_worker': {str(pid): stats for pid, stats in self.cache_por_worker.items()},
+        }
+
+
+# ============================================================================
+# SECCIÓN 3: SERVIDOR HTTP
+# ============================================================================
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado: int, mensaje: str):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+class ServicioRecomendaciones:
+    """
+    Servidor HTTP/JSON sobre asyncio.
+
+    - El scoring (CPU) se ejecuta en un pool acotado de workers; el event loop solo parsea y responde.
+    - Consultas idénticas en vuelo se coalescen: esperan el mismo futuro en vez de recalcular.
+    - Si hay más de max_pendientes trabajos en vuelo, se responde 503 en lugar de encolar sin límite.
+    """
+
+    RUTAS_SCORING = {
+        '/recomendar': ejecutar_recomendar,
+        '/similitud': ejecutar_similitud,
+    }
+
+    def __init__(self, executor: Executor, max_pendientes: int = 64):
+        self.executor = executor
+        self.max_pendientes = max_pendientes
+        self.metricas = Metricas()
+        self._en_vuelo: Dict[str, asyncio.Future] = {}
+
+    async def _ejecutar_coalescido(self, ruta: str, cuerpo: Dict) -> Dict:
+        clave = ruta + json.dumps(_normalizar_cuerpo(cuerpo), sort_keys=True)
+        futuro = self._en_vuelo.get(clave)
+        if futuro is not None:
+            self.metricas.coalescidas += 1
+            resultado, _, _ = await asyncio.shield(futuro)
+            return resultado
+
+        if len(self._en_vuelo) >= self.max_pendientes:
+            self.metricas.rechazadas += 1
+            raise ErrorHTTP(503, "Servicio saturado, reintenta más tarde")
+
+        loop = asyncio.get_running_loop()
+        futuro = loop.run_in_executor(self.executor, ejecutar_en_worker, ruta, cuerpo)
+        self._en_vuelo[clave] = futuro
+        try:
+            resultado, pid, estadisticas_cache = await asyncio.shield(futuro)
+        finally:
+            self._en_vuelo.pop(clave, None)
+        self.metricas.cache_por_worker[pid] = estadisticas_cache
+        return resultado
+
+    async def despachar(self, metodo: str, ruta: str, cuerpo_bytes: bytes) -> Tuple[int, Dict]:
+        if ruta == '/metrics':
+            if metodo != 'GET':
+                raise ErrorHTTP(405, "Usa GET")
+            return 200, self.metricas.a_dict()
+        if ruta == '/salud':
+            return 200, {'estado': 'ok'}
+        if ruta not in self.RUTAS_SCORING:
+            raise ErrorHTTP(404, f"Ruta desconocida: {ruta}")
+        if metodo != 'POST':
+            raise ErrorHTTP(405, "Usa POST con un cuerpo JSON")
+
+        try:
+            cuerpo = json.loads(cuerpo_bytes or b'{}')
+        except ValueError as e:
+            raise ErrorHTTP(400, f"JSON inválido: {e}")
+        if not isinstance(cuerpo, dict):
+            raise ErrorHTTP(400, "El cuerpo debe ser un objeto JSON")
+
+        try:
+            return 200, await self._ejecutar_coalescido(ruta, cuerpo)
+        except (ValueError, KeyError, TypeError) as e:
+            raise ErrorHTTP(400, str(e))
+
+    async def manejar_conexion(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    cabecera = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+
+                inicio = time.perf_counter()
+                lineas = cabecera.decode('latin-1').split('\r\n')
+                try:
+                    metodo, objetivo, version = lineas[0].split(' ', 2)
+                except ValueError:
+                    await _responder(writer, 400, {'error': 'Línea de petición inválida'}, False)
+                    return
+                cabeceras = {}
+                for linea in lineas[1:]:
+                    if ':' in linea:
+                        nombre, valor = linea.split(':', 1)
+                        cabeceras[nombre.strip().lower()] = valor.strip()
+
+                mantener = (version == 'HTTP/1.1' and cabeceras.get('connection', '').lower() != 'close')
+                ruta = objetivo.split('?', 1)[0]
+                self.metricas.en_curso += 1
+                try:
+                    longitud = int(cabeceras.get('content-length', 0))
+                    if longitud > MAX_CUERPO:
+                        raise ErrorHTTP(413, "Cuerpo demasiado grande")
+                    cuerpo_bytes = await reader.readexactly(longitud) if longitud else b''
+                    estado, respuesta = await self.despachar(metodo, ruta, cuerpo_bytes)
+                except ErrorHTTP as e:
+                    estado, respuesta = e.estado, {'error': str(e)}
+                except asyncio.IncompleteReadError:
+                    return
+                except Exception as e:
+                    estado, respuesta = 500, {'error': f"Error interno: {e}"}
+                finally:
+                    self.metricas.en_curso -= 1
+
+                self.metricas.registrar(ruta, estado, time.perf_counter() - inicio)
+                await _responder(writer, estado, respuesta, mantener)
+                if not mantener:
+                    return
+        finally:
+            writer.close()
+
+
+def _normalizar_cuerpo(cuerpo: Dict) -> Dict:
+    """
+    Forma canónica de la consulta para coalescer: listas de países ordenadas y sin duplicados.
+    """
+    normalizado = dict(cuerpo)
+    for clave in ('paises_ideales', 'paises_no_ideales', 'paises'):
+        if isinstance(normalizado.get(clave), list):
+            normalizado[clave] = sorted(set(map(str, normalizado[clave])))
+    return normalizado
+
+
+async def _responder(writer: asyncio.StreamWriter, estado: int, cuerpo: Dict, mantener: bool) -> None:
+    datos = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+    cabecera = (
+        f"HTTP/1.1 {estado} {MENSAJES_HTTP.get(estado, '')}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(datos)}\r\n"
+        f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n"
+    ).encode('latin-1')
+    writer.write(cabecera + datos)
+    try:
+        await writer.drain()
+    except ConnectionError:
+        pass
+
+
+def crear_executor(workers: int, hilos: bool, csv_path: str = CSV_PATH, compacto: bool = False) -> Executor:
+    """
+    Pool acotado para el scoring: procesos (por defecto) o hilos.
+    """
+    if hilos:
+        _inicializar_worker(csv_path, compacto)
+        return ThreadPoolExecutor(max_workers=workers)
+    return ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker, initargs=(csv_path, compacto))
+
+
+async def servir(host: str, port: int, executor: Executor, max_pendientes: int) -> None:
+    servicio = ServicioRecomendaciones(executor, max_pendientes)
+    servidor = await asyncio.start_server(servicio.manejar_conexion, host, port)
+    print(f"🚀 Servicio de recomendaciones escuchando en http://{host}:{port}")
+    async with servidor:
+        await servidor.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio JSON de recomendaciones turísticas (offline, CSV local)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Tamaño del pool de scoring")
+    parser.add_argument('--max-pendientes', type=int, default=64, help="Trabajos en vuelo antes de responder 503")
+    parser.add_argument('--hilos', action='store_true', help="Usar hilos en lugar de procesos para el scoring")
+    parser.add_argument('--csv', default=CSV_PATH, help="Ruta del CSV de datos")
+    parser.add_argument('--compacto', action='store_true',
+                        help="Tipos reducidos (category/int16/float32) para bajar la memoria por worker")
+    args = parser.parse_args()
+
+    executor = crear_executor(args.workers, args.hilos, args.csv, args.compacto)
+    try:
+        asyncio.run(servir(args.host, args.port, executor, args.max_pendientes))
+    except KeyboardInterrupt:
+        print("\n🛑 Servicio detenido")
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+# Los módulos del proyecto están en la raíz del repositorio (sin paquete instalable)
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def motor(tmp_path_factory):
+    """
+    Motor sobre el CSV del repositorio, con su caché de archivos en un directorio temporal.
+    """
+    from cache_resultados import CacheLRU
+    from datos_turismo import CSV_PATH, cargar_datos, huella_csv
+    from motor_recomendacion import MotorRecomendacion
+
+    cache_dir = str(tmp_path_factory.mktemp('cache_datos'))
+    df_panel, df_destinos = cargar_datos(CSV_PATH, cache_dir)
+    return MotorRecomendacion(df_destinos, df_panel, version_datos=huella_csv(CSV_PATH)['sha1'][:16],
+                              cache=CacheLRU(), cache_dir=cache_dir, csv_path=CSV_PATH)
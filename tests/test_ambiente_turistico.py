@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ambiente_turistico as amb
+
+HOTELES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos', 'hoteles_ambiente.csv')
+
+# Delta tiene hoteles pero no está en la tabla de destinos; Epsilon al revés
+DESTINOS = pd.DataFrame({'country': ['Alfa', 'Beta', 'Cero', 'Epsilon'],
+                         'tourism_arrivals': [10_000.0, 2_000.0, 500.0, 100.0]})
+
+
+@pytest.fixture
+def ambiente():
+    return amb.AmbienteTuristico.desde_tablas(amb.leer_hoteles(HOTELES), DESTINOS)
+
+
+def test_bloques_por_pais(ambiente):
+    assert ambiente.paises.tolist() == ['Alfa', 'Beta', 'Cero', 'Delta']
+    assert ambiente.offsets.tolist() == [0, 4, 5, 7, 8]
+    # Dentro de cada país, de más a menos hoteles (empates por nombre); la fila sin ciudad se descarta
+    assert ambiente.ciudades.tolist() == ['A1', 'A2', 'A3', 'A4', 'B1', 'C1', 'C2', 'D1']
+    assert ambiente.conteos.tolist() == [5, 3, 1, 1, 4, 0, 0, 2]
+    assert ambiente.rango('Cero') == (5, 7) and ambiente.rango('Epsilon') == (0, 0)
+    assert ambiente.top_ciudades('Alfa') == [('A1', 5), ('A2', 3), ('A3', 1)]
+    assert ambiente.top_ciudades('Alfa', 2) == [('A1', 5), ('A2', 3)]
+    assert ambiente.top_ciudades('Epsilon') == []
+
+
+def test_agregados(ambiente):
+    assert ambiente.total_hoteles.tolist() == [10, 4, 0, 2]
+    # Herfindahl de las participaciones: Alfa = .5² + .3² + .1² + .1²
+    np.testing.assert_allclose(ambiente.concentracion, [0.36, 1.0, np.nan, 1.0])
+    np.testing.assert_allclose(ambiente.participacion_top, [0.9, 1.0, np.nan, 1.0])
+    # Por cada mil llegadas; Delta no tiene llegadas
+    np.testing.assert_allclose(ambiente.hoteles_por_mil, [1.0, 2.0, 0.0, np.nan])
+    np.testing.assert_allclose(ambiente.percentil, [1.0, 0.75, 0.25, 0.5])
+
+
+def test_termometro(ambiente):
+    alfa = ambiente.termometro('Alfa')
+    assert (alfa['nivel'], alfa['icono'], alfa['valor']) == ('Muy turístico', '🔴', 1.0)
+    assert alfa['total_hoteles'] == 10 and alfa['ciudades'] == 4
+    assert alfa['top_ciudades'] == [('A1', 5), ('A2', 3), ('A3', 1)]
+    assert alfa['hoteles_por_mil_llegadas'] == pytest.approx(1.0)
+
+    cero = ambiente.termometro('Cero')
+    assert (cero['nivel'], cero['total_hoteles']) == ('Tranquilo', 0)
+    assert np.isnan(cero['concentracion'])
+    assert np.isnan(ambiente.termometro('Delta')['hoteles_por_mil_llegadas'])
+    assert ambiente.termometro('Epsilon') is None
+    assert len(ambiente.resumen()) == len(ambiente) == 4
+
+
+def test_guardar_y_abrir(ambiente, tmp_path):
+    path = str(tmp_path / 'ambiente.npz')
+    ambiente.guardar(path)
+    leido = amb.AmbienteTuristico.abrir(path)
+    for nombre in amb._ARRAYS_AMBIENTE:
+        np.testing.assert_array_equal(getattr(leido, nombre), getattr(ambiente, nombre))
+    assert leido.termometro('Alfa') == ambiente.termometro('Alfa')
+    assert amb.AmbienteTuristico.abrir(str(tmp_path / 'no_existe.npz')) is None
+
+
+def test_cargar_ambiente_usa_el_almacen_en_disco(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    construido = amb.cargar_ambiente(DESTINOS, HOTELES, cache_dir, 'v1')
+    assert os.listdir(cache_dir) == [os.path.basename(amb.ruta_ambiente(cache_dir, 'v1', amb.huella_csv(HOTELES)['sha1'][:16]))]
+
+    # La segunda carga lee el .npz sin reconstruir; otra versión de los datos sí reconstruye
+    construcciones = []
+    desde_tablas = amb.AmbienteTuristico.desde_tablas
+
+    def contar(*args):
+        construcciones.append(args)
+        return desde_tablas(*args)
+
+    monkeypatch.setattr(amb.AmbienteTuristico, 'desde_tablas', contar)
+    leido = amb.cargar_ambiente(DESTINOS, HOTELES, cache_dir, 'v1')
+    assert construcciones == [] and leido.termometro('Beta') == construido.termometro('Beta')
+    amb.cargar_ambiente(DESTINOS, HOTELES, cache_dir, 'v2')
+    assert len(construcciones) == 1
+
+    monkeypatch.undo()
+    assert len(amb.cargar_ambiente(DESTINOS, str(tmp_path / 'sin_hoteles.csv'), cache_dir, 'v1')) == 0
@@ -0,0 +1,14 @@
+import pandas as pd
+
+from datos_turismo import calcular_destinos
+from historico_turismo import IndiceAsOf
+
+
+def test_destinos_as_of_igual_a_recalcular_con_el_panel_hasta_ese_anio(motor):
+    panel = motor.df_panel
+    indice = IndiceAsOf.construir(panel)
+    assert len(indice.anios) > 1
+    for anio in indice.anios.tolist():
+        esperado = calcular_destinos(panel[panel['year'] <= anio])
+        pd.testing.assert_frame_equal(indice.destinos(anio).reset_index(drop=True),
+                                      esperado.reset_index(drop=True), obj=f"destinos({anio})")
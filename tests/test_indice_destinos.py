@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indice_destinos import IndiceDestinos, IndicePresupuesto
+
+
+@pytest.fixture(scope='module')
+def df_ciudades():
+    # Catálogo desordenado con varias filas por región (como destinos a nivel ciudad)
+    rng = np.random.default_rng(0)
+    n = 3000
+    return pd.DataFrame({
+        'country': rng.choice([f'Region {i}' for i in range(40)], size=n),
+        'costo_por_turista': rng.lognormal(6, 1, size=n),
+        'tourism_arrivals': rng.lognormal(14, 2, size=n),
+        'tourism_receipts': rng.lognormal(20, 2, size=n),
+    })
+
+
+@pytest.mark.parametrize('region', ['Todas', 'Region 3', 'Region 39', 'Atlantis'])
+@pytest.mark.parametrize('presupuesto', [50, 400, 2000, np.inf])
+def test_seleccionar_region_y_presupuesto(df_ciudades, region, presupuesto):
+    indice = IndicePresupuesto(df_ciudades)
+    seleccion = np.arange(len(df_ciudades))[indice.seleccionar(presupuesto, region)]
+    mascara = df_ciudades['costo_por_turista'].to_numpy() <= presupuesto
+    if region != 'Todas':
+        mascara &= (df_ciudades['country'] == region).to_numpy()
+    assert sorted(seleccion.tolist()) == np.flatnonzero(mascara).tolist()
+    # En orden de costo, como el prefijo sin región
+    assert np.all(np.diff(df_ciudades['costo_por_turista'].to_numpy()[seleccion]) >= 0)
+
+
+@pytest.mark.parametrize('region', ['Todas', 'Region 7'])
+@pytest.mark.parametrize('presupuesto', [None, 300, 5000])
+def test_vecinos_con_filtros(df_ciudades, region, presupuesto):
+    indice = IndiceDestinos(df_ciudades)
+    vector = indice.puntos[123] + 0.05
+    posiciones, distancias = indice.consultar(vector, k=10, presupuesto=presupuesto, region=region)
+
+    validos = np.ones(len(df_ciudades), dtype=bool)
+    if presupuesto is not None:
+        validos &= df_ciudades['costo_por_turista'].to_numpy() <= presupuesto
+    if region != 'Todas':
+        validos &= (df_ciudades['country'] == region).to_numpy()
+    candidatos = np.flatnonzero(validos)
+    esperadas = np.sort(np.linalg.norm(indice.puntos[candidatos] - vector, axis=1))[:10]
+    np.testing.assert_allclose(distancias, esperadas)
+    assert validos[posiciones].all()
@@ -0,0 +1,129 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import servicio_recomendaciones as servicio
+from motor_recomendacion import MotorRecomendacion
+from perfil_usuario import calcular_similitud_para_todos, extraer_perfil_usuario
+
+
+@pytest.mark.parametrize('presupuesto', ['abc', None, float('nan'), [1500]])
+def test_presupuesto_no_numerico(motor, presupuesto):
+    with pytest.raises(ValueError, match='presupuesto'):
+        motor.recomendar({'presupuesto': presupuesto})
+
+
+def test_presupuesto_filtra(motor):
+    n = motor.indice_presupuesto.n_hasta(1500)
+    assert 0 < n < len(motor.df_destinos)
+    for presupuesto in (1500, '1500', 1500.0):
+        df = motor.recomendar({'presupuesto': presupuesto, 'k': len(motor.df_destinos)})['recomendaciones']
+        assert len(df) <= n and (df['costo_por_turista'] <= 1500).all()
+
+
+def test_servicio_responde_400(motor, monkeypatch):
+    monkeypatch.setattr(servicio, '_MOTOR', motor)
+    with ThreadPoolExecutor(1) as executor:
+        app = servicio.ServicioRecomendaciones(executor)
+        with pytest.raises(servicio.ErrorHTTP) as error:
+            asyncio.run(app.despachar('POST', '/recomendar', b'{"presupuesto": "abc"}'))
+    assert error.value.estado == 400
+
+
+def test_similitud_usa_cache(motor, monkeypatch):
+    monkeypatch.setattr(servicio, '_MOTOR', motor)
+    cuerpo = {'paises_ideales': ['Italy', 'Spain'], 'paises_no_ideales': ['Chad']}
+    perfil = motor.generar_perfil(cuerpo['paises_ideales'], cuerpo['paises_no_ideales'])
+    esperado = calcular_similitud_para_todos(motor.df_destinos, perfil).round(6)
+
+    completa = servicio.ejecutar_similitud(cuerpo)['similitud']
+    assert completa == pytest.approx(dict(zip(motor.df_destinos['country'], esperado)), abs=1e-6)
+
+    aciertos = motor.cache.aciertos
+    parcial = servicio.ejecutar_similitud({**cuerpo, 'paises': ['France', 'Chile']})['similitud']
+    assert motor.cache.aciertos > aciertos
+    assert parcial == {pais: completa[pais] for pais in ('France', 'Chile')}
+
+
+def _csv_sin_ultimo_anio(tmp_path):
+    """
+    Copia del CSV del repositorio sin su último año; devuelve (ruta, líneas de ese año).
+    """
+    from datos_turismo import CSV_PATH
+
+    with open(CSV_PATH, encoding='utf-8') as f:
+        encabezado, *filas = f.read().splitlines(keepends=True)
+    anio = encabezado.split(',').index('year')
+    ultimo = max(fila.split(',')[anio] for fila in filas)
+    path = tmp_path / 'datos.csv'
+    path.write_text(encabezado + ''.join(fila for fila in filas if fila.split(',')[anio] != ultimo), encoding='utf-8')
+    return path, [fila for fila in filas if fila.split(',')[anio] == ultimo]
+
+
+def test_actualizar_agregando_filas_igual_a_recarga(tmp_path):
+    from datos_turismo import cargar_datos
+
+    path, nuevas = _csv_sin_ultimo_anio(tmp_path)
+    motor = MotorRecomendacion.desde_csv(str(path), cache_dir=str(tmp_path / 'cache'))
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(''.join(nuevas))
+    resumen = motor.actualizar_datos()
+    assert resumen['cambios'] and not resumen['recarga_completa'] and resumen['filas_nuevas'] == len(nuevas)
+
+    recargado = MotorRecomendacion.desde_csv(str(path), cache_dir=str(tmp_path / 'cache_recarga'))
+    _, df_destinos = cargar_datos(str(path), str(tmp_path / 'sin_snapshot'), usar_snapshot=False)
+    pd.testing.assert_frame_equal(motor.df_destinos.reset_index(drop=True), df_destinos.reset_index(drop=True))
+    assert motor.version_datos == recargado.version_datos
+    for consulta in ({}, {'presupuesto': 800, 'interes_turistico': 'Emergentes (crecimiento)'},
+                     {'ventana_crecimiento': 3, 'k': 20}):
+        pd.testing.assert_frame_equal(motor.recomendar(consulta)['recomendaciones'].reset_index(drop=True),
+                                      recargado.recomendar(consulta)['recomendaciones'].reset_index(drop=True))
+
+
+def test_recomendar_usa_una_sola_version(tmp_path, monkeypatch):
+    path, nuevas = _csv_sin_ultimo_anio(tmp_path)
+    motor = MotorRecomendacion.desde_csv(str(path), cache_dir=str(tmp_path / 'cache'))
+    consulta = {'presupuesto': 1500, 'k': 30}
+    esperado = motor.recomendar(consulta)['recomendaciones']
+    version = motor.version_datos
+
+    # Otra sesión publica una versión nueva entre la lectura del índice y la de los scores
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(''.join(nuevas))
+    tabla_scores_ventana = motor.tabla_scores_ventana
+
+    def con_refresco(*args, **kwargs):
+        motor.actualizar_datos()
+        return tabla_scores_ventana(*args, **kwargs)
+
+    monkeypatch.setattr(motor, 'tabla_scores_ventana', con_refresco)
+    obtenido = motor.recomendar(consulta)['recomendaciones']
+    assert motor.version_datos != version
+    pd.testing.assert_frame_equal(obtenido, esperado)
+
+
+def test_perfil_as_of_usa_los_datos_de_ese_anio(motor):
+    ideales, no_ideales = ['Italy', 'Spain', 'Japan'], ['Chad']
+    anio = motor.anios_disponibles()[len(motor.anios_disponibles()) // 2]
+    df_anio = motor.indice_as_of.destinos(anio)
+
+    perfil = motor.generar_perfil(ideales, no_ideales, as_of_year=anio)
+    esperado = extraer_perfil_usuario(df_anio, ideales, no_ideales)
+    assert perfil['presupuesto_ideal_media'] == pytest.approx(esperado['presupuesto_ideal_media'])
+    assert perfil['vector_caracteristicas'] == pytest.approx(esperado['vector_caracteristicas'])
+
+    actual = motor.generar_perfil(ideales, no_ideales)
+    assert perfil['huella'] != actual['huella']
+    assert perfil['presupuesto_ideal_media'] != pytest.approx(actual['presupuesto_ideal_media'])
+
+    acumulado = motor.generar_perfil(ideales + ['France'], no_ideales, acumulador=motor.nuevo_acumulador(anio),
+                                     as_of_year=anio)
+    assert acumulado['vector_caracteristicas'] == pytest.approx(
+        extraer_perfil_usuario(df_anio, ideales + ['France'], no_ideales)['vector_caracteristicas'])
+
+    # Backtest: la similitud del top-k se calcula con perfil y destinos del mismo año
+    df = motor.recomendar({'perfil': perfil, 'as_of_year': anio, 'presupuesto': 10 ** 9, 'k': 10})['recomendaciones']
+    similitud = pd.Series(calcular_similitud_para_todos(df_anio, perfil).to_numpy(), index=df_anio['country'])
+    assert df['similitud_score'].to_numpy() == pytest.approx(similitud[df['country']].to_numpy())
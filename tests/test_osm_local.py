@@ -0,0 +1,116 @@
+import tracemalloc
+
+import numpy as np
+
+import osm_local
+from osm_local import IndiceCiudades, puntos_en_poligono
+
+
+def _circulo(cx: float, cy: float, radio: float, vertices: int) -> np.ndarray:
+    angulos = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    anillo = np.column_stack([cx + radio * np.cos(angulos), cy + radio * np.sin(angulos)])
+    return np.vstack([anillo, anillo[:1]])
+
+
+def _puntos_lejos_del_borde(n: int, radios, semilla: int = 0) -> np.ndarray:
+    # Puntos a más de 1% del radio de cada borde: el polígono y el círculo coinciden ahí
+    puntos = np.random.default_rng(semilla).uniform(-1.2, 1.2, size=(4 * n, 2))
+    distancia = np.hypot(puntos[:, 0], puntos[:, 1])
+    lejos = np.all([np.abs(distancia - r) > 0.01 for r in radios], axis=0)
+    return puntos[lejos][:n]
+
+
+def test_limite_con_muchos_vertices_memoria_acotada():
+    # ~100k aristas: con bloques fijos de 1024 puntos cada temporal ocuparía ~800 MB
+    anillos = [_circulo(0, 0, 1.0, 100_000), _circulo(0, 0, 0.3, 20_000)]
+    puntos = _puntos_lejos_del_borde(1000, (1.0, 0.3))
+
+    tracemalloc.start()
+    dentro = puntos_en_poligono(puntos, anillos)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    distancia = np.hypot(puntos[:, 0], puntos[:, 1])
+    np.testing.assert_array_equal(dentro, (distancia < 1.0) & (distancia > 0.3))
+    assert pico < 64e6
+
+
+def test_tramos_de_aristas_igual_que_un_solo_bloque(monkeypatch):
+    anillos = [_circulo(0, 0, 1.0, 5000)]
+    puntos = _puntos_lejos_del_borde(2000, (1.0,), semilla=1)
+    esperado = puntos_en_poligono(puntos, anillos)
+    # Menos celdas que aristas: un punto por bloque y las aristas en varios tramos
+    monkeypatch.setattr(osm_local, 'CELDAS_BLOQUE', 1000)
+    np.testing.assert_array_equal(puntos_en_poligono(puntos, anillos), esperado)
+    assert esperado.any() and not esperado.all()
+
+
+def test_indice_con_limite_detallado():
+    ciudades = [('Grande', [_circulo(0, 0, 1.0, 100_000)]), ('Chica', [_circulo(3, 3, 0.5, 64)])]
+    puntos = np.array([[0.0, 0.0], [0.5, -0.5], [3.1, 3.0], [2.0, 0.0]])
+    assert IndiceCiudades(ciudades).contar(puntos) == {'Grande': 2, 'Chica': 1}
+
+
+def _escribir_extracto(path, ciudades: int = 12) -> dict:
+    """
+    Extracto .osm con ciudades cuadradas en fila (relaciones de dos vías o una vía cerrada)
+    y hoteles como nodo y como vía. Devuelve los conteos esperados por ciudad.
+    """
+    nodos, vias, relaciones, esperado = [], [], [], {}
+    siguiente = iter(range(1, 10 ** 6))
+
+    def nodo(lon, lat, tags=None):
+        i = next(siguiente)
+        nodos.append((i, lon, lat, tags or {}))
+        return i
+
+    limite = {'boundary': 'administrative', 'admin_level': '8'}
+    for c in range(ciudades):
+        x = 2 * c
+        esquinas = [nodo(x, 0), nodo(x + 1, 0), nodo(x + 1, 1), nodo(x, 1)]
+        nombre = f'Ciudad {c}'
+        if c % 2:
+            vias.append((next(siguiente), esquinas + esquinas[:1], {**limite, 'name': nombre}))
+        else:
+            a, b = next(siguiente), next(siguiente)
+            vias += [(a, esquinas[:3], {}), (b, esquinas[2:] + esquinas[:1], {})]
+            relaciones.append((next(siguiente), [a, b], {**limite, 'name': nombre}))
+        for h in range(c % 4):
+            nodo(x + 0.2 + 0.1 * h, 0.5, {'tourism': 'hotel'})
+        hotel = [nodo(x + 0.7, 0.7), nodo(x + 0.8, 0.7), nodo(x + 0.8, 0.8)]
+        vias.append((next(siguiente), hotel + hotel[:1], {'tourism': 'hotel'}))
+        esperado[nombre] = c % 4 + 1
+    nodo(-5, -5, {'tourism': 'hotel'})  # fuera de toda ciudad
+
+    def etiquetas(tags):
+        return ''.join(f'<tag k="{k}" v="{v}"/>' for k, v in tags.items())
+
+    with open(path, 'w') as f:
+        f.write('<?xml version="1.0"?>\n<osm version="0.6">\n')
+        for i, lon, lat, tags in nodos:
+            f.write(f'<node id="{i}" lat="{lat}" lon="{lon}">{etiquetas(tags)}</node>\n')
+        for i, refs, tags in vias:
+            f.write(f'<way id="{i}">' + ''.join(f'<nd ref="{r}"/>' for r in refs) + f'{etiquetas(tags)}</way>\n')
+        for i, miembros, tags in relaciones:
+            f.write(f'<relation id="{i}">' + ''.join(f'<member type="way" ref="{r}" role="outer"/>' for r in miembros)
+                    + f'{etiquetas(tags)}</relation>\n')
+        f.write('</osm>\n')
+    return esperado
+
+
+def test_extracto_por_lotes_de_vias(tmp_path):
+    path = str(tmp_path / 'TST.osm')
+    esperado = _escribir_extracto(path)
+
+    puntos, limites = osm_local.extraer_hoteles_y_limites(path)
+    assert len(puntos) == sum(esperado.values()) + 1
+    lotes = list(osm_local.lotes_de_ciudades(path, limites, max_vias=3))
+    assert len(lotes) > 1
+    # Ningún lote supera el máximo de vías salvo un límite que solo ya lo supere
+    ids_por_ciudad = dict(limites)
+    for lote in lotes:
+        assert len(lote) == 1 or sum(len(ids_por_ciudad[nombre]) for nombre, _ in lote) <= 3
+
+    for max_vias in (1, 3, osm_local.MAX_VIAS_LOTE):
+        filas = osm_local.contar_hoteles_extracto(path, 'Testlandia', max_vias_lote=max_vias)
+        assert {fila['city']: fila['hotel_count'] for fila in filas} == esperado
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from perfil_usuario import (calcular_similitud_lote, calcular_similitud_para_todos, calcular_similitud_por_fila,
+                            iterar_similitud_lote, similitud_hibrida)
+
+COLUMNAS = ['tourism_arrivals', 'costo_por_turista', 'tourism_receipts']
+REGIONES = ['Europa', 'Asia', 'África', 'América', 'Oceanía']
+
+
+@pytest.fixture(scope='module')
+def destinos(motor):
+    """
+    Destinos reales con una columna 'region' (con nulos) y métricas faltantes o en cero
+    en algunas filas, para recorrer las ramas NaN / norma cero de la similitud.
+    """
+    aleatorio = np.random.default_rng(0)
+    df = motor.df_destinos.iloc[:120].copy()
+    df['region'] = aleatorio.choice(REGIONES + [None], size=len(df))
+    df.loc[df.index[::11], 'tourism_receipts'] = np.nan
+    df.loc[df.index[5::17], 'costo_por_turista'] = np.nan
+    df.loc[df.index[3::13], COLUMNAS] = 0.0
+    return df
+
+
+def perfiles_aleatorios(n: int, semilla: int = 1):
+    aleatorio = np.random.default_rng(semilla)
+    perfiles = []
+    for i in range(n):
+        vector = {
+            'densidad': float(aleatorio.lognormal(15, 2)),
+            'presupuesto': float(aleatorio.uniform(0, 5000)),
+            'ingresos': float(aleatorio.lognormal(21, 2)),
+        }
+        if i % 5 == 1:
+            vector[aleatorio.choice(list(vector))] = np.nan
+        elif i % 5 == 2:
+            vector = dict.fromkeys(vector, 0.0)
+        # Regiones: ninguna, solo ideales, solo a evitar, ambas (con solapamiento y desconocidas)
+        ideales = list(aleatorio.choice(REGIONES + ['Antártida'], size=aleatorio.integers(0, 3), replace=False))
+        evitar = list(aleatorio.choice(REGIONES, size=aleatorio.integers(0, 3), replace=False))
+        perfiles.append({'vector_caracteristicas': vector, 'regiones_ideales': [str(r) for r in ideales],
+                         'regiones_evitar': [str(r) for r in evitar]})
+    return perfiles
+
+
+def referencia_por_fila(df: pd.DataFrame, perfil, pesos=None) -> np.ndarray:
+    """
+    calcular_similitud_por_fila, salvo que las versiones recientes de scipy rechazan NaN
+    en cosine/euclidean: esa fila daría NaN y el clamp de similitud_hibrida la deja en 0.
+    """
+    if np.isfinite(_vector(perfil)).all() and np.isfinite(df[COLUMNAS]).all(axis=None):
+        return calcular_similitud_por_fila(df, perfil, pesos).to_numpy(dtype=float)
+    similitudes = []
+    for _, fila in df.iterrows():
+        try:
+            similitudes.append(similitud_hibrida(perfil, fila, pesos))
+        except ValueError:
+            similitudes.append(0.0)
+    return np.array(similitudes)
+
+
+def _vector(perfil) -> np.ndarray:
+    return np.array(list(perfil['vector_caracteristicas'].values()), dtype=float)
+
+
+@pytest.mark.parametrize('pesos', [None, {'coseno': 0.2, 'euclidiana': 0.2, 'jaccard': 0.6}])
+def test_vectorizada_igual_a_la_referencia_por_fila(destinos, pesos):
+    perfiles = perfiles_aleatorios(60)
+    criterios = {(bool(p['regiones_ideales']), bool(p['regiones_evitar'])) for p in perfiles}
+    assert criterios == {(False, False), (True, False), (False, True), (True, True)}
+    for perfil in perfiles:
+        obtenido = calcular_similitud_para_todos(destinos, perfil, pesos)
+        pd.testing.assert_index_equal(obtenido.index, destinos.index)
+        np.testing.assert_allclose(obtenido.to_numpy(), referencia_por_fila(destinos, perfil, pesos), rtol=0, atol=1e-12)
+
+
+def test_referencia_por_fila_sin_nulos(destinos):
+    # Sin NaN la referencia es calcular_similitud_por_fila tal cual
+    limpios = destinos.dropna(subset=COLUMNAS)
+    for perfil in perfiles_aleatorios(10, semilla=2)[::5]:
+        np.testing.assert_allclose(calcular_similitud_para_todos(limpios, perfil).to_numpy(),
+                                   calcular_similitud_por_fila(limpios, perfil).to_numpy(dtype=float), rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize('tamano_bloque', [1, 7, 16, 64])
+def test_lote_igual_a_filas_apiladas(destinos, tamano_bloque):
+    perfiles = perfiles_aleatorios(16, semilla=3)
+    esperado = np.vstack([calcular_similitud_para_todos(destinos, perfil).to_numpy() for perfil in perfiles])
+
+    matriz = calcular_similitud_lote(destinos, perfiles, tamano_bloque=tamano_bloque, dtype=np.float64)
+    assert matriz.shape == (len(perfiles), len(destinos))
+    np.testing.assert_allclose(matriz, esperado, rtol=0, atol=1e-12)
+
+    compacta = calcular_similitud_lote(destinos, perfiles, tamano_bloque=tamano_bloque)
+    assert compacta.dtype == np.float32
+    np.testing.assert_allclose(compacta, esperado, rtol=0, atol=1e-6)
+
+    bloques = list(iterar_similitud_lote(destinos, perfiles, tamano_bloque=tamano_bloque))
+    assert [inicio for inicio, _ in bloques] == list(range(0, len(perfiles), tamano_bloque))
+    assert all(len(bloque) <= tamano_bloque for _, bloque in bloques)
+
+
+def test_lote_sin_perfiles(destinos):
+    assert calcular_similitud_lote(destinos, []).shape == (0, len(destinos))
+    assert list(iterar_similitud_lote(destinos, [])) == []
@@ -0,0 +1,279 @@
+import json
+import os
+import re
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pandas as pd
+import pytest
+
+import precompute_osm_data as pre
+
+DATOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos')
+
+
+def _leer(nombre: str) -> bytes:
+    with open(os.path.join(DATOS, nombre), 'rb') as f:
+        return f.read()
+
+
+def _fragmentos(cuerpo: bytes, tamano: int = 7):
+    return [cuerpo[i:i + tamano] for i in range(0, len(cuerpo), tamano)]
+
+
+class RespuestaFalsa:
+    def __init__(self, cuerpo: bytes):
+        self.cuerpo = cuerpo
+        self.status_code = 200
+        self.ok = True
+        self.headers = {}
+
+    def iter_content(self, tamano):
+        return iter(_fragmentos(self.cuerpo, tamano))
+
+    def json(self):
+        return json.loads(self.cuerpo)
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SesionFalsa:
+    def __init__(self, cuerpo: bytes):
+        self.cuerpo = cuerpo
+        self.consultas = []
+
+    def post(self, url, data=None, timeout=None, stream=False):
+        self.consultas.append(data['data'])
+        return RespuestaFalsa(self.cuerpo)
+
+    def close(self):
+        pass
+
+
+def test_remark_despues_del_arreglo():
+    resto = {}
+    elementos = list(pre.iterar_elementos_json(_fragmentos(_leer('overpass_remark_timeout.json')), resto=resto))
+    assert [e['id'] for e in elementos] == [248531170, 23948271]
+    assert resto['remark'].startswith('runtime error: Query timed out')
+
+
+def test_respuesta_sin_elements():
+    with pytest.raises(ValueError):
+        list(pre.iterar_elementos_json([b'{"remark": "runtime error: out of memory"}']))
+
+
+def test_remark_de_error_lanza():
+    sesion = SesionFalsa(_leer('overpass_remark_timeout.json'))
+    with pytest.raises(pre.ErrorOverpass):
+        pre.consultar_overpass('q', sesion)
+    with pytest.raises(pre.ErrorOverpass):
+        list(pre.consultar_overpass_elementos('q', sesion))
+
+
+@pytest.mark.parametrize('archivo, estado', [('overpass_remark_timeout.json', 'error'), ('overpass_ok.json', 'ok')])
+def test_manifiesto_registra_el_remark(tmp_path, monkeypatch, archivo, estado):
+    monkeypatch.setattr(pre, 'crear_sesion', lambda *args: SesionFalsa(_leer(archivo)))
+    manifiesto = pre.precalcular_shards([('Testlandia', 'TST')], str(tmp_path), progreso=False)
+
+    assert manifiesto['TST']['estado'] == estado
+    assert os.path.exists(pre.ruta_shard(str(tmp_path), 'TST')) == (estado == 'ok')
+    # Un país fallido vuelve a consultarse con --resume
+    pendientes = pre.paises_pendientes([('Testlandia', 'TST')], pre.leer_manifiesto(str(tmp_path)), str(tmp_path))
+    assert (pendientes == [('Testlandia', 'TST')]) == (estado == 'error')
+    if estado == 'error':
+        assert 'timed out' in manifiesto['TST']['ultimo_error']
+    else:
+        assert manifiesto['TST']['filas'] == 1
+
+
+def test_refresco_fallido_conserva_el_shard_anterior(tmp_path, monkeypatch):
+    directorio, paises = str(tmp_path), [('Testlandia', 'TST')]
+    monkeypatch.setattr(pre, 'crear_sesion', lambda *args: SesionFalsa(_leer('overpass_ok.json')))
+    pre.precalcular_shards(paises, directorio, progreso=False)
+    salida = str(tmp_path / 'ciudades.csv')
+    esperado = pre.fusionar_shards(paises, pre.leer_manifiesto(directorio), directorio, salida)
+    assert len(esperado) == 1
+
+    # Con datos vencidos, --resume vuelve a consultar y Overpass falla
+    monkeypatch.setattr(pre, 'crear_sesion', lambda *args: SesionFalsa(_leer('overpass_remark_timeout.json')))
+    manifiesto = pre.precalcular_shards(paises, directorio, resume=True, max_edad=timedelta(0), progreso=False)
+    entrada = manifiesto['TST']
+    assert entrada['estado'] == 'ok' and entrada['filas'] == 1
+    assert 'timed out' in entrada['ultimo_error'] and entrada['timestamp_error'] >= entrada['timestamp']
+    assert os.path.exists(pre.ruta_shard(directorio, 'TST'))
+    assert pre.paises_pendientes(paises, pre.leer_manifiesto(directorio), directorio) == paises
+    pd.testing.assert_frame_equal(pre.fusionar_shards(paises, pre.leer_manifiesto(directorio), directorio, salida),
+                                  esperado)
+
+    # El siguiente refresco exitoso limpia el error
+    monkeypatch.setattr(pre, 'crear_sesion', lambda *args: SesionFalsa(_leer('overpass_ok.json')))
+    manifiesto = pre.precalcular_shards(paises, directorio, resume=True, progreso=False)
+    assert 'ultimo_error' not in manifiesto['TST']
+    assert pre.paises_pendientes(paises, pre.leer_manifiesto(directorio), directorio) == []
+
+
+def test_consulta_usa_la_etiqueta_del_codigo():
+    assert '"ISO3166-1:alpha3"="DEU"' in pre.construir_consulta('DEU')
+    assert '"ISO3166-1"="DE"' in pre.construir_consulta('DE')
+
+
+def test_respuesta_sin_hoteles_no_es_ok(tmp_path, monkeypatch):
+    # Lo que devuelve Overpass cuando el área no coincide: 200 con 'elements' vacío
+    vacia = b'{"version": 0.6, "osm3s": {}, "elements": []}'
+    monkeypatch.setattr(pre, 'crear_sesion', lambda *args: SesionFalsa(vacia))
+    manifiesto = pre.precalcular_shards([('Testlandia', 'TST')], str(tmp_path), progreso=False)
+    assert manifiesto['TST']['estado'] == 'error'
+    assert not os.path.exists(pre.ruta_shard(str(tmp_path), 'TST'))
+
+
+def test_timeout_de_la_consulta():
+    assert f"[timeout:{pre.TIMEOUT_CONSULTA}]" in pre.construir_consulta("FRA")
+    assert pre.TIMEOUT_CONSULTA >= 300 and pre.TIMEOUT_LECTURA > pre.TIMEOUT_CONSULTA
+
+
+# ============================================================================
+# Límite de tasa y concurrencia contra un servidor Overpass de prueba
+# ============================================================================
+
+class RelojFalso:
+    def __init__(self):
+        self.ahora = 0.0
+        self.esperas = []
+
+    def __call__(self):
+        return self.ahora
+
+    def dormir(self, segundos):
+        self.esperas.append(segundos)
+        self.ahora += segundos
+
+
+def test_limitador_token_bucket():
+    reloj = RelojFalso()
+    limitador = pre.LimitadorTasa(tasa=2.0, rafaga=3, reloj=reloj, dormir=reloj.dormir)
+    # La ráfaga sale sin esperar; después, una ficha cada 1/tasa segundos
+    assert [limitador.adquirir() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert [limitador.adquirir() for _ in range(4)] == pytest.approx([0.5] * 4)
+    assert reloj.ahora == pytest.approx(2.0)
+    # Tras una pausa larga las fichas se acumulan solo hasta la ráfaga
+    reloj.ahora += 60
+    assert [limitador.adquirir() for _ in range(4)] == pytest.approx([0.0, 0.0, 0.0, 0.5])
+    with pytest.raises(ValueError):
+        pre.LimitadorTasa(tasa=0)
+
+
+def _respuesta_pais(codigo: str) -> bytes:
+    # Un hotel dentro de una ciudad (vía cerrada) con el código en el nombre
+    cuadrado = [{'lat': y, 'lon': x} for x, y in ((0, 0), (1, 0), (1, 1), (0, 1), (0, 0))]
+    return json.dumps({'version': 0.6, 'elements': [
+        {'type': 'node', 'id': 1, 'lat': 0.5, 'lon': 0.5, 'tags': {'tourism': 'hotel'}},
+        {'type': 'way', 'id': 2, 'geometry': cuadrado,
+         'tags': {'boundary': 'administrative', 'admin_level': '8', 'name': f'Ciudad {codigo}'}},
+    ]}).encode()
+
+
+@pytest.fixture
+def servidor_overpass():
+    """
+    Overpass de prueba en un hilo: registra llegada y concurrencia de cada consulta,
+    responde 429 (con Retry-After) a la primera consulta de los códigos en 'limitar' y
+    tarda más en responder a los primeros países, para que terminen fuera de orden.
+    """
+    estado = {'llegadas': [], 'en_vuelo': 0, 'max_en_vuelo': 0, 'limitar': set(), 'demoras': {},
+              'lock': threading.Lock()}
+
+    class Manejador(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            cuerpo = self.rfile.read(int(self.headers['Content-Length'])).decode()
+            codigo = re.search(r'"ISO3166-1(?::alpha3)?"="(\w+)"', parse_qs(cuerpo)['data'][0]).group(1)
+            with estado['lock']:
+                estado['llegadas'].append((time.monotonic(), codigo))
+                estado['en_vuelo'] += 1
+                estado['max_en_vuelo'] = max(estado['max_en_vuelo'], estado['en_vuelo'])
+                limitar = codigo in estado['limitar']
+                estado['limitar'].discard(codigo)
+            try:
+                if limitar:
+                    self.send_response(429)
+                    self.send_header('Retry-After', '0.3')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                time.sleep(estado['demoras'].get(codigo, 0.0))
+                datos = _respuesta_pais(codigo)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+            finally:
+                with estado['lock']:
+                    estado['en_vuelo'] -= 1
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    estado['url'] = f"http://127.0.0.1:{servidor.server_port}/api/interpreter"
+    yield estado
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_fetch_contra_servidor_de_prueba(servidor_overpass, monkeypatch):
+    # Sin jitter: la espera tras el 429 es exactamente el Retry-After
+    monkeypatch.setattr(pre.random, 'uniform', lambda a, b: 0.0)
+    paises = [(f'País {i}', f'P{i:02d}') for i in range(12)]
+    servidor_overpass['limitar'].add('P03')
+    servidor_overpass['demoras'].update({codigo: 0.3 - 0.025 * i for i, (_, codigo) in enumerate(paises)})
+    tasa, rafaga, max_en_vuelo = 20.0, 2, 3
+
+    completados = []
+    inicio = time.monotonic()
+    filas = pre.fetch_all_countries(paises, url=servidor_overpass['url'], max_en_vuelo=max_en_vuelo, tasa=tasa,
+                                    rafaga=rafaga, progreso=False,
+                                    al_completar=lambda nombre, codigo, filas, error: completados.append((codigo, error)))
+
+    # Resultados en el orden de entrada aunque terminen en otro orden
+    assert filas == [{'country': nombre, 'city': f'Ciudad {codigo}', 'hotel_count': 1} for nombre, codigo in paises]
+    assert sorted(completados) == [(codigo, None) for _, codigo in paises]
+    assert [codigo for codigo, _ in completados] != [codigo for _, codigo in paises]
+
+    # Nunca más de max_en_vuelo consultas simultáneas (y sí hubo concurrencia)
+    assert 1 < servidor_overpass['max_en_vuelo'] <= max_en_vuelo
+
+    # 429: se reintenta una vez, después del Retry-After
+    llegadas = servidor_overpass['llegadas']
+    intentos = [t for t, codigo in llegadas if codigo == 'P03']
+    assert len(llegadas) == len(paises) + 1 and len(intentos) == 2
+    assert intentos[1] - intentos[0] >= 0.3
+
+    # Token bucket: la consulta i (contando reintentos) no sale antes de (i + 1 - rafaga) / tasa
+    for i, (t, _) in enumerate(sorted(llegadas)):
+        assert t - inicio >= (i + 1 - rafaga) / tasa - 0.01
+
+
+def test_consultar_overpass_reintenta_el_429(servidor_overpass, monkeypatch):
+    monkeypatch.setattr(pre.random, 'uniform', lambda a, b: 0.0)
+    servidor_overpass['limitar'].add('DEU')
+    esperas = []
+    with pre.crear_sesion(1) as sesion:
+        data = pre.consultar_overpass(pre.construir_consulta('DEU'), sesion, servidor_overpass['url'],
+                                      pre.LimitadorTasa(tasa=100.0), dormir=esperas.append)
+    assert [e['type'] for e in data['elements']] == ['node', 'way']
+    assert esperas == [0.3] and len(servidor_overpass['llegadas']) == 2
@@ -0,0 +1,49 @@
+import json
+
+import recomendar_lote as lote
+
+
+def test_celda_mal_escrita_solo_falla_su_fila(motor, tmp_path):
+    path = tmp_path / 'perfiles.csv'
+    path.write_text('id,paises_ideales,presupuesto,k\n'
+                    'a,Italy;Spain,1500,5\n'
+                    'b,Italy,mil quinientos,5\n'
+                    'c,,2000,cinco\n'
+                    'd,France,,3\n', encoding='utf-8')
+
+    perfiles = list(lote.leer_perfiles(str(path)))
+    assert [perfil['id'] for perfil in perfiles] == ['a', 'b', 'c', 'd']
+
+    resultados = [lote.recomendar_perfil(motor, perfil) for perfil in perfiles]
+    json.dumps(resultados)
+    por_id = {resultado['id']: resultado for resultado in resultados}
+    assert len(por_id['a']['recomendaciones']) == 5
+    assert 'presupuesto' in por_id['b']['error'] and 'recomendaciones' not in por_id['b']
+    assert "'k'" in por_id['c']['error']
+    assert len(por_id['d']['recomendaciones']) == 3
+
+
+def test_jsonl_conserva_tipos(motor):
+    resultado = lote.recomendar_perfil(motor, {'id': 1, 'presupuesto': 1500, 'k': 4})
+    assert 'error' not in resultado and len(resultado['recomendaciones']) == 4
+
+
+def test_linea_jsonl_invalida_solo_falla_su_registro(motor, tmp_path):
+    path = tmp_path / 'perfiles.jsonl'
+    path.write_text('{"id": "a", "k": 3}\n'
+                    'not json\n'
+                    '\n'
+                    '[1, 2]\n'
+                    '{"id": "b", "k": 2}\n', encoding='utf-8')
+
+    resultados = [lote.recomendar_perfil(motor, perfil) for perfil in lote.leer_perfiles(str(path))]
+    json.dumps(resultados)
+    assert [resultado['id'] for resultado in resultados] == ['a', None, None, 'b']
+    assert len(resultados[0]['recomendaciones']) == 3 and len(resultados[3]['recomendaciones']) == 2
+    assert resultados[1]['error'].startswith('línea 2: JSON inválido')
+    assert resultados[2]['error'].startswith('línea 4: el perfil debe ser un objeto')
+
+
+def test_entrada_que_no_es_objeto(motor):
+    resultado = lote.recomendar_perfil(motor, [1, 2])
+    assert resultado['id'] is None and 'objeto' in resultado['error']